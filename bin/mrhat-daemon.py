@@ -19,6 +19,9 @@ from mrhat_daemon import (
     MrHatDaemon,
     ApiServer,
     I2CControl,
+    I2CDevControl,
+    I2CControlBase,
+    IPiGpio,
     MrHatControl,
     PicProgrammer,
     PlatformAccess,
@@ -31,6 +34,8 @@ from mrhat_daemon import (
     GpioEdgeType,
     ApiServerConfiguration,
     MrHatControlConfig,
+    RegisterMap,
+    RuleParser,
 )
 
 APPLICATION_NAME = 'mrhat-daemon'
@@ -53,7 +58,14 @@ def main() -> None:
     log.info('Retrieved configuration', configuration=config)
 
     try:
-        api_server_port = int(config['api_server_port'])
+        api_server_port = int(config['api_server_port']) if config['api_server_port'] else None
+        api_unix_socket = config['api_unix_socket'] or None
+        api_unix_socket_perms = config['api_unix_socket_perms']
+        api_server_threads = int(config['api_server_threads'])
+        api_server_backlog = int(config['api_server_backlog'])
+        api_max_in_flight = int(config['api_max_in_flight'])
+        api_max_queued = int(config['api_max_queued'])
+        api_request_deadline = float(config['api_request_deadline'])
         power_off_forced = bool(config['power_off_forced'])
         systemd_retry_limit = int(config['systemd_retry_limit'])
         systemd_retry_delay = float(config['systemd_retry_delay'])
@@ -63,13 +75,31 @@ def main() -> None:
         interrupt_pin = int(config['interrupt_pin'])
         interrupt_pull = GpioPullType[config['interrupt_pull']]
         interrupt_edge = GpioEdgeType[config['interrupt_edge']]
+        interrupt_debounce = float(config['interrupt_debounce'])
+        interrupt_queue_size = int(config['interrupt_queue_size'])
+        i2c_backend = config['i2c_backend']
         i2c_bus_id = int(config['i2c_bus_id'])
         i2c_address = int(config['i2c_address'], 16)
         i2c_retry_limit = int(config['i2c_retry_limit'])
         i2c_retry_delay = float(config['i2c_retry_delay'])
+        i2c_retry_max_delay = float(config['i2c_retry_max_delay'])
+        i2c_retry_jitter = float(config['i2c_retry_jitter'])
+        i2c_breaker_threshold = int(config['i2c_breaker_threshold'])
+        i2c_breaker_timeout = float(config['i2c_breaker_timeout'])
+        i2c_verify_writes = bool(config['i2c_verify_writes'])
+        register_cache_ttl = float(config['register_cache_ttl'])
+        write_coalesce_window = float(config['write_coalesce_window'])
+        event_queue_size = int(config['event_queue_size'])
+        event_subscriber_limit = int(config['event_subscriber_limit'])
+        event_keepalive = float(config['event_keepalive'])
     except KeyError as error:
         raise ValueError(f'Missing configuration key: {error}')
 
+    _check_api_server_threads(api_server_threads, api_max_in_flight, api_max_queued, event_subscriber_limit)
+
+    register_map = RegisterMap()
+    rules = RuleParser(register_map).parse_rules(config)
+
     platform_access = PlatformAccess()
     session_provider = SessionProvider()
     file_downloader = FileDownloader(session_provider, firmware_package_dir)
@@ -82,15 +112,46 @@ def main() -> None:
     with PiGpio(systemd, platform_access, service_config, interrupt_config) as pi_gpio:
         gpio_options = {gpio: int(pin) for gpio, pin in config.items() if gpio.startswith('gpio')}
         programmer_config = ProgrammerConfig(gpio_options, firmware_package_dir, firmware_package_file)
-        i2c_config = I2CConfig(i2c_bus_id, i2c_address, i2c_retry_limit, i2c_retry_delay)
-        control_config = MrHatControlConfig(firmware_auto_upgrade, power_off_forced)
-        api_server_config = ApiServerConfiguration(api_server_port, resource_root)
+        i2c_config = I2CConfig(
+            i2c_bus_id,
+            i2c_address,
+            i2c_retry_limit,
+            i2c_retry_delay,
+            i2c_retry_max_delay,
+            i2c_retry_jitter,
+            i2c_breaker_threshold,
+            i2c_breaker_timeout,
+            i2c_verify_writes,
+        )
+        control_config = MrHatControlConfig(
+            firmware_auto_upgrade,
+            power_off_forced,
+            register_cache_ttl,
+            write_coalesce_window,
+            event_queue_size,
+            event_subscriber_limit,
+            interrupt_debounce,
+            interrupt_queue_size,
+            rules,
+        )
+        api_server_config = ApiServerConfiguration(
+            api_server_port,
+            resource_root,
+            event_keepalive,
+            api_unix_socket,
+            api_unix_socket_perms,
+            api_server_threads,
+            api_server_backlog,
+            api_max_in_flight,
+            api_max_queued,
+            api_request_deadline,
+        )
 
         with (
             PicProgrammer(programmer_config, platform_access, file_downloader) as pic_programmer,
-            I2CControl(pi_gpio, i2c_config) as i2c_control,
+            _create_i2c_control(i2c_backend, pi_gpio, i2c_config) as i2c_control,
             MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, control_config) as mr_hat_control,
-            ApiServer(api_server_config, mr_hat_control) as api_server,
+            ApiServer(api_server_config, mr_hat_control, register_map) as api_server,
         ):
             mr_hat_daemon = MrHatDaemon(mr_hat_control, api_server)
 
@@ -118,6 +179,13 @@ def _get_arguments() -> dict[str, Any]:
     parser.add_argument('-l', '--log-level', help='logging level')
 
     parser.add_argument('--api-server-port', help='web server port to listen on', type=int)
+    parser.add_argument('--api-unix-socket', help='web server Unix socket path to listen on')
+    parser.add_argument('--api-unix-socket-perms', help='web server Unix socket file permissions in octal')
+    parser.add_argument('--api-server-threads', help='web server worker thread count', type=int)
+    parser.add_argument('--api-server-backlog', help='web server listen backlog', type=int)
+    parser.add_argument('--api-max-in-flight', help='bus bound requests served at once, 0 disables limit', type=int)
+    parser.add_argument('--api-max-queued', help='bus bound requests waiting for admission', type=int)
+    parser.add_argument('--api-request-deadline', help='admission wait deadline of bus bound requests', type=float)
 
     parser.add_argument('--power-off-forced', help='force power off the system', action=BooleanOptionalAction)
 
@@ -131,15 +199,53 @@ def _get_arguments() -> dict[str, Any]:
     parser.add_argument('--interrupt-pin', help='interrupt GPIO pin number of the device', type=int)
     parser.add_argument('--interrupt-pull', help='interrupt GPIO pin PULL_UP or PULL_DOWN')
     parser.add_argument('--interrupt-edge', help='interrupt GPIO pin FALLING_EDGE or RISING_EDGE')
+    parser.add_argument('--interrupt-queue-size', help='interrupts waiting to be processed', type=int)
+    parser.add_argument(
+        '--interrupt-debounce', help='interrupt edge settling time before reading, 0 disables', type=float
+    )
 
+    parser.add_argument('--i2c-backend', help='I2C access backend: pigpio or i2cdev')
     parser.add_argument('--i2c-bus-id', help='I2C bus ID of the device', type=int)
     parser.add_argument('--i2c-address', help='I2C address of the device', type=int)
     parser.add_argument('--i2c-retry-limit', help='I2C operation retry limit', type=int)
-    parser.add_argument('--i2c-retry-delay', help='I2C operation retry delay', type=float)
+    parser.add_argument('--i2c-retry-delay', help='I2C operation initial retry delay', type=float)
+    parser.add_argument('--i2c-retry-max-delay', help='I2C operation maximum retry delay', type=float)
+    parser.add_argument('--i2c-retry-jitter', help='I2C operation retry delay jitter ratio', type=float)
+    parser.add_argument('--i2c-breaker-threshold', help='I2C failures before failing fast, 0 disables', type=int)
+    parser.add_argument('--i2c-breaker-timeout', help='I2C fail fast period after repeated failures', type=float)
+    parser.add_argument('--i2c-verify-writes', help='read back and verify I2C writes', action=BooleanOptionalAction)
+
+    parser.add_argument('--register-cache-ttl', help='register snapshot cache time to live, 0 disables', type=float)
+    parser.add_argument('--write-coalesce-window', help='register write merging window, 0 disables', type=float)
+
+    parser.add_argument('--event-queue-size', help='pending events kept per event stream subscriber', type=int)
+    parser.add_argument('--event-subscriber-limit', help='maximum number of event stream subscribers', type=int)
+    parser.add_argument('--event-keepalive', help='event stream keep-alive interval', type=float)
 
     return {k: v for k, v in vars(parser.parse_args()).items() if v is not None}
 
 
+def _check_api_server_threads(threads: int, max_in_flight: int, max_queued: int, subscriber_limit: int) -> None:
+    if max_in_flight <= 0:
+        return
+
+    # Every event stream holds a worker thread while open, one more thread must stay free to shed load
+    required = subscriber_limit + max_in_flight + max_queued + 1
+
+    if threads < required:
+        raise ValueError(f'API server needs at least {required} threads with admission control enabled: {threads}')
+
+
+def _create_i2c_control(backend: str, pi_gpio: IPiGpio, config: I2CConfig) -> I2CControlBase:
+    if backend == 'pigpio':
+        return I2CControl(pi_gpio, config)
+
+    if backend == 'i2cdev':
+        return I2CDevControl(config)
+
+    raise ValueError(f'Unknown I2C backend: {backend}')
+
+
 def _get_resource_root() -> str:
     return str(Path(os.path.dirname(__file__)).parent.absolute())
 
@@ -1,7 +1,24 @@
 from .platformAccess import *
 from .piGpio import *
+from .singleFlight import *
+from .retryPolicy import *
+from .i2cMetrics import *
+from .i2cTransaction import *
 from .i2cControl import *
+from .i2cDevControl import *
+from .piEmulator import *
 from .picProgrammer import *
+from .registerCache import *
+from .writeCoalescer import *
+from .registerBatch import *
+from .registerMap import *
+from .admissionControl import *
+from .eventPublisher import *
+from .interruptCoalescer import *
+from .interruptWorker import *
+from .interruptLatency import *
+from .changeDispatcher import *
+from .ruleEngine import *
 from .mrHatControl import *
 from .apiServer import *
 from .mrHatDaemon import *
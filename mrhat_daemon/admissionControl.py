@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass
+from threading import Condition
+
+from context_logger import get_logger
+
+log = get_logger('AdmissionControl')
+
+
+@dataclass
+class AdmissionConfig:
+    max_in_flight: int = 0
+    max_queued: int = 0
+    deadline: float = 1.0
+
+
+@dataclass
+class AdmissionStats:
+    in_flight: int
+    queued: int
+    admitted: int
+    rejected: int
+    expired: int
+
+
+class AdmissionError(Exception):
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class OverloadError(AdmissionError):
+    pass
+
+
+class DeadlineExceededError(AdmissionError):
+    pass
+
+
+class IAdmissionControl(object):
+
+    def acquire(self) -> None:
+        raise NotImplementedError()
+
+    def release(self) -> None:
+        raise NotImplementedError()
+
+    def get_stats(self) -> AdmissionStats:
+        raise NotImplementedError()
+
+
+class AdmissionControl(IAdmissionControl):
+
+    def __init__(self, config: AdmissionConfig) -> None:
+        self._config = config
+        self._in_flight = 0
+        self._queued = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._expired = 0
+        self._condition = Condition()
+
+    def acquire(self) -> None:
+        if self._config.max_in_flight <= 0:
+            return
+
+        with self._condition:
+            if self._in_flight >= self._config.max_in_flight:
+                self._wait_for_slot()
+
+            self._in_flight += 1
+            self._admitted += 1
+
+    def release(self) -> None:
+        if self._config.max_in_flight <= 0:
+            return
+
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    def get_stats(self) -> AdmissionStats:
+        with self._condition:
+            return AdmissionStats(self._in_flight, self._queued, self._admitted, self._rejected, self._expired)
+
+    def _wait_for_slot(self) -> None:
+        if self._queued >= self._config.max_queued:
+            self._rejected += 1
+            # Shedding right away is cheaper for everyone than queueing work that is likely to time out
+            raise OverloadError('Too many requests in flight', self._config.deadline)
+
+        self._queued += 1
+
+        try:
+            admitted = self._condition.wait_for(
+                lambda: self._in_flight < self._config.max_in_flight, self._config.deadline
+            )
+        finally:
+            self._queued -= 1
+
+        if not admitted:
+            self._expired += 1
+            raise DeadlineExceededError('Request deadline exceeded while waiting', self._config.deadline)
@@ -3,22 +3,68 @@
 # SPDX-License-Identifier: MIT
 
 import json
-from dataclasses import dataclass
-from typing import Any
+import math
+import os
+import uuid
+from dataclasses import dataclass, asdict
+from threading import Lock
+from typing import Any, Generator, Optional, cast
 
 from context_logger import get_logger
-from flask import Flask, request, Response, jsonify
-from waitress.server import create_server
-
-from mrhat_daemon import IMrHatControl
+from flask import Flask, request, Response, jsonify, g
+from waitress.server import create_server, MultiSocketServer
+from waitress.task import ThreadedTaskDispatcher
+
+from mrhat_daemon import (
+    IMrHatControl,
+    CircuitOpenError,
+    ISubscription,
+    SubscriberLimitError,
+    RegisterSnapshot,
+    IRegisterMap,
+    RegisterMap,
+    AdmissionConfig,
+    AdmissionControl,
+    AdmissionError,
+    OverloadError,
+    DeadlineExceededError,
+    BatchOperation,
+    BatchOperationType,
+)
 
 log = get_logger('ApiServer')
 
+JSON_MIMETYPE = 'application/json'
+BINARY_MIMETYPE = 'application/octet-stream'
+
+BUS_ENDPOINTS = frozenset(
+    {
+        'register_api',
+        'registers_read_api',
+        'registers_api',
+        'flush_api',
+        'batch_api',
+        'register_get_flag_api',
+        'register_set_flag_api',
+        'register_by_name_api',
+        'flag_get_api',
+        'flag_set_api',
+    }
+)
+
 
 @dataclass
 class ApiServerConfiguration:
-    server_port: int
+    server_port: Optional[int]
     resource_root: str
+    event_keepalive: float = 15.0
+    unix_socket: Optional[str] = None
+    unix_socket_perms: str = '600'
+    threads: int = 4
+    backlog: int = 1024
+    max_in_flight: int = 0
+    max_queued: int = 0
+    request_deadline: float = 1.0
 
 
 class IApiServer(object):
@@ -35,16 +81,41 @@ class IApiServer(object):
 
 class ApiServer(IApiServer):
 
-    def __init__(self, configuration: ApiServerConfiguration, mr_hat_control: IMrHatControl) -> None:
+    def __init__(
+        self,
+        configuration: ApiServerConfiguration,
+        mr_hat_control: IMrHatControl,
+        register_map: Optional[IRegisterMap] = None,
+    ) -> None:
         self._configuration = configuration
         self._mr_hat_control = mr_hat_control
+        self._register_map = register_map if register_map is not None else RegisterMap()
+        self._readable_registers = mr_hat_control.get_readable_registers()
+        self._readable = frozenset(self._readable_registers)
+        self._writable = frozenset(mr_hat_control.get_writable_registers())
+        self._admission_control = AdmissionControl(
+            AdmissionConfig(configuration.max_in_flight, configuration.max_queued, configuration.request_deadline)
+        )
         self._port = self._configuration.server_port
         self._app = Flask(__name__)
-        self._server = create_server(self._app, listen=f'*:{self._port}')
+        self._server = self._create_server()
         self._is_running = False
+        self._subscriptions: set[ISubscription] = set()
+        self._lock = Lock()
+        # Generations restart with the process, entity tags issued by a previous instance must never match
+        self._instance = uuid.uuid4().hex[:8]
 
+        self._set_up_admission_control()
         self._set_up_register_api()
-        self._set_up_register_flag_api()
+        self._set_up_registers_read_api()
+        self._set_up_registers_api()
+        self._set_up_flush_api()
+        self._set_up_batch_api()
+        self._set_up_register_get_flag_api()
+        self._set_up_register_set_flag_api()
+        self._set_up_named_api()
+        self._set_up_events_api()
+        self._set_up_diagnostics_api()
 
     def __enter__(self) -> 'ApiServer':
         return self
@@ -53,7 +124,7 @@ class ApiServer(IApiServer):
         self.shutdown()
 
     def run(self) -> None:
-        log.info('Starting web server', port=self._configuration.server_port)
+        log.info('Starting web server', port=self._port, unix_socket=self._configuration.unix_socket)
         try:
             self._is_running = True
             self._server.run()
@@ -63,6 +134,14 @@ class ApiServer(IApiServer):
 
     def shutdown(self) -> None:
         log.info('Shutting down')
+
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        # Event streams would keep their worker threads busy until the next keep-alive otherwise
+        for subscription in subscriptions:
+            subscription.close()
+
         try:
             self._server.close()
         except Exception as error:
@@ -73,40 +152,189 @@ class ApiServer(IApiServer):
     def is_running(self) -> bool:
         return self._is_running
 
+    def _create_server(self) -> Any:
+        unix_socket = self._configuration.unix_socket
+        options = {'threads': self._configuration.threads, 'backlog': self._configuration.backlog}
+
+        if not unix_socket:
+            return create_server(self._app, listen=f'*:{self._port}', **options)
+
+        if directory := os.path.dirname(unix_socket):
+            os.makedirs(directory, exist_ok=True)
+
+        unix_options = {
+            'unix_socket': unix_socket,
+            'unix_socket_perms': self._configuration.unix_socket_perms,
+            **options,
+        }
+
+        if self._port is None:
+            return create_server(self._app, **unix_options)
+
+        # Waitress cannot mix TCP and Unix sockets in one server, so they share the socket map and worker threads
+        socket_map: dict[int, Any] = {}
+        dispatcher = ThreadedTaskDispatcher()
+        dispatcher.set_thread_count(self._configuration.threads)
+        tcp_server = create_server(self._app, socket_map, _dispatcher=dispatcher, listen=f'*:{self._port}', **options)
+        unix_server = create_server(self._app, socket_map, _dispatcher=dispatcher, **unix_options)
+        if isinstance(tcp_server, MultiSocketServer):
+            listen = tcp_server.effective_listen
+        else:
+            listen = [(tcp_server.effective_host, tcp_server.effective_port)]
+
+        return MultiSocketServer(socket_map, unix_server.adj, [*listen, ('unix', unix_socket)], dispatcher)
+
+    def _set_up_admission_control(self) -> None:
+
+        @self._app.before_request
+        def admit_request() -> Optional[Response]:
+            if request.endpoint not in BUS_ENDPOINTS:
+                return None
+
+            try:
+                self._admission_control.acquire()
+                g.admitted = True
+                return None
+            except OverloadError as error:
+                return self._create_admission_response(503, error)
+            except DeadlineExceededError as error:
+                return self._create_admission_response(504, error)
+
+        @self._app.teardown_request
+        def release_request(error: Optional[BaseException]) -> None:
+            if g.pop('admitted', False):
+                self._admission_control.release()
+
     def _set_up_register_api(self) -> None:
 
-        @self._app.route('/api/register/<address>', methods=['GET', 'POST'])
+        @self._app.route('/api/register/<address>', methods=['GET', 'POST', 'PATCH'])
         def register_api(address: str) -> Response:
-            log.info('Register API request', request=request, data=request.data)
+            log.info('Register API request', request=request)
 
             try:
-                write = request.method == 'POST'
+                write = request.method != 'GET'
 
                 register = int(address)
                 self._validate_register(register, write)
 
-                if write:
-                    data = json.loads(request.data)
-                    value = int(data['value'])
+                if request.method == 'PATCH':
+                    set_mask, clear_mask = self._get_masks()
+                    self._validate_masks(set_mask, clear_mask)
+
+                    value = self._mr_hat_control.update_register(register, set_mask, clear_mask)
+                    return self._create_value_response(value)
+                elif write:
+                    value = self._get_value()
                     self._validate_byte(value)
 
                     self._mr_hat_control.set_register(register, value)
                     return Response(status=202)
+                elif not_modified := self._get_not_modified_response():
+                    return not_modified
                 else:
-                    value = self._mr_hat_control.get_register(register)
-                    return jsonify({'value': value})
+                    snapshot = self._mr_hat_control.get_registers(register, 1)
+                    return self._create_snapshot_response({'value': snapshot.registers[0]}, register, snapshot)
             except ValueError as error:
                 log.error('Invalid request', request=request, data=request.data, error=error)
                 return Response(status=400)
+            except CircuitOpenError as error:
+                return self._create_unavailable_response(error)
             except Exception as error:
                 log.error('Serving the request failed', address=address, error=error)
                 return Response(status=500)
 
-    def _set_up_register_flag_api(self) -> None:
+    def _set_up_registers_read_api(self) -> None:
+
+        @self._app.route('/api/registers', methods=['GET'])
+        def registers_read_api() -> Response:
+            log.info('Registers read API request', request=request)
+
+            try:
+                readable = self._readable_registers
+                start = int(request.args.get('start', readable[0]))
+                count = int(request.args.get('count', readable[-1] - start + 1))
+                self._validate_range(start, count)
+
+                if not_modified := self._get_not_modified_response():
+                    return not_modified
+
+                snapshot = self._mr_hat_control.get_registers(start, count)
+                data = {'start': start, 'values': snapshot.registers, 'timestamp': snapshot.timestamp}
+                return self._create_snapshot_response(data, start, snapshot)
+            except ValueError as error:
+                log.error('Invalid request', request=request, error=error)
+                return Response(status=400)
+            except CircuitOpenError as error:
+                return self._create_unavailable_response(error)
+            except Exception as error:
+                log.error('Serving the request failed', error=error)
+                return Response(status=500)
+
+    def _set_up_registers_api(self) -> None:
+
+        @self._app.route('/api/registers', methods=['POST'])
+        def registers_api() -> Response:
+            log.info('Registers API request', request=request)
+
+            try:
+                values = self._get_values()
+
+                for register, value in values.items():
+                    self._validate_register(register, True)
+                    self._validate_byte(value)
+
+                self._mr_hat_control.set_registers(values)
+                return Response(status=202)
+            except (ValueError, AttributeError) as error:
+                log.error('Invalid request', request=request, data=request.data, error=error)
+                return Response(status=400)
+            except CircuitOpenError as error:
+                return self._create_unavailable_response(error)
+            except Exception as error:
+                log.error('Serving the request failed', error=error)
+                return Response(status=500)
+
+    def _set_up_flush_api(self) -> None:
+
+        @self._app.route('/api/registers/flush', methods=['POST'])
+        def flush_api() -> Response:
+            log.info('Flush API request', request=request)
+
+            try:
+                self._mr_hat_control.flush_writes()
+                return Response(status=200)
+            except CircuitOpenError as error:
+                return self._create_unavailable_response(error)
+            except Exception as error:
+                log.error('Serving the request failed', error=error)
+                return Response(status=500)
+
+    def _set_up_batch_api(self) -> None:
+
+        @self._app.route('/api/batch', methods=['POST'])
+        def batch_api() -> Response:
+            log.info('Batch API request', request=request)
+
+            try:
+                # Nothing is sent to the device unless every operation is valid
+                operations = self._get_batch_operations(json.loads(request.data))
+
+                results = self._mr_hat_control.execute_batch(operations)
+                return jsonify({'results': results})
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                log.error('Invalid request', request=request, data=request.data, error=error)
+                return Response(status=400)
+            except CircuitOpenError as error:
+                return self._create_unavailable_response(error)
+            except Exception as error:
+                log.error('Serving the request failed', error=error)
+                return Response(status=500)
+
+    def _set_up_register_get_flag_api(self) -> None:
 
         @self._app.route('/api/register/<address>/<position>', methods=['GET'])
         def register_get_flag_api(address: str, position: str) -> Response:
-            log.info('Register flag read API request', request=request, data=request.data)
+            log.info('Register flag read API request', request=request)
 
             try:
                 register = int(address)
@@ -115,17 +343,21 @@ class ApiServer(IApiServer):
                 self._validate_flag(flag)
 
                 value = self._mr_hat_control.get_flag(register, flag)
-                return jsonify({'value': value})
+                return self._create_value_response(value)
             except ValueError as error:
                 log.error('Invalid request', request=request, data=request.data, error=error)
                 return Response(status=400)
+            except CircuitOpenError as error:
+                return self._create_unavailable_response(error)
             except Exception as error:
                 log.error('Serving the request failed', address=address, position=position, error=error)
                 return Response(status=500)
 
+    def _set_up_register_set_flag_api(self) -> None:
+
         @self._app.route('/api/register/<address>/<position>/<value>', methods=['POST'])
         def register_set_flag_api(address: str, position: str, value: str) -> Response:
-            log.info('Register flag write API request', request=request, data=request.data)
+            log.info('Register flag write API request', request=request)
 
             try:
                 register = int(address)
@@ -143,18 +375,265 @@ class ApiServer(IApiServer):
             except ValueError as error:
                 log.error('Invalid request', request=request, data=request.data, error=error)
                 return Response(status=400)
+            except CircuitOpenError as error:
+                return self._create_unavailable_response(error)
             except Exception as error:
                 log.error('Serving the request failed', address=address, position=position, error=error)
                 return Response(status=500)
 
-    def _validate_register(self, register: int, read_write: bool) -> None:
-        if read_write:
-            registers = self._mr_hat_control.get_writable_registers()
+    def _set_up_named_api(self) -> None:
+
+        # Names are resolved to addresses and served by the numeric endpoints, including their validation
+        @self._app.route('/api/register/by-name/<name>', methods=['GET', 'POST', 'PATCH'])
+        def register_by_name_api(name: str) -> Response:
+            if not (register := self._register_map.get_register(name)):
+                log.error('Unknown register name', request=request, name=name)
+                return Response(status=404)
+
+            return self._call_endpoint('register_api', str(register.address))
+
+        @self._app.route('/api/flag/<name>', methods=['GET'])
+        def flag_get_api(name: str) -> Response:
+            if not (flag := self._register_map.get_flag(name)):
+                log.error('Unknown flag name', request=request, name=name)
+                return Response(status=404)
+
+            return self._call_endpoint('register_get_flag_api', str(flag.register.address), str(flag.position))
+
+        @self._app.route('/api/flag/<name>/<value>', methods=['POST'])
+        def flag_set_api(name: str, value: str) -> Response:
+            if not (flag := self._register_map.get_flag(name)):
+                log.error('Unknown flag name', request=request, name=name)
+                return Response(status=404)
+
+            return self._call_endpoint('register_set_flag_api', str(flag.register.address), str(flag.position), value)
+
+    def _call_endpoint(self, endpoint: str, *args: str) -> Response:
+        return cast(Response, self._app.view_functions[endpoint](*args))
+
+    def _set_up_events_api(self) -> None:
+
+        @self._app.route('/api/events', methods=['GET'])
+        def events_api() -> Response:
+            log.info('Events API request', request=request)
+
+            try:
+                subscription = self._mr_hat_control.subscribe()
+            except SubscriberLimitError as error:
+                log.warn('Event subscription rejected', request=request, error=error)
+                return Response(
+                    status=503, headers={'Retry-After': str(math.ceil(self._configuration.event_keepalive))}
+                )
+            except Exception as error:
+                log.error('Serving the request failed', error=error)
+                return Response(status=500)
+
+            with self._lock:
+                self._subscriptions.add(subscription)
+
+            return Response(
+                self._stream_events(subscription),
+                mimetype='text/event-stream',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+            )
+
+    def _stream_events(self, subscription: ISubscription) -> Generator[str, None, None]:
+        try:
+            # Sends the response headers right away, so the client knows the stream is established
+            yield ': connected\n\n'
+
+            while not subscription.is_closed():
+                if event := subscription.get(self._configuration.event_keepalive):
+                    yield f'event: {event.name}\ndata: {json.dumps(event.data)}\n\n'
+                elif not subscription.is_closed():
+                    yield ': keep-alive\n\n'
+        finally:
+            subscription.close()
+
+            with self._lock:
+                self._subscriptions.discard(subscription)
+
+    def _set_up_diagnostics_api(self) -> None:
+
+        @self._app.route('/api/diagnostics', methods=['GET'])
+        def diagnostics_api() -> Response:
+            log.info('Diagnostics API request', request=request)
+
+            try:
+                diagnostics = self._mr_hat_control.get_diagnostics()
+                diagnostics['admission'] = asdict(self._admission_control.get_stats())
+                return jsonify(diagnostics)
+            except Exception as error:
+                log.error('Serving the request failed', error=error)
+                return Response(status=500)
+
+    def _is_binary_accepted(self) -> bool:
+        # JSON stays the default, raw bytes are only sent to clients explicitly preferring them
+        return request.accept_mimetypes.best_match([JSON_MIMETYPE, BINARY_MIMETYPE], JSON_MIMETYPE) == BINARY_MIMETYPE
+
+    def _is_binary_content(self) -> bool:
+        return request.mimetype == BINARY_MIMETYPE
+
+    def _get_value(self) -> int:
+        if self._is_binary_content():
+            if len(request.data) != 1:
+                raise ValueError('Binary value must be a single byte')
+            return request.data[0]
+
+        return int(json.loads(request.data)['value'])
+
+    def _get_masks(self) -> tuple[int, int]:
+        if self._is_binary_content():
+            if len(request.data) != 2:
+                raise ValueError('Binary masks must be a set and a clear mask byte')
+            return request.data[0], request.data[1]
+
+        data = json.loads(request.data)
+        return int(data.get('set', 0)), int(data.get('clear', 0))
+
+    def _get_values(self) -> dict[int, int]:
+        if self._is_binary_content():
+            if not request.data or len(request.data) % 2:
+                raise ValueError('Binary values must be register and value byte pairs')
+            return dict(zip(request.data[::2], request.data[1::2]))
+
+        data = json.loads(request.data)
+        return {int(address): int(value) for address, value in data.items()}
+
+    def _get_batch_operations(self, data: Any) -> list[BatchOperation]:
+        if not isinstance(data, list) or not data:
+            raise ValueError('Batch must be a non-empty list of operations')
+
+        operations = []
+
+        for index, item in enumerate(data):
+            try:
+                operations.append(self._get_batch_operation(item))
+            except (ValueError, KeyError, TypeError, AttributeError) as error:
+                raise ValueError(f'Invalid batch operation at index {index}: {error!r}')
+
+        return operations
+
+    def _get_batch_operation(self, item: dict[str, Any]) -> BatchOperation:
+        operation = item['op']
+
+        if operation in ('get_flag', 'set_flag', 'clear_flag'):
+            return self._get_batch_flag_operation(item, operation)
+
+        register = self._get_batch_register(item['register'], operation != 'read')
+
+        if operation == 'read':
+            return BatchOperation(BatchOperationType.READ, register)
+        elif operation == 'write':
+            value = int(item['value'])
+            self._validate_byte(value)
+            return BatchOperation(BatchOperationType.WRITE, register, value)
+        elif operation == 'update':
+            set_mask, clear_mask = int(item.get('set', 0)), int(item.get('clear', 0))
+            self._validate_masks(set_mask, clear_mask)
+            return BatchOperation(BatchOperationType.UPDATE, register, set_mask=set_mask, clear_mask=clear_mask)
+
+        raise ValueError(f'Unknown operation: {operation}')
+
+    def _get_batch_flag_operation(self, item: dict[str, Any], operation: str) -> BatchOperation:
+        write = operation != 'get_flag'
+
+        if 'register' in item:
+            register = self._get_batch_register(item['register'], write)
+            flag = int(item['flag'])
+            self._validate_flag(flag)
+        elif definition := self._register_map.get_flag(item['flag']):
+            register = definition.register.address
+            self._validate_register(register, write)
+            flag = definition.position
+        else:
+            raise ValueError(f'Unknown flag name: {item["flag"]}')
+
+        if operation == 'get_flag':
+            return BatchOperation(BatchOperationType.READ, register, flag=flag)
+
+        mask = 1 << flag
+        set_mask, clear_mask = (mask, 0) if operation == 'set_flag' else (0, mask)
+
+        return BatchOperation(BatchOperationType.UPDATE, register, set_mask=set_mask, clear_mask=clear_mask, flag=flag)
+
+    def _get_batch_register(self, register: Any, write: bool) -> int:
+        if isinstance(register, str) and not register.isdigit():
+            if not (definition := self._register_map.get_register(register)):
+                raise ValueError(f'Unknown register name: {register}')
+            register = definition.address
+
+        address = int(register)
+        self._validate_register(address, write)
+
+        return address
+
+    def _create_value_response(self, value: int) -> Response:
+        if self._is_binary_accepted():
+            response = Response(bytes([value]), mimetype=BINARY_MIMETYPE)
+        else:
+            response = jsonify({'value': value})
+
+        response.vary.add('Accept')
+        return response
+
+    def _get_not_modified_response(self) -> Optional[Response]:
+        if not request.if_none_match:
+            return None
+
+        # Answered without touching the bus while the cached snapshot is still fresh
+        generation = self._mr_hat_control.get_generation()
+
+        if generation is not None and request.if_none_match.contains(self._get_etag(generation)):
+            return self._create_not_modified_response(generation)
+
+        return None
+
+    def _create_snapshot_response(self, data: dict[str, Any], start: int, snapshot: RegisterSnapshot) -> Response:
+        if request.if_none_match.contains(self._get_etag(snapshot.generation)):
+            return self._create_not_modified_response(snapshot.generation)
+
+        if self._is_binary_accepted():
+            response = Response(bytes(snapshot.registers), mimetype=BINARY_MIMETYPE)
+            response.headers['X-Register-Start'] = str(start)
+            response.headers['X-Register-Timestamp'] = str(snapshot.timestamp)
         else:
-            registers = self._mr_hat_control.get_readable_registers()
+            response = jsonify(data)
+
+        response.set_etag(self._get_etag(snapshot.generation))
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        return response
+
+    def _create_not_modified_response(self, generation: int) -> Response:
+        response = Response(status=304)
+        response.set_etag(self._get_etag(generation))
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+        return response
+
+    def _get_etag(self, generation: int) -> str:
+        # Each representation of the same snapshot is tagged separately
+        suffix = '-raw' if self._is_binary_accepted() else ''
+        return f'{self._instance}-{generation}{suffix}'
+
+    def _create_admission_response(self, status: int, error: AdmissionError) -> Response:
+        log.warn('Request shed', request=request, reason=error.message, stats=self._admission_control.get_stats())
+        return Response(status=status, headers={'Retry-After': str(math.ceil(error.retry_after))})
+
+    def _create_unavailable_response(self, error: CircuitOpenError) -> Response:
+        log.warn('Device is unavailable', request=request, error=error, retry_after=error.retry_after)
+        return Response(status=503, headers={'Retry-After': str(math.ceil(error.retry_after))})
+
+    def _validate_register(self, register: int, read_write: bool) -> None:
+        registers = self._writable if read_write else self._readable
 
         if register not in registers:
-            raise ValueError(f'Register number must be in {registers}')
+            raise ValueError(f'Register number must be in {sorted(registers)}')
+
+    def _validate_range(self, start: int, count: int) -> None:
+        if count < 1 or start not in self._readable or start + count - 1 not in self._readable:
+            raise ValueError(f'Register range must be within {self._readable_registers}')
 
     def _validate_flag(self, position: int) -> None:
         if not (0 <= position <= 7):
@@ -164,6 +643,13 @@ class ApiServer(IApiServer):
         if not (0 <= value <= 255):
             raise ValueError('Byte value must be between 0 and 255')
 
+    def _validate_masks(self, set_mask: int, clear_mask: int) -> None:
+        self._validate_byte(set_mask)
+        self._validate_byte(clear_mask)
+
+        if set_mask & clear_mask:
+            raise ValueError('Set and clear masks must not overlap')
+
     def _validate_bit(self, value: int) -> None:
         if not (0 <= value <= 1):
             raise ValueError('Flag value must be between 0 and 1')
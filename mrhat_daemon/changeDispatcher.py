@@ -0,0 +1,94 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass
+from enum import Enum
+from threading import Lock
+from typing import Callable
+
+from context_logger import get_logger
+
+log = get_logger('ChangeDispatcher')
+
+BYTE_VALUES = 256
+
+
+@dataclass
+class RegisterChange:
+    register: int
+    previous: int
+    value: int
+    changed: int
+
+
+class ChangeEdge(Enum):
+    ANY = 'any'
+    RISING = 'rising'
+    FALLING = 'falling'
+
+
+ChangeHandler = Callable[[RegisterChange], None]
+
+
+class IChangeDispatcher(object):
+
+    def subscribe(self, register: int, mask: int, handler: ChangeHandler, edge: ChangeEdge = ChangeEdge.ANY) -> None:
+        raise NotImplementedError()
+
+    def dispatch(self, previous: list[int], registers: list[int]) -> list[RegisterChange]:
+        raise NotImplementedError()
+
+
+class ChangeDispatcher(IChangeDispatcher):
+
+    def __init__(self) -> None:
+        self._subscriptions: dict[int, list[tuple[int, ChangeHandler, ChangeEdge]]] = {}
+        self._handlers: dict[int, dict[ChangeEdge, list[tuple[ChangeHandler, ...]]]] = {}
+        self._lock = Lock()
+
+    def subscribe(self, register: int, mask: int, handler: ChangeHandler, edge: ChangeEdge = ChangeEdge.ANY) -> None:
+        with self._lock:
+            subscriptions = self._subscriptions.setdefault(register, [])
+            subscriptions.append((mask, handler, edge))
+
+            # Every possible changed bit pattern of the register is resolved up front, dispatch is a lookup per edge
+            self._handlers[register] = {
+                edge: [
+                    tuple(handler for mask, handler, subscribed in subscriptions if subscribed == edge and mask & bits)
+                    for bits in range(BYTE_VALUES)
+                ]
+                for edge in ChangeEdge
+            }
+
+        log.info(
+            'Change handler subscribed', register=register, mask=mask, edge=edge.value, subscriptions=len(subscriptions)
+        )
+
+    def dispatch(self, previous: list[int], registers: list[int]) -> list[RegisterChange]:
+        # The whole block is compared at once, an unchanged snapshot costs a single comparison
+        diff = int.from_bytes(bytes(previous), 'big') ^ int.from_bytes(bytes(registers), 'big')
+
+        if not diff:
+            return []
+
+        changes = []
+
+        for register, changed in enumerate(diff.to_bytes(len(registers), 'big')):
+            if changed:
+                change = RegisterChange(register, previous[register], registers[register], changed)
+                changes.append(change)
+
+                if handlers := self._handlers.get(register):
+                    self._call_handlers(handlers[ChangeEdge.ANY][changed], change)
+                    self._call_handlers(handlers[ChangeEdge.RISING][changed & change.value], change)
+                    self._call_handlers(handlers[ChangeEdge.FALLING][changed & change.previous], change)
+
+        return changes
+
+    def _call_handlers(self, handlers: tuple[ChangeHandler, ...], change: RegisterChange) -> None:
+        for handler in handlers:
+            try:
+                handler(change)
+            except Exception as error:
+                log.error('Change handler failed', register=change.register, changed=change.changed, error=error)
@@ -0,0 +1,150 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from collections import deque
+from dataclasses import dataclass
+from threading import Condition, Lock
+from typing import Any, Callable, Optional
+
+from context_logger import get_logger
+
+log = get_logger('EventPublisher')
+
+
+@dataclass
+class Event:
+    name: str
+    data: dict[str, Any]
+
+
+@dataclass
+class EventPublisherStats:
+    subscribers: int
+    published: int
+    dropped: int
+
+
+class SubscriberLimitError(Exception):
+
+    def __init__(self, message: str) -> None:
+        super().__init__(message)
+        self.message = message
+
+
+class ISubscription(object):
+
+    def get(self, timeout: float) -> Optional[Event]:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        raise NotImplementedError()
+
+    def is_closed(self) -> bool:
+        raise NotImplementedError()
+
+
+class Subscription(ISubscription):
+
+    def __init__(self, queue_size: int, on_close: Callable[['Subscription'], None]) -> None:
+        self._events: deque[Event] = deque(maxlen=queue_size)
+        self._on_close = on_close
+        self._closed = False
+        self._dropped = 0
+        self._condition = Condition()
+
+    def put(self, event: Event) -> bool:
+        with self._condition:
+            # A slow subscriber loses its oldest events instead of holding up the publisher
+            dropped = len(self._events) == self._events.maxlen
+            self._events.append(event)
+            self._condition.notify()
+
+        return not dropped
+
+    def get(self, timeout: float) -> Optional[Event]:
+        with self._condition:
+            self._condition.wait_for(lambda: self._events or self._closed, timeout)
+            return self._events.popleft() if self._events else None
+
+    def close(self) -> None:
+        with self._condition:
+            if self._closed:
+                return
+
+            self._closed = True
+            self._condition.notify_all()
+
+        self._on_close(self)
+
+    def is_closed(self) -> bool:
+        return self._closed
+
+
+class IEventPublisher(object):
+
+    def subscribe(self) -> ISubscription:
+        raise NotImplementedError()
+
+    def publish(self, event: Event) -> None:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        raise NotImplementedError()
+
+    def get_stats(self) -> EventPublisherStats:
+        raise NotImplementedError()
+
+
+class EventPublisher(IEventPublisher):
+
+    def __init__(self, queue_size: int, subscriber_limit: int) -> None:
+        self._queue_size = queue_size
+        self._subscriber_limit = subscriber_limit
+        self._subscriptions: list[Subscription] = []
+        self._published = 0
+        self._dropped = 0
+        self._lock = Lock()
+
+    def subscribe(self) -> ISubscription:
+        with self._lock:
+            if len(self._subscriptions) >= self._subscriber_limit:
+                raise SubscriberLimitError(f'Subscriber limit reached: {self._subscriber_limit}')
+
+            subscription = Subscription(self._queue_size, self._unsubscribe)
+            self._subscriptions.append(subscription)
+
+        log.info('Subscriber added', subscribers=len(self._subscriptions))
+
+        return subscription
+
+    def publish(self, event: Event) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+            self._published += 1
+
+        dropped = len([subscription for subscription in subscriptions if not subscription.put(event)])
+
+        if dropped:
+            with self._lock:
+                self._dropped += dropped
+
+            log.warn('Dropped events for slow subscribers', event=event.name, subscribers=dropped)
+
+    def close(self) -> None:
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            subscription.close()
+
+    def get_stats(self) -> EventPublisherStats:
+        with self._lock:
+            return EventPublisherStats(len(self._subscriptions), self._published, self._dropped)
+
+    def _unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+        log.info('Subscriber removed', subscribers=len(self._subscriptions))
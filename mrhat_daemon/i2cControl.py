@@ -3,20 +3,23 @@
 # SPDX-License-Identifier: MIT
 
 import time
-from dataclasses import dataclass
+from dataclasses import dataclass, asdict
+from functools import wraps
 from threading import Lock
 from typing import Any, Callable, Optional, Union
 
 import pigpio
 from context_logger import get_logger
 
-from mrhat_daemon import IPiGpio
+from mrhat_daemon import IPiGpio, SingleFlight, RetryPolicy, RetryConfig, I2CMetrics, I2CTransaction
 
 log = get_logger('I2CControl')
 
 I2C_NO_DEVICE = -1
 I2C_ERR_CLEAN = 0x80
 
+PIGPIO_ERROR_CODES = {pigpio.error_text(code): code for code in range(-150, 0)}
+
 
 @dataclass
 class I2CConfig:
@@ -24,6 +27,11 @@ class I2CConfig:
     address: int
     retry_limit: int
     retry_delay: float
+    retry_max_delay: float = 2.0
+    retry_jitter: float = 0.5
+    breaker_threshold: int = 3
+    breaker_timeout: float = 10.0
+    verify_writes: bool = False
 
 
 class I2CError(Exception):
@@ -52,25 +60,53 @@ class II2CControl(object):
     def close_device(self) -> None:
         raise NotImplementedError()
 
-    def read_block_data(self, length: int) -> list[int]:
+    def read_block_data(self, length: int, bypass_breaker: bool = False) -> list[int]:
+        raise NotImplementedError()
+
+    def read_registers(self, start: int, count: int) -> list[int]:
         raise NotImplementedError()
 
     def write_register(self, register: int, data: int) -> None:
         raise NotImplementedError()
 
+    def write_registers(self, start: int, data: list[int]) -> None:
+        raise NotImplementedError()
 
-class I2CControl(II2CControl):
+    def write_values(self, values: dict[int, int]) -> None:
+        raise NotImplementedError()
 
-    def __init__(self, pi_gpio: IPiGpio, config: I2CConfig):
-        self._pi_gpio = pi_gpio
+    def update_register(self, register: int, set_mask: int, clear_mask: int) -> int:
+        raise NotImplementedError()
+
+    def read_modify_write(self, start: int, count: int, modify: Callable[[list[int]], dict[int, int]]) -> list[int]:
+        raise NotImplementedError()
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        raise NotImplementedError()
+
+
+class I2CControlBase(II2CControl):
+
+    def __init__(self, config: I2CConfig):
         self._i2c_bus_id = config.bus_id
         self._i2c_address = config.address
-        self._retry_limit = config.retry_limit
-        self._retry_delay = config.retry_delay
+        self._retry_policy = RetryPolicy(
+            RetryConfig(
+                config.retry_limit,
+                config.retry_delay,
+                config.retry_max_delay,
+                config.retry_jitter,
+                config.breaker_threshold,
+                config.breaker_timeout,
+            )
+        )
+        self._verify_writes = config.verify_writes
         self._device = I2C_NO_DEVICE
         self._lock = Lock()
+        self._single_flight = SingleFlight()
+        self._metrics = I2CMetrics()
 
-    def __enter__(self) -> 'I2CControl':
+    def __enter__(self) -> 'I2CControlBase':
         return self
 
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
@@ -79,37 +115,231 @@ class I2CControl(II2CControl):
     def open_device(self) -> None:
         with self._lock:
             if self._device == I2C_NO_DEVICE:
-                control = self._pi_gpio.get_control()
-                self._device = control.i2c_open(self._i2c_bus_id, self._i2c_address)
+                self._device = self._open()
                 log.info('Opened I2C device', bus=self._i2c_bus_id, address=self._i2c_address, device=self._device)
 
     def close_device(self) -> None:
         with self._lock:
             if self._device != I2C_NO_DEVICE:
-                control = self._pi_gpio.get_control()
-                control.i2c_close(self._device)
+                self._close()
                 log.info('Closed I2C device', bus=self._i2c_bus_id, address=self._i2c_address, device=self._device)
                 self._device = I2C_NO_DEVICE
 
-    def read_block_data(self, length: int) -> list[int]:
-        return list(self._i2c_transaction(self._read_block_data, length))
+    def read_block_data(self, length: int, bypass_breaker: bool = False) -> list[int]:
+        if bypass_breaker:
+            # Not joined with other reads, a flight rejected by the open circuit breaker would fail this one too
+            return list(self._i2c_transaction(self._read_block_data, length, bypass_breaker=True))
+
+        return list(self._coalesced_transaction(self._read_block_data, length))
+
+    def read_registers(self, start: int, count: int) -> list[int]:
+        return list(self._coalesced_transaction(self._read_registers, start, count))
 
     def write_register(self, register: int, data: int) -> None:
         self._i2c_transaction(self._write_register, register, data)
 
-    def _i2c_transaction(self, operation: Callable[..., Any], *args: Any) -> Any:
+    def write_registers(self, start: int, data: list[int]) -> None:
+        self._i2c_transaction(self._write_registers, start, data)
+
+    def write_values(self, values: dict[int, int]) -> None:
+        self._i2c_transaction(self._write_values, values)
+
+    def update_register(self, register: int, set_mask: int, clear_mask: int) -> int:
+        result: int = self._i2c_transaction(self._update_register, register, set_mask, clear_mask)
+        return result
+
+    def read_modify_write(self, start: int, count: int, modify: Callable[[list[int]], dict[int, int]]) -> list[int]:
+        return list(self._i2c_transaction(self._read_modify_write, start, count, modify))
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        return {
+            'retry_policy': asdict(self._retry_policy.get_status()),
+            'coalesced_reads': self._single_flight.get_coalesced_count(),
+            'operations': self._metrics.get_metrics(),
+        }
+
+    def _coalesced_transaction(self, operation: Callable[..., Any], *args: Any) -> Any:
+        flight, leader = self._single_flight.join((operation.__name__, *args))
+
+        if not leader:
+            return flight.wait()
+
+        @wraps(operation)
+        def started_operation(*operation_args: Any) -> Any:
+            # Callers arriving after the bus transfer started must not receive data read before they asked for it
+            self._single_flight.close(flight)
+            return operation(*operation_args)
+
+        try:
+            result = self._i2c_transaction(started_operation, *args)
+        except Exception as error:
+            flight.fail(error)
+            raise
+        finally:
+            self._single_flight.close(flight)
+
+        flight.complete(result)
+
+        return result
+
+    def _i2c_transaction(self, operation: Callable[..., Any], *args: Any, bypass_breaker: bool = False) -> Any:
         self.open_device()
 
-        with self._lock:
-            for retry in range(0, self._retry_limit + 1):
+        name = operation.__name__.lstrip('_')
+        attempts = 0
+
+        def attempt() -> Any:
+            nonlocal attempts
+
+            if attempts:
+                self._metrics.record_retry(name)
+            attempts += 1
+
+            # The bus is only held for a single attempt, so other callers can proceed during the backoff
+            with self._lock:
+                started = time.perf_counter()
+                error_code = None
                 try:
                     return operation(*args)
                 except I2CError as error:
-                    if retry == self._retry_limit:
-                        log.error(f'{error.message} -> giving up', error=error, retry=retry)
-                        raise error
-                    log.warn(f'{error.message} -> retrying', error=error, retry=retry)
-                    time.sleep(self._retry_delay)
+                    error_code = self._get_error_code(error)
+                    raise error
+                finally:
+                    self._metrics.record_attempt(name, time.perf_counter() - started, error_code)
+
+        return self._retry_policy.execute(attempt, I2CError, bypass_breaker)
+
+    def _get_error_code(self, error: I2CError) -> str:
+        if isinstance(error.error, int) and error.error < 0:
+            return str(error.error)
+
+        if isinstance(error.error, str):
+            return error.error
+
+        return 'incomplete'
+
+    def _write_and_verify(self, ranges: list[tuple[int, list[int]]]) -> None:
+        transaction = I2CTransaction()
+
+        for start, data in ranges:
+            transaction.write(start, data)
+
+        # Read back only after every range is written, so a verified write is still a single transfer
+        for start, data in ranges:
+            transaction.read(start, len(data))
+
+        for (start, data), result in zip(ranges, self._execute(transaction)):
+            if result != data:
+                raise I2CError('Failed to verify I2C register write', error='mismatch', data=result, register=start)
+
+            log.info('I2C register write verified', register=start, data=data)
+
+    def _write_register(self, register: int, data: int) -> None:
+        if self._verify_writes:
+            self._write_and_verify([(register, [data])])
+        else:
+            self._write_byte_data(register, data)
+
+    def _write_registers(self, start: int, data: list[int]) -> None:
+        if self._verify_writes:
+            self._write_and_verify([(start, data)])
+        else:
+            self._write_block_data(start, data)
+
+    def _update_register(self, register: int, set_mask: int, clear_mask: int) -> int:
+        current = self._read_byte_data(register)
+        value = (current & ~clear_mask | set_mask) & 0xFF
+
+        if value != current:
+            self._write_register(register, value)
+
+        log.info('I2C register update completed', register=register, previous=current, data=value)
+
+        return value
+
+    def _read_modify_write(self, start: int, count: int, modify: Callable[[list[int]], dict[int, int]]) -> list[int]:
+        registers = self._read_registers(start, count) if count else []
+        values = modify(registers)
+
+        self._write_values(values)
+
+        log.info('I2C register read-modify-write completed', start=start, count=count, data=values)
+
+        return registers
+
+    def _write_values(self, values: dict[int, int]) -> None:
+        ranges = self._get_contiguous_ranges(values)
+
+        if not ranges:
+            return
+
+        if self._verify_writes:
+            self._write_and_verify(ranges)
+        else:
+            # All non-contiguous ranges go out in a single transfer, the device never sees a partly written map
+            transaction = I2CTransaction()
+
+            for range_start, data in ranges:
+                transaction.write(range_start, data)
+
+            self._execute(transaction)
+
+    def _get_contiguous_ranges(self, values: dict[int, int]) -> list[tuple[int, list[int]]]:
+        ranges: list[tuple[int, list[int]]] = []
+
+        for register in sorted(values):
+            if ranges and ranges[-1][0] + len(ranges[-1][1]) == register:
+                ranges[-1][1].append(values[register])
+            else:
+                ranges.append((register, [values[register]]))
+
+        return ranges
+
+    def _open(self) -> int:
+        raise NotImplementedError()
+
+    def _close(self) -> None:
+        raise NotImplementedError()
+
+    def _read_block_data(self, length: int) -> list[int]:
+        raise NotImplementedError()
+
+    def _read_registers(self, start: int, count: int) -> list[int]:
+        raise NotImplementedError()
+
+    def _read_byte_data(self, register: int) -> int:
+        raise NotImplementedError()
+
+    def _execute(self, transaction: I2CTransaction) -> list[list[int]]:
+        raise NotImplementedError()
+
+    def _write_byte_data(self, register: int, data: int) -> None:
+        raise NotImplementedError()
+
+    def _write_block_data(self, start: int, data: list[int]) -> None:
+        raise NotImplementedError()
+
+
+class I2CControl(I2CControlBase):
+
+    def __init__(self, pi_gpio: IPiGpio, config: I2CConfig):
+        super().__init__(config)
+        self._pi_gpio = pi_gpio
+
+    def _open(self) -> int:
+        control = self._pi_gpio.get_control()
+        device: int = control.i2c_open(self._i2c_bus_id, self._i2c_address)
+        return device
+
+    def _close(self) -> None:
+        control = self._pi_gpio.get_control()
+        control.i2c_close(self._device)
+
+    def _get_error_code(self, error: I2CError) -> str:
+        if isinstance(error.error, pigpio.error):
+            return str(PIGPIO_ERROR_CODES.get(error.error.value, error.error.value))
+
+        return super()._get_error_code(error)
 
     def _read_block_data(self, length: int) -> list[int]:
         control = self._pi_gpio.get_control()
@@ -130,7 +360,59 @@ class I2CControl(II2CControl):
 
         return data
 
-    def _write_register(self, register: int, data: int) -> None:
+    def _read_registers(self, start: int, count: int) -> list[int]:
+        control = self._pi_gpio.get_control()
+
+        try:
+            result, byte_data = control.i2c_read_i2c_block_data(self._device, start, count)
+            data = [x for x in byte_data]
+        except pigpio.error as error:
+            raise I2CError('Failed to read I2C registers (exception)', error=error, data=[], register=start)
+
+        if result < 0:
+            raise I2CError('Failed to read I2C registers (error code)', error=result, data=data, register=start)
+
+        if result != count:
+            raise I2CError('Failed to read I2C registers (incomplete)', error=result, data=data, register=start)
+
+        log.info('I2C register read completed', register=start, data=data)
+
+        return data
+
+    def _execute(self, transaction: I2CTransaction) -> list[list[int]]:
+        control = self._pi_gpio.get_control()
+        length = transaction.get_read_length()
+
+        try:
+            count, byte_data = control.i2c_zip(self._device, transaction.encode())
+            data = [x for x in byte_data]
+        except pigpio.error as error:
+            raise I2CError('Failed to execute I2C transaction (exception)', error=error, data=[])
+
+        if count < 0:
+            raise I2CError('Failed to execute I2C transaction (error code)', error=count, data=data)
+
+        if count != length:
+            raise I2CError('Failed to execute I2C transaction (incomplete)', error=count, data=data)
+
+        log.info('I2C transaction completed', data=data)
+
+        return transaction.split(data)
+
+    def _read_byte_data(self, register: int) -> int:
+        control = self._pi_gpio.get_control()
+
+        try:
+            data: int = control.i2c_read_byte_data(self._device, register)
+        except pigpio.error as error:
+            raise I2CError('Failed to read I2C register (exception)', error=error, data=[], register=register)
+
+        if data < 0:
+            raise I2CError('Failed to read I2C register (error code)', error=data, data=[], register=register)
+
+        return data
+
+    def _write_byte_data(self, register: int, data: int) -> None:
         control = self._pi_gpio.get_control()
 
         try:
@@ -142,3 +424,16 @@ class I2CControl(II2CControl):
             raise I2CError('Failed to write I2C register (error code)', error=result, data=data, register=register)
 
         log.info('I2C register write completed', result=result, data=data)
+
+    def _write_block_data(self, start: int, data: list[int]) -> None:
+        control = self._pi_gpio.get_control()
+
+        try:
+            result: int = control.i2c_write_i2c_block_data(self._device, start, data)
+        except pigpio.error as error:
+            raise I2CError('Failed to write I2C registers (exception)', error=error, data=data, register=start)
+
+        if result < 0:
+            raise I2CError('Failed to write I2C registers (error code)', error=result, data=data, register=start)
+
+        log.info('I2C registers write completed', result=result, register=start, data=data)
@@ -0,0 +1,131 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import errno
+import fcntl
+import os
+from ctypes import Structure, POINTER, c_uint8, c_uint16, c_uint32, cast
+from typing import Any, Optional
+
+from context_logger import get_logger
+
+from mrhat_daemon import I2CConfig, I2CControlBase, I2CError, I2CTransaction, I2CMessage
+
+log = get_logger('I2CDevControl')
+
+I2C_RDWR = 0x0707
+I2C_M_RD = 0x0001
+
+
+class I2CMsg(Structure):
+    _fields_ = [('addr', c_uint16), ('flags', c_uint16), ('len', c_uint16), ('buf', POINTER(c_uint8))]
+
+
+class I2CRdwrIoctlData(Structure):
+    _fields_ = [('msgs', POINTER(I2CMsg)), ('nmsgs', c_uint32)]
+
+
+class IDeviceFile(object):
+
+    def open(self, path: str) -> int:
+        raise NotImplementedError()
+
+    def close(self, fd: int) -> None:
+        raise NotImplementedError()
+
+    def ioctl(self, fd: int, request: int, argument: Any) -> int:
+        raise NotImplementedError()
+
+
+class DeviceFile(IDeviceFile):
+
+    def open(self, path: str) -> int:
+        return os.open(path, os.O_RDWR)
+
+    def close(self, fd: int) -> None:
+        os.close(fd)
+
+    def ioctl(self, fd: int, request: int, argument: Any) -> int:
+        result: int = fcntl.ioctl(fd, request, argument)
+        return result
+
+
+class I2CDevControl(I2CControlBase):
+
+    def __init__(
+        self, config: I2CConfig, device_file: IDeviceFile = DeviceFile(), device_path: Optional[str] = None
+    ) -> None:
+        super().__init__(config)
+        self._device_file = device_file
+        self._device_path = device_path if device_path else f'/dev/i2c-{config.bus_id}'
+
+    def _open(self) -> int:
+        return self._device_file.open(self._device_path)
+
+    def _close(self) -> None:
+        self._device_file.close(self._device)
+
+    def _get_error_code(self, error: I2CError) -> str:
+        if isinstance(error.error, OSError) and error.error.errno is not None:
+            return errno.errorcode.get(error.error.errno, str(error.error.errno))
+
+        return super()._get_error_code(error)
+
+    def _read_block_data(self, length: int) -> list[int]:
+        data = self._transfer([I2CMessage(True, length)], 'read I2C block data')
+
+        log.info('I2C block data read completed', data=data)
+
+        return data
+
+    def _read_registers(self, start: int, count: int) -> list[int]:
+        data = self._transfer(I2CTransaction().read(start, count).get_messages(), 'read I2C registers', start)
+
+        log.info('I2C register read completed', register=start, data=data)
+
+        return data
+
+    def _read_byte_data(self, register: int) -> int:
+        return self._transfer(I2CTransaction().read(register, 1).get_messages(), 'read I2C register', register)[0]
+
+    def _execute(self, transaction: I2CTransaction) -> list[list[int]]:
+        data = self._transfer(transaction.get_messages(), 'execute I2C transaction')
+
+        log.info('I2C transaction completed', data=data)
+
+        return transaction.split(data)
+
+    def _write_byte_data(self, register: int, data: int) -> None:
+        self._transfer(I2CTransaction().write(register, [data]).get_messages(), 'write I2C register', register)
+
+        log.info('I2C register write completed', data=data)
+
+    def _write_block_data(self, start: int, data: list[int]) -> None:
+        self._transfer(I2CTransaction().write(start, data).get_messages(), 'write I2C registers', start)
+
+        log.info('I2C registers write completed', register=start, data=data)
+
+    def _transfer(self, messages: list[I2CMessage], operation: str, register: Optional[int] = None) -> list[int]:
+        buffers = [(c_uint8 * message.length)(*message.data) for message in messages]
+        i2c_messages = (I2CMsg * len(messages))(
+            *[
+                I2CMsg(self._i2c_address, self._get_flags(message), message.length, cast(buffer, POINTER(c_uint8)))
+                for message, buffer in zip(messages, buffers)
+            ]
+        )
+
+        try:
+            result = self._device_file.ioctl(self._device, I2C_RDWR, I2CRdwrIoctlData(i2c_messages, len(messages)))
+        except OSError as error:
+            raise I2CError(f'Failed to {operation} (exception)', error=error, data=[], register=register)
+
+        data = [value for message, buffer in zip(messages, buffers) if message.read for value in buffer]
+
+        if result != len(messages):
+            raise I2CError(f'Failed to {operation} (incomplete)', error=result, data=data, register=register)
+
+        return data
+
+    def _get_flags(self, message: I2CMessage) -> int:
+        return I2C_M_RD if message.read else 0
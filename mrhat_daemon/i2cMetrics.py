@@ -0,0 +1,81 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from bisect import bisect_left
+from typing import Any, Optional
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+
+
+class LatencyHistogram(object):
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._count = 0
+        self._sum = 0.0
+
+    def record(self, seconds: float) -> None:
+        # Counters are updated without locking, a rare lost increment is acceptable for monitoring purposes
+        self._counts[bisect_left(self._buckets, seconds)] += 1
+        self._count += 1
+        self._sum += seconds
+
+    def get_snapshot(self) -> dict[str, Any]:
+        buckets = {}
+        cumulative = 0
+
+        for bound, count in zip([*map(str, self._buckets), '+Inf'], list(self._counts)):
+            cumulative += count
+            buckets[bound] = cumulative
+
+        return {'count': self._count, 'sum': self._sum, 'buckets': buckets}
+
+
+class OperationMetrics(object):
+
+    def __init__(self) -> None:
+        self.latency = LatencyHistogram()
+        self.retries = 0
+        self.errors: dict[str, int] = {}
+
+
+class II2CMetrics(object):
+
+    def record_attempt(self, operation: str, seconds: float, error_code: Optional[str] = None) -> None:
+        raise NotImplementedError()
+
+    def record_retry(self, operation: str) -> None:
+        raise NotImplementedError()
+
+    def get_metrics(self) -> dict[str, Any]:
+        raise NotImplementedError()
+
+
+class I2CMetrics(II2CMetrics):
+
+    def __init__(self) -> None:
+        self._operations: dict[str, OperationMetrics] = {}
+
+    def record_attempt(self, operation: str, seconds: float, error_code: Optional[str] = None) -> None:
+        metrics = self._get_operation(operation)
+        metrics.latency.record(seconds)
+
+        if error_code is not None:
+            metrics.errors[error_code] = metrics.errors.get(error_code, 0) + 1
+
+    def record_retry(self, operation: str) -> None:
+        self._get_operation(operation).retries += 1
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {name: self._get_snapshot(metrics) for name, metrics in list(self._operations.items())}
+
+    def _get_snapshot(self, metrics: OperationMetrics) -> dict[str, Any]:
+        return {'latency': metrics.latency.get_snapshot(), 'retries': metrics.retries, 'errors': dict(metrics.errors)}
+
+    def _get_operation(self, operation: str) -> OperationMetrics:
+        if not (metrics := self._operations.get(operation)):
+            metrics = self._operations.setdefault(operation, OperationMetrics())
+
+        return metrics
@@ -0,0 +1,67 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass, field
+
+I2C_ZIP_END = 0
+I2C_ZIP_ESCAPE = 1
+I2C_ZIP_COMBINED_ON = 2
+I2C_ZIP_READ = 6
+I2C_ZIP_WRITE = 7
+
+
+@dataclass
+class I2CMessage:
+    read: bool
+    length: int
+    data: list[int] = field(default_factory=list)
+
+
+class I2CTransaction(object):
+
+    def __init__(self) -> None:
+        # Combined mode issues a repeated start between the register address write and the data read
+        self._commands = [I2C_ZIP_COMBINED_ON]
+        self._messages: list[I2CMessage] = []
+        self._read_lengths: list[int] = []
+
+    def write(self, register: int, data: list[int]) -> 'I2CTransaction':
+        self._append_command(I2C_ZIP_WRITE, len(data) + 1)
+        self._commands.extend([register, *data])
+        self._messages.append(I2CMessage(False, len(data) + 1, [register, *data]))
+        return self
+
+    def read(self, register: int, count: int) -> 'I2CTransaction':
+        self._append_command(I2C_ZIP_WRITE, 1)
+        self._commands.append(register)
+        self._append_command(I2C_ZIP_READ, count)
+        self._messages.extend([I2CMessage(False, 1, [register]), I2CMessage(True, count)])
+        self._read_lengths.append(count)
+        return self
+
+    def get_messages(self) -> list[I2CMessage]:
+        return list(self._messages)
+
+    def encode(self) -> list[int]:
+        return [*self._commands, I2C_ZIP_END]
+
+    def get_read_length(self) -> int:
+        return sum(self._read_lengths)
+
+    def split(self, data: list[int]) -> list[list[int]]:
+        results = []
+        start = 0
+
+        for length in self._read_lengths:
+            end = start + length
+            results.append(data[start:end])
+            start = end
+
+        return results
+
+    def _append_command(self, command: int, length: int) -> None:
+        if length > 0xFF:
+            self._commands.extend([I2C_ZIP_ESCAPE, command, length & 0xFF, length >> 8])
+        else:
+            self._commands.extend([command, length])
@@ -0,0 +1,90 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Optional
+
+from context_logger import get_logger
+
+log = get_logger('InterruptCoalescer')
+
+TICK_WRAP = 1 << 32
+TICK_HALF_RANGE = 1 << 31
+
+
+@dataclass
+class InterruptCoalescerStats:
+    received: int
+    handled: int
+    coalesced: int
+
+
+def get_tick_difference(start: int, end: int) -> int:
+    # Ticks are 32-bit microsecond counters wrapping about every 72 minutes, the result is signed
+    return (end - start + TICK_HALF_RANGE) % TICK_WRAP - TICK_HALF_RANGE
+
+
+class IInterruptCoalescer(object):
+
+    def handle(self, gpio: int, level: int, tick: int) -> None:
+        raise NotImplementedError()
+
+    def get_stats(self) -> InterruptCoalescerStats:
+        raise NotImplementedError()
+
+
+class InterruptCoalescer(IInterruptCoalescer):
+
+    def __init__(
+        self, handler: Callable[[int, int, int, int], None], tick_source: Callable[[], int], debounce: float = 0.0
+    ) -> None:
+        self._handler = handler
+        self._tick_source = tick_source
+        self._debounce = int(debounce * 1_000_000)
+        self._read_tick: Optional[int] = None
+        self._received = 0
+        self._handled = 0
+        self._coalesced = 0
+        self._lock = Lock()
+
+    def handle(self, gpio: int, level: int, tick: int) -> None:
+        with self._lock:
+            self._received += 1
+
+            # The device is read after the handling started, so that read already reflects any earlier edge
+            if self._read_tick is not None and get_tick_difference(self._read_tick, tick) <= 0:
+                self._coalesced += 1
+                log.debug('Coalesced interrupt', gpio=gpio, pin_level=level, tick=tick, read_tick=self._read_tick)
+                return
+
+            self._wait_for_debounce(tick)
+
+            read_tick = self._read_tick = self._tick_source()
+            self._handled += 1
+
+        try:
+            # The handler gets the tick of its start as well, it is on the shutdown path and should not query it again
+            self._handler(gpio, level, tick, read_tick)
+        except Exception:
+            # Edges before a failed read are not covered by it
+            with self._lock:
+                self._read_tick = None
+            raise
+
+    def get_stats(self) -> InterruptCoalescerStats:
+        # Every received edge is counted as either handled or coalesced, the snapshot must not split the two
+        with self._lock:
+            return InterruptCoalescerStats(self._received, self._handled, self._coalesced)
+
+    def _wait_for_debounce(self, tick: int) -> None:
+        if self._debounce <= 0:
+            return
+
+        remaining = self._debounce - get_tick_difference(tick, self._tick_source())
+
+        if remaining > 0:
+            # Edges of the burst arriving meanwhile are reflected in the read that follows
+            time.sleep(remaining / 1_000_000)
@@ -0,0 +1,97 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import time
+from collections import deque
+from enum import Enum
+from typing import Any, Callable, Optional
+
+from mrhat_daemon import get_tick_difference
+
+LATENCY_WINDOW = 256
+LATENCY_PERCENTILES = (50, 90, 99)
+
+
+class InterruptStage(Enum):
+    HANDLER_START = 'handler_start'
+    READ_COMPLETE = 'read_complete'
+    RULES_EVALUATED = 'rules_evaluated'
+    POWER_OFF = 'power_off'
+    ACTIONS_DISPATCHED = 'actions_dispatched'
+
+
+class RollingPercentiles(object):
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._samples: deque[float] = deque(maxlen=window)
+        self._count = 0
+
+    def record(self, seconds: float) -> None:
+        self._samples.append(seconds)
+        self._count += 1
+
+    def get_snapshot(self) -> dict[str, Any]:
+        # Sorting happens only when diagnostics are requested, recording stays cheap on the interrupt path
+        samples = sorted(self._samples.copy())
+        snapshot: dict[str, Any] = {'count': self._count, 'window': len(samples)}
+
+        for percentile in LATENCY_PERCENTILES:
+            snapshot[f'p{percentile}'] = self._get_percentile(samples, percentile)
+
+        snapshot['max'] = samples[-1] if samples else None
+
+        return snapshot
+
+    def _get_percentile(self, samples: list[float], percentile: int) -> Optional[float]:
+        if not samples:
+            return None
+
+        # Nearest rank, always an observed sample
+        rank = -(-percentile * len(samples) // 100)
+        return samples[max(rank, 1) - 1]
+
+
+class IInterruptLatency(object):
+
+    def start(self, edge_tick: int, start_tick: int) -> None:
+        raise NotImplementedError()
+
+    def record(self, stage: InterruptStage) -> None:
+        raise NotImplementedError()
+
+    def get_stats(self) -> dict[str, Any]:
+        raise NotImplementedError()
+
+
+class InterruptLatency(IInterruptLatency):
+
+    def __init__(self, window: int = LATENCY_WINDOW, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self._stages = {stage: RollingPercentiles(window) for stage in InterruptStage}
+        self._edge_offset = 0.0
+        self._started = 0.0
+        self._current: dict[str, Any] = {}
+        self._last: dict[str, Any] = {}
+
+    def start(self, edge_tick: int, start_tick: int) -> None:
+        # The edge is only known in device ticks, later stages are measured from the handler start on the local clock
+        self._started = self._clock()
+        self._edge_offset = get_tick_difference(edge_tick, start_tick) / 1_000_000
+        self._current = {'tick': edge_tick}
+
+        self._record(InterruptStage.HANDLER_START, self._edge_offset)
+
+    def record(self, stage: InterruptStage) -> None:
+        self._record(stage, self._edge_offset + self._clock() - self._started)
+
+    def get_stats(self) -> dict[str, Any]:
+        stats = {stage.value: percentiles.get_snapshot() for stage, percentiles in self._stages.items()}
+        stats['last'] = self._last
+
+        return stats
+
+    def _record(self, stage: InterruptStage, seconds: float) -> None:
+        self._stages[stage].record(seconds)
+        self._current[stage.value] = seconds
+        self._last = dict(self._current)
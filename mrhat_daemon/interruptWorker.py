@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import time
+from dataclasses import dataclass
+from queue import Queue, Full, Empty
+from threading import Thread, Lock
+from typing import Callable, Optional
+
+from context_logger import get_logger
+
+log = get_logger('InterruptWorker')
+
+
+@dataclass
+class InterruptEvent:
+    gpio: int
+    level: int
+    tick: int
+    submitted: float
+
+
+@dataclass
+class InterruptWorkerStats:
+    depth: int
+    max_depth: int
+    submitted: int
+    processed: int
+    dropped: int
+    handoff_latency_average: float
+    handoff_latency_max: float
+
+
+class IInterruptWorker(object):
+
+    def start(self) -> None:
+        raise NotImplementedError()
+
+    def stop(self) -> None:
+        raise NotImplementedError()
+
+    def submit(self, gpio: int, level: int, tick: int) -> None:
+        raise NotImplementedError()
+
+    def get_stats(self) -> InterruptWorkerStats:
+        raise NotImplementedError()
+
+
+class InterruptWorker(IInterruptWorker):
+
+    def __init__(
+        self,
+        handler: Callable[[int, int, int], None],
+        queue_size: int,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        self._handler = handler
+        self._clock = clock
+        self._queue: Queue[Optional[InterruptEvent]] = Queue(queue_size)
+        self._overflow: Optional[InterruptEvent] = None
+        self._overflow_lock = Lock()
+        self._thread: Optional[Thread] = None
+        self._max_depth = 0
+        self._submitted = 0
+        self._processed = 0
+        self._dropped = 0
+        self._handoff_latency_total = 0.0
+        self._handoff_latency_max = 0.0
+        self._lock = Lock()
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread:
+                return
+
+            # Edges left over from before the connection was closed are stale, the caller reads the device anew
+            self._discard_events()
+
+            self._thread = Thread(target=self._process_events, name='InterruptWorker', daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        with self._lock:
+            thread, self._thread = self._thread, None
+
+        if thread:
+            self._queue.put(None)
+            thread.join()
+
+    def submit(self, gpio: int, level: int, tick: int) -> None:
+        # Runs on the pigpio callback thread, it must return right away whatever the worker is doing
+        event = InterruptEvent(gpio, level, tick, self._clock())
+
+        with self._overflow_lock:
+            try:
+                self._queue.put_nowait(event)
+            except Full:
+                # Queued edges may all be coalesced with a read done before this one, so the newest is kept for later
+                self._overflow = event
+                self._dropped += 1
+                return
+
+        self._submitted += 1
+        self._max_depth = max(self._max_depth, self._queue.qsize())
+
+    def get_stats(self) -> InterruptWorkerStats:
+        processed = self._processed
+        average = self._handoff_latency_total / processed if processed else 0.0
+
+        return InterruptWorkerStats(
+            self._queue.qsize(),
+            self._max_depth,
+            self._submitted,
+            processed,
+            self._dropped,
+            average,
+            self._handoff_latency_max,
+        )
+
+    def _discard_events(self) -> None:
+        with self._overflow_lock:
+            self._overflow = None
+
+        try:
+            while True:
+                self._queue.get_nowait()
+        except Empty:
+            pass
+
+    def _take_overflow(self) -> Optional[InterruptEvent]:
+        # Taken only once the queue drained, the kept edge is newer than any edge still queued
+        with self._overflow_lock:
+            if not self._queue.empty():
+                return None
+
+            event, self._overflow = self._overflow, None
+            return event
+
+    def _process_events(self) -> None:
+        while event := self._queue.get():
+            self._process_event(event)
+
+            if overflow := self._take_overflow():
+                # The newest dropped edge may have come after the last read, it must not go unhandled
+                self._process_event(overflow)
+
+    def _process_event(self, event: InterruptEvent) -> None:
+        if not self._thread:
+            # The connection is about to be closed, handling the edge would open it again
+            log.debug('Discarded interrupt on stop', gpio=event.gpio, tick=event.tick)
+            return
+
+        latency = self._clock() - event.submitted
+        self._handoff_latency_total += latency
+        self._handoff_latency_max = max(self._handoff_latency_max, latency)
+        self._processed += 1
+
+        try:
+            self._handler(event.gpio, event.level, event.tick)
+        except Exception as error:
+            log.error('Failed to process interrupt', gpio=event.gpio, tick=event.tick, error=error)
@@ -2,9 +2,10 @@
 # SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
 # SPDX-License-Identifier: MIT
 
-from dataclasses import dataclass
+import time
+from dataclasses import dataclass, asdict, field
 from enum import Enum
-from typing import Any
+from typing import Any, Optional
 
 from context_logger import get_logger
 from packaging.version import Version
@@ -26,7 +27,32 @@ from generated import (
     REG_ADDR_WR_START,
     REG_ADDR_WR_END,
 )
-from mrhat_daemon import II2CControl, IPicProgrammer, IPlatformAccess, IPiGpio, I2CError
+from mrhat_daemon import (
+    II2CControl,
+    IPicProgrammer,
+    IPlatformAccess,
+    IPiGpio,
+    I2CError,
+    RegisterCache,
+    RegisterSnapshot,
+    IWriteCoalescer,
+    WriteCoalescer,
+    Event,
+    EventPublisher,
+    ISubscription,
+    InterruptCoalescer,
+    InterruptWorker,
+    InterruptLatency,
+    InterruptStage,
+    ChangeDispatcher,
+    ChangeHandler,
+    RegisterChange,
+    Rule,
+    RuleActionType,
+    RuleEngine,
+    BatchOperation,
+    RegisterBatch,
+)
 
 log = get_logger('MrHatControl')
 
@@ -51,6 +77,13 @@ class I2CStatus(Enum):
 class MrHatControlConfig:
     upgrade_firmware: bool = False
     force_power_off: bool = False
+    register_cache_ttl: float = 0.0
+    write_coalesce_window: float = 0.0
+    event_queue_size: int = 16
+    event_subscriber_limit: int = 2
+    interrupt_debounce: float = 0.0
+    interrupt_queue_size: int = 16
+    rules: list[Rule] = field(default_factory=list)
 
 
 class IMrHatControl(object):
@@ -67,9 +100,18 @@ class IMrHatControl(object):
     def get_register(self, register: int) -> int:
         raise NotImplementedError()
 
+    def get_registers(self, start: int, count: int) -> RegisterSnapshot:
+        raise NotImplementedError()
+
+    def get_generation(self) -> Optional[int]:
+        raise NotImplementedError()
+
     def set_register(self, register: int, value: int) -> None:
         raise NotImplementedError()
 
+    def set_registers(self, values: dict[int, int]) -> None:
+        raise NotImplementedError()
+
     def get_flag(self, register: int, flag: int) -> int:
         raise NotImplementedError()
 
@@ -79,6 +121,24 @@ class IMrHatControl(object):
     def clear_flag(self, register: int, flag: int) -> None:
         raise NotImplementedError()
 
+    def update_register(self, register: int, set_mask: int, clear_mask: int) -> int:
+        raise NotImplementedError()
+
+    def execute_batch(self, operations: list[BatchOperation]) -> list[int]:
+        raise NotImplementedError()
+
+    def flush_writes(self) -> None:
+        raise NotImplementedError()
+
+    def subscribe(self) -> ISubscription:
+        raise NotImplementedError()
+
+    def subscribe_changes(self, register: int, mask: int, handler: ChangeHandler) -> None:
+        raise NotImplementedError()
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        raise NotImplementedError()
+
 
 class MrHatControl(IMrHatControl):
 
@@ -95,11 +155,34 @@ class MrHatControl(IMrHatControl):
         self._i2c_control = i2c_control
         self._platform_access = platform_access
         self._config = config
+        self._register_cache = RegisterCache(config.register_cache_ttl)
+        self._write_coalescer: Optional[IWriteCoalescer] = None
+        self._event_publisher = EventPublisher(config.event_queue_size, config.event_subscriber_limit)
+        self._last_registers: Optional[list[int]] = None
+        self._change_dispatcher = ChangeDispatcher()
+        self._rule_engine = RuleEngine(config.rules, self._change_dispatcher)
+        self._interrupt_coalescer = InterruptCoalescer(
+            self._handle_interrupt, self._get_current_tick, config.interrupt_debounce
+        )
+        self._interrupt_latency = InterruptLatency()
+        self._interrupt_worker = InterruptWorker(self._interrupt_coalescer.handle, config.interrupt_queue_size)
+
+        if config.write_coalesce_window > 0:
+            self._write_coalescer = WriteCoalescer(self._write_values, config.write_coalesce_window)
 
     def __enter__(self) -> 'MrHatControl':
         return self
 
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        try:
+            self.flush_writes()
+        except Exception as error:
+            log.error('Failed to flush pending writes', error=error)
+
+        if self._write_coalescer:
+            self._write_coalescer.close()
+
+        self._event_publisher.close()
         self._close_connection()
 
     def initialize(self) -> None:
@@ -121,31 +204,115 @@ class MrHatControl(IMrHatControl):
         return list(range(REG_ADDR_WR_START, REG_ADDR_WR_END + 1))
 
     def get_register(self, register: int) -> int:
-        registers = self._get_device_registers()
-        return registers[register]
+        return self.get_registers(register, 1).registers[0]
+
+    def get_registers(self, start: int, count: int) -> RegisterSnapshot:
+        self._flush_before_read()
+
+        if self._config.register_cache_ttl > 0:
+            # The whole register space is read in one transfer, whichever part of it was requested
+            snapshot = self._register_cache.get_snapshot(self._get_device_registers)
+            end = start + count
+            return RegisterSnapshot(snapshot.registers[start:end], snapshot.timestamp, snapshot.generation)
+
+        registers = self._i2c_control.read_registers(start, count)
+        return RegisterSnapshot(registers, time.time(), self._register_cache.observe(start, registers))
+
+    def get_generation(self) -> Optional[int]:
+        self._flush_before_read()
+        return self._register_cache.get_generation()
 
     def set_register(self, register: int, value: int) -> None:
-        self._i2c_control.write_register(register, value)
+        if self._write_coalescer:
+            self._write_coalescer.write({register: value})
+        else:
+            self._write_register(register, value)
+
+    def set_registers(self, values: dict[int, int]) -> None:
+        if self._write_coalescer:
+            self._write_coalescer.write(values)
+        else:
+            self._write_values(values)
 
     def get_flag(self, register: int, flag: int) -> int:
-        registers = self._get_device_registers()
-        return (registers[register] & (1 << flag)) >> flag
+        value = self.get_register(register)
+        return (value & (1 << flag)) >> flag
 
     def set_flag(self, register: int, flag: int) -> None:
-        registers = self._get_device_registers()
-        value = registers[register] | (1 << flag)
-        self._i2c_control.write_register(register, value)
+        self.update_register(register, 1 << flag, 0)
 
     def clear_flag(self, register: int, flag: int) -> None:
-        registers = self._get_device_registers()
-        value = registers[register] & ~(1 << flag)
-        self._i2c_control.write_register(register, value)
+        self.update_register(register, 0, 1 << flag)
+
+    def update_register(self, register: int, set_mask: int, clear_mask: int) -> int:
+        self.flush_writes()
+
+        try:
+            return self._i2c_control.update_register(register, set_mask, clear_mask)
+        finally:
+            self._register_cache.invalidate()
+
+    def execute_batch(self, operations: list[BatchOperation]) -> list[int]:
+        batch = RegisterBatch(operations)
+        start, count = batch.get_read_range()
+
+        if not batch.has_writes():
+            batch.apply(self.get_registers(start, count).registers)
+            return batch.get_results()
+
+        self.flush_writes()
+
+        try:
+            self._i2c_control.read_modify_write(start, count, batch.apply)
+        finally:
+            self._register_cache.invalidate()
+
+        return batch.get_results()
+
+    def flush_writes(self) -> None:
+        if self._write_coalescer:
+            self._write_coalescer.flush()
+
+    def subscribe(self) -> ISubscription:
+        return self._event_publisher.subscribe()
+
+    def subscribe_changes(self, register: int, mask: int, handler: ChangeHandler) -> None:
+        self._change_dispatcher.subscribe(register, mask, handler)
+
+    def get_diagnostics(self) -> dict[str, Any]:
+        diagnostics = {
+            'register_cache': asdict(self._register_cache.get_stats()),
+            'events': asdict(self._event_publisher.get_stats()),
+            'interrupts': asdict(self._interrupt_coalescer.get_stats()),
+            'interrupt_worker': asdict(self._interrupt_worker.get_stats()),
+            'interrupt_latency': self._interrupt_latency.get_stats(),
+            'i2c': self._i2c_control.get_diagnostics(),
+        }
+
+        if self._write_coalescer:
+            diagnostics['write_coalescer'] = asdict(self._write_coalescer.get_stats())
+
+        return diagnostics
+
+    def _flush_before_read(self) -> None:
+        try:
+            self.flush_writes()
+        except Exception as error:
+            # Failed writes stay pending and are retried in the background, they must not fail unrelated reads
+            log.warn('Failed to flush pending writes before read', error=error)
 
     def _open_connection(self) -> None:
-        self._pi_gpio.start(self._handle_interrupt)
+        self._interrupt_worker.start()
+        self._pi_gpio.start(self._interrupt_worker.submit)
         self._i2c_control.open_device()
 
+    def _get_current_tick(self) -> int:
+        tick: int = self._pi_gpio.get_control().get_current_tick()
+        return tick
+
     def _close_connection(self) -> None:
+        # A handler running after the connection is closed would restart pigpiod and reopen the device
+        self._interrupt_worker.stop()
         self._i2c_control.close_device()
         self._pi_gpio.stop()
 
@@ -158,6 +325,9 @@ class MrHatControl(IMrHatControl):
 
             registers = self._get_device_registers()
 
+        self._register_cache.update(registers)
+        self._last_registers = registers
+
         return registers
 
     def _get_device_status(self, registers: list[int]) -> list[DeviceStatus]:
@@ -180,6 +350,8 @@ class MrHatControl(IMrHatControl):
         return False
 
     def _upgrade_firmware(self) -> None:
+        self._register_cache.invalidate()
+
         self._close_connection()
 
         self._pic_programmer.upgrade_firmware()
@@ -189,6 +361,31 @@ class MrHatControl(IMrHatControl):
     def _get_device_registers(self) -> list[int]:
         return self._i2c_control.read_block_data(REGISTER_SPACE_LENGTH)
 
+    def _write_register(self, register: int, value: int) -> None:
+        try:
+            self._i2c_control.write_register(register, value)
+        finally:
+            self._register_cache.invalidate()
+
+    def _write_values(self, values: dict[int, int]) -> None:
+        try:
+            self._i2c_control.write_values(values)
+        finally:
+            self._register_cache.invalidate()
+
+    def _get_changes(self, registers: list[int]) -> list[RegisterChange]:
+        previous, self._last_registers = self._last_registers, registers
+
+        if previous is None:
+            return []
+
+        return self._change_dispatcher.dispatch(previous, registers)
+
+    def _publish_changes(self, changes: list[RegisterChange]) -> None:
+        if changes:
+            event_changes = [asdict(change) for change in changes]
+            self._event_publisher.publish(Event('registers', {'timestamp': time.time(), 'changes': event_changes}))
+
     def _get_status_flags(self, registers: list[int]) -> list[DeviceStatus]:
         return [flag for flag in DeviceStatus if registers[REG_STAT_0_ADDR] & flag.value]
 
@@ -203,20 +400,60 @@ class MrHatControl(IMrHatControl):
         target_firmware = self._pic_programmer.load_firmware()
         return target_firmware.version if target_firmware else Version('0.0.0')
 
-    def _handle_interrupt(self, gpio: int, level: int, tick: int) -> None:
+    def _handle_interrupt(self, gpio: int, level: int, tick: int, current_tick: int) -> None:
+        self._interrupt_latency.start(tick, current_tick)
+
         log.info('Received interrupt from the device', gpio=gpio, pin_level=level, tick=tick)
 
-        registers = self._get_device_registers()
+        self._register_cache.invalidate()
+
+        # Device requests like shutdown must get through even while API traffic keeps the circuit breaker open
+        registers = self._i2c_control.read_block_data(REGISTER_SPACE_LENGTH, bypass_breaker=True)
+        self._interrupt_latency.record(InterruptStage.READ_COMPLETE)
+        self._register_cache.update(registers)
+
+        changes = self._get_changes(registers)
+        self._publish_changes(changes)
+
+        rules = self._rule_engine.evaluate(changes)
         status = self._get_device_status(registers)
+        self._interrupt_latency.record(InterruptStage.RULES_EVALUATED)
 
+        # Rule writes may retry with backoff, they must not hold up the shutdown
         if DeviceStatus.SHUTDOWN_REQUESTED in status:
-            force_power_off = self._config.force_power_off
+            self._power_off()
+            self._interrupt_latency.record(InterruptStage.POWER_OFF)
+
+        for rule in rules:
+            self._execute_rule(rule, registers)
+
+        self._interrupt_latency.record(InterruptStage.ACTIONS_DISPATCHED)
+
+    def _power_off(self) -> None:
+        force_power_off = self._config.force_power_off
 
-            log.info("Shutdown request received, issuing 'poweroff' command", force=force_power_off)
+        log.info("Shutdown request received, issuing 'poweroff' command", force=force_power_off)
 
-            shutdown_command = ['poweroff']
+        shutdown_command = ['poweroff']
 
-            if force_power_off:
-                shutdown_command.append('--force')
+        if force_power_off:
+            shutdown_command.append('--force')
 
-            self._platform_access.execute_command_async(shutdown_command)
+        self._platform_access.execute_command_async(shutdown_command)
+
+    def _execute_rule(self, rule: Rule, registers: list[int]) -> None:
+        action = rule.action
+
+        log.info('Rule triggered', rule=rule.name, action=action.type.value)
+
+        try:
+            if action.type == RuleActionType.COMMAND:
+                self._platform_access.execute_command_async(list(action.command))
+            elif action.type == RuleActionType.WRITE:
+                self.set_register(action.register, action.value)
+            else:
+                value = registers[rule.register]
+                data = {'timestamp': time.time(), 'rule': rule.name, 'register': rule.register, 'value': value}
+                self._event_publisher.publish(Event(action.event, data))
+        except Exception as error:
+            log.error('Failed to execute rule action', rule=rule.name, action=action.type.value, error=error)
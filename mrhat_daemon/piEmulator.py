@@ -0,0 +1,322 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from queue import Queue
+from threading import Lock, Thread
+from typing import Callable, Generator, Optional
+
+import pigpio
+from context_logger import get_logger
+
+from generated import REG_ADDR_RD_END, REG_ADDR_WR_START, REG_ADDR_WR_END
+from mrhat_daemon import I2C_ZIP_END, I2C_ZIP_ESCAPE, I2C_ZIP_READ, I2C_ZIP_WRITE
+
+log = get_logger('PiEmulator')
+
+I2C_ZIP_SET_ADDRESS = 4
+I2C_ZIP_SET_FLAGS = 5
+
+
+@dataclass
+class DeviceEmulatorConfig:
+    interrupt_pin: int = 22
+    operation_latency: float = 0.0
+    byte_latency: float = 0.0
+    registers: dict[int, int] = field(default_factory=dict)
+
+
+class IInterruptListener(object):
+
+    def notify_interrupt(self, gpio: int) -> None:
+        raise NotImplementedError()
+
+
+class DeviceEmulator(object):
+
+    def __init__(self, config: DeviceEmulatorConfig = DeviceEmulatorConfig()) -> None:
+        self._config = config
+        self._registers = [0] * (REG_ADDR_RD_END + 1)
+        self._pointer = 0
+        self._listeners: list[IInterruptListener] = []
+        self._handles: set[int] = set()
+        self._next_handle = 0
+        self._transfers = 0
+        self._bus_lock = Lock()
+        self._lock = Lock()
+
+        for register, value in config.registers.items():
+            self._registers[register] = value & 0xFF
+
+    def attach(self, listener: IInterruptListener) -> None:
+        with self._lock:
+            self._listeners.append(listener)
+
+    def detach(self, listener: IInterruptListener) -> None:
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def fire_interrupt(self) -> None:
+        with self._lock:
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            listener.notify_interrupt(self._config.interrupt_pin)
+
+    def open_handle(self) -> int:
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            self._handles.add(handle)
+            return handle
+
+    def close_handle(self, handle: int) -> bool:
+        with self._lock:
+            if handle in self._handles:
+                self._handles.remove(handle)
+                return True
+
+            return False
+
+    def is_handle_open(self, handle: int) -> bool:
+        with self._lock:
+            return handle in self._handles
+
+    def get_register(self, register: int) -> int:
+        with self._bus_lock:
+            return self._registers[register]
+
+    def set_register(self, register: int, value: int) -> None:
+        with self._bus_lock:
+            self._registers[register] = value & 0xFF
+
+    def get_transfer_count(self) -> int:
+        return self._transfers
+
+    @contextmanager
+    def transfer(self, length: int) -> Generator[None, None, None]:
+        # The bus is shared, a transfer holds it for its whole duration
+        with self._bus_lock:
+            latency = self._config.operation_latency + self._config.byte_latency * length
+
+            if latency > 0:
+                time.sleep(latency)
+
+            try:
+                yield
+            finally:
+                # A stop condition ends every transfer, the device resets its register pointer
+                self._pointer = 0
+                self._transfers += 1
+
+    def read(self, count: int) -> list[int]:
+        data = []
+
+        for _ in range(count):
+            data.append(self._registers[self._pointer] if self._pointer < len(self._registers) else 0)
+            self._pointer += 1
+
+        return data
+
+    def write(self, data: list[int]) -> None:
+        if not data:
+            return
+
+        self._pointer = data[0]
+
+        for value in data[1:]:
+            # Like the firmware, writes to read-only registers are silently ignored
+            if REG_ADDR_WR_START <= self._pointer <= REG_ADDR_WR_END:
+                self._registers[self._pointer] = value & 0xFF
+            self._pointer += 1
+
+
+class EmulatedCallback(object):
+
+    def __init__(self, gpio: int, edge: int, handler: Callable[[int, int, int], None], cancel: Callable[..., None]):
+        self.gpio = gpio
+        self.edge = edge
+        self.handler = handler
+        self._cancel = cancel
+
+    def cancel(self) -> None:
+        self._cancel(self)
+
+
+class PiEmulator(IInterruptListener):
+
+    def __init__(self, device: DeviceEmulator, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.connected = True
+        self._device = device
+        self._clock = clock
+        self._started = clock()
+        self._modes: dict[int, int] = {}
+        self._levels: dict[int, int] = {}
+        self._callbacks: list[EmulatedCallback] = []
+        self._edges: Queue[Optional[tuple[int, int, int]]] = Queue()
+        self._lock = Lock()
+
+        # Like pigpio, callbacks are dispatched one by one on a single notification thread
+        self._dispatcher = Thread(target=self._dispatch_edges, daemon=True)
+        self._dispatcher.start()
+
+        device.attach(self)
+
+    def stop(self) -> None:
+        if self.connected:
+            self.connected = False
+            self._device.detach(self)
+            self._edges.put(None)
+            self._dispatcher.join()
+
+    def notify_interrupt(self, gpio: int) -> None:
+        idle_level = self._levels.get(gpio, 1)
+
+        # The device signals an interrupt with a pulse, both edges are reported
+        self._edges.put((gpio, 1 - idle_level, self.get_current_tick()))
+        self._edges.put((gpio, idle_level, self.get_current_tick()))
+
+    def get_current_tick(self) -> int:
+        return int((self._clock() - self._started) * 1_000_000) & 0xFFFFFFFF
+
+    def set_mode(self, gpio: int, mode: int) -> int:
+        self._modes[gpio] = mode
+        return 0
+
+    def set_pull_up_down(self, gpio: int, pud: int) -> int:
+        self._levels[gpio] = 0 if pud == pigpio.PUD_DOWN else 1
+        return 0
+
+    def read(self, gpio: int) -> int:
+        return self._levels.get(gpio, 0)
+
+    def callback(self, user_gpio: int, edge: int, func: Callable[[int, int, int], None]) -> EmulatedCallback:
+        callback = EmulatedCallback(user_gpio, edge, func, self._cancel_callback)
+
+        with self._lock:
+            self._callbacks.append(callback)
+
+        return callback
+
+    def i2c_open(self, i2c_bus: int, i2c_address: int, i2c_flags: int = 0) -> int:
+        self._check_connection()
+
+        # Like pigpio, handles belong to the daemon side, so they outlive a single connection
+        handle = self._device.open_handle()
+
+        log.debug('Opened emulated I2C device', bus=i2c_bus, address=i2c_address, handle=handle)
+
+        return handle
+
+    def i2c_close(self, handle: int) -> int:
+        self._check_connection()
+
+        if not self._device.close_handle(handle):
+            raise pigpio.error(pigpio.error_text(pigpio.PI_BAD_HANDLE))
+
+        return 0
+
+    def i2c_read_device(self, handle: int, count: int) -> tuple[int, bytearray]:
+        with self._transfer(handle, count):
+            data = self._device.read(count)
+
+        return len(data), bytearray(data)
+
+    def i2c_read_i2c_block_data(self, handle: int, reg: int, count: int) -> tuple[int, bytearray]:
+        with self._transfer(handle, count + 1):
+            self._device.write([reg])
+            data = self._device.read(count)
+
+        return len(data), bytearray(data)
+
+    def i2c_read_byte_data(self, handle: int, reg: int) -> int:
+        with self._transfer(handle, 2):
+            self._device.write([reg])
+            return self._device.read(1)[0]
+
+    def i2c_write_byte_data(self, handle: int, reg: int, byte_val: int) -> int:
+        with self._transfer(handle, 2):
+            self._device.write([reg, byte_val])
+
+        return 0
+
+    def i2c_write_i2c_block_data(self, handle: int, reg: int, data: list[int]) -> int:
+        with self._transfer(handle, len(data) + 1):
+            self._device.write([reg, *data])
+
+        return 0
+
+    def i2c_zip(self, handle: int, data: list[int]) -> tuple[int, bytearray]:
+        result: list[int] = []
+
+        with self._transfer(handle, len(data)):
+            index = 0
+            escape = False
+
+            while index < len(data) and data[index] != I2C_ZIP_END:
+                command = data[index]
+                index += 1
+
+                if command == I2C_ZIP_ESCAPE:
+                    escape = True
+                    continue
+
+                if command in (I2C_ZIP_READ, I2C_ZIP_WRITE, I2C_ZIP_SET_ADDRESS, I2C_ZIP_SET_FLAGS):
+                    value = data[index] | (data[index + 1] << 8) if escape else data[index]
+                    index += 2 if escape else 1
+
+                    if command == I2C_ZIP_READ:
+                        result.extend(self._device.read(value))
+                    elif command == I2C_ZIP_WRITE:
+                        end = index + value
+                        self._device.write(data[index:end])
+                        index = end
+
+                escape = False
+
+        return len(result), bytearray(result)
+
+    @contextmanager
+    def _transfer(self, handle: int, length: int) -> Generator[None, None, None]:
+        self._check_connection()
+
+        if not self._device.is_handle_open(handle):
+            raise pigpio.error(pigpio.error_text(pigpio.PI_BAD_HANDLE))
+
+        with self._device.transfer(length):
+            yield
+
+    def _check_connection(self) -> None:
+        if not self.connected:
+            raise pigpio.error('pigpio not connected')
+
+    def _cancel_callback(self, callback: EmulatedCallback) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def _dispatch_edges(self) -> None:
+        while edge := self._edges.get():
+            if not self.connected:
+                # Notifications still queued when the connection is stopped are never delivered
+                continue
+
+            gpio, level, tick = edge
+            self._levels[gpio] = level
+
+            with self._lock:
+                callbacks = [callback for callback in self._callbacks if self._is_matching(callback, gpio, level)]
+
+            for callback in callbacks:
+                try:
+                    callback.handler(gpio, level, tick)
+                except Exception as error:
+                    log.error('Emulated GPIO callback failed', gpio=gpio, error=error)
+
+    def _is_matching(self, callback: EmulatedCallback, gpio: int, level: int) -> bool:
+        edge = pigpio.RISING_EDGE if level else pigpio.FALLING_EDGE
+        return callback.gpio == gpio and callback.edge in (edge, pigpio.EITHER_EDGE)
@@ -0,0 +1,66 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass
+from enum import Enum
+from typing import Optional
+
+
+class BatchOperationType(Enum):
+    READ = 'read'
+    WRITE = 'write'
+    UPDATE = 'update'
+
+
+@dataclass
+class BatchOperation:
+    type: BatchOperationType
+    register: int
+    value: int = 0
+    set_mask: int = 0
+    clear_mask: int = 0
+    flag: Optional[int] = None
+
+
+class RegisterBatch(object):
+
+    def __init__(self, operations: list[BatchOperation]) -> None:
+        self._operations = operations
+        read_registers = [operation.register for operation in operations if operation.type != BatchOperationType.WRITE]
+        self._start = min(read_registers, default=0)
+        self._count = max(read_registers) - self._start + 1 if read_registers else 0
+        self._results: list[int] = []
+
+    def get_read_range(self) -> tuple[int, int]:
+        return self._start, self._count
+
+    def has_writes(self) -> bool:
+        return any(operation.type != BatchOperationType.READ for operation in self._operations)
+
+    def apply(self, registers: list[int]) -> dict[int, int]:
+        values = {self._start + offset: value for offset, value in enumerate(registers)}
+        writes: dict[int, int] = {}
+        results = []
+
+        # Operations see the effect of the ones before them, writes to the same register collapse into the last one
+        for operation in self._operations:
+            if operation.type == BatchOperationType.WRITE:
+                value = operation.value
+            elif operation.type == BatchOperationType.UPDATE:
+                value = (values[operation.register] & ~operation.clear_mask | operation.set_mask) & 0xFF
+            else:
+                value = values[operation.register]
+
+            if operation.type == BatchOperationType.WRITE or value != values[operation.register]:
+                writes[operation.register] = value
+
+            values[operation.register] = value
+            results.append(value if operation.flag is None else (value >> operation.flag) & 1)
+
+        self._results = results
+
+        return writes
+
+    def get_results(self) -> list[int]:
+        return list(self._results)
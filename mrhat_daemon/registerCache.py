@@ -0,0 +1,138 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import time
+from dataclasses import dataclass
+from threading import Lock
+from typing import Callable, Optional
+
+
+@dataclass
+class RegisterSnapshot:
+    registers: list[int]
+    timestamp: float
+    generation: int = 0
+
+
+@dataclass
+class RegisterCacheStats:
+    hits: int
+    misses: int
+    invalidations: int
+
+
+class IRegisterCache(object):
+
+    def get(self, loader: Callable[[], list[int]]) -> list[int]:
+        raise NotImplementedError()
+
+    def get_snapshot(self, loader: Callable[[], list[int]]) -> RegisterSnapshot:
+        raise NotImplementedError()
+
+    def get_generation(self) -> Optional[int]:
+        raise NotImplementedError()
+
+    def observe(self, start: int, registers: list[int]) -> int:
+        raise NotImplementedError()
+
+    def update(self, registers: list[int]) -> None:
+        raise NotImplementedError()
+
+    def invalidate(self) -> None:
+        raise NotImplementedError()
+
+    def get_stats(self) -> RegisterCacheStats:
+        raise NotImplementedError()
+
+
+class RegisterCache(IRegisterCache):
+
+    def __init__(
+        self, ttl: float, clock: Callable[[], float] = time.monotonic, wall_clock: Callable[[], float] = time.time
+    ) -> None:
+        self._ttl = ttl
+        self._clock = clock
+        self._wall_clock = wall_clock
+        self._snapshot: Optional[RegisterSnapshot] = None
+        self._captured = 0.0
+        self._observed: list[Optional[int]] = []
+        self._generation = 0
+        self._epoch = 0
+        self._hits = 0
+        self._misses = 0
+        self._invalidations = 0
+        self._lock = Lock()
+
+    def get(self, loader: Callable[[], list[int]]) -> list[int]:
+        return self.get_snapshot(loader).registers
+
+    def get_snapshot(self, loader: Callable[[], list[int]]) -> RegisterSnapshot:
+        with self._lock:
+            if self._snapshot is not None and self._is_fresh():
+                self._hits += 1
+                return self._copy(self._snapshot)
+
+            self._misses += 1
+            epoch = self._epoch
+
+        registers = loader()
+
+        with self._lock:
+            snapshot = RegisterSnapshot(registers, self._wall_clock(), self._observe(0, registers))
+
+            # Drop the result if the cache was invalidated or updated while the loader was running
+            if epoch == self._epoch:
+                self._store(snapshot)
+
+        return snapshot
+
+    def get_generation(self) -> Optional[int]:
+        with self._lock:
+            if self._snapshot is not None and self._is_fresh():
+                return self._snapshot.generation
+
+            return None
+
+    def observe(self, start: int, registers: list[int]) -> int:
+        with self._lock:
+            return self._observe(start, registers)
+
+    def update(self, registers: list[int]) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._store(RegisterSnapshot(registers, self._wall_clock(), self._observe(0, registers)))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._invalidations += 1
+            self._snapshot = None
+
+    def get_stats(self) -> RegisterCacheStats:
+        with self._lock:
+            return RegisterCacheStats(self._hits, self._misses, self._invalidations)
+
+    def _is_fresh(self) -> bool:
+        return self._clock() - self._captured < self._ttl
+
+    def _store(self, snapshot: RegisterSnapshot) -> None:
+        if self._ttl > 0:
+            self._snapshot = self._copy(snapshot)
+            self._captured = self._clock()
+
+    def _observe(self, start: int, registers: list[int]) -> int:
+        end = start + len(registers)
+
+        if len(self._observed) < end:
+            self._observed.extend([None] * (end - len(self._observed)))
+
+        # The generation only moves when the device content is seen to change, so unchanged reads keep it valid
+        if self._observed[start:end] != registers:
+            self._observed[start:end] = registers
+            self._generation += 1
+
+        return self._generation
+
+    def _copy(self, snapshot: RegisterSnapshot) -> RegisterSnapshot:
+        return RegisterSnapshot(list(snapshot.registers), snapshot.timestamp, snapshot.generation)
@@ -0,0 +1,89 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import generated
+from context_logger import get_logger
+
+log = get_logger('RegisterMap')
+
+ADDRESS_SUFFIX = '_ADDR'
+POSITION_SUFFIX = '_POS'
+
+
+@dataclass(frozen=True)
+class RegisterDefinition:
+    name: str
+    address: int
+    readable: bool
+    writable: bool
+
+
+@dataclass(frozen=True)
+class FlagDefinition:
+    name: str
+    register: RegisterDefinition
+    position: int
+
+
+class IRegisterMap(object):
+
+    def get_register(self, name: str) -> Optional[RegisterDefinition]:
+        raise NotImplementedError()
+
+    def get_flag(self, name: str) -> Optional[FlagDefinition]:
+        raise NotImplementedError()
+
+    def get_registers(self) -> list[RegisterDefinition]:
+        raise NotImplementedError()
+
+    def get_flags(self) -> list[FlagDefinition]:
+        raise NotImplementedError()
+
+
+class RegisterMap(IRegisterMap):
+
+    def __init__(self, definitions: Optional[dict[str, Any]] = None) -> None:
+        if definitions is None:
+            definitions = vars(generated)
+
+        # Same register space as MrHatControl reads, from the first register up to the read end address
+        self._readable = range(definitions['REG_ADDR_RD_END'] + 1)
+        self._writable = range(definitions['REG_ADDR_WR_START'], definitions['REG_ADDR_WR_END'] + 1)
+        self._registers: dict[str, RegisterDefinition] = {}
+        self._flags: dict[str, FlagDefinition] = {}
+
+        self._load(definitions)
+
+        log.info('Loaded register map', registers=len(self._registers), flags=len(self._flags))
+
+    def get_register(self, name: str) -> Optional[RegisterDefinition]:
+        return self._registers.get(name)
+
+    def get_flag(self, name: str) -> Optional[FlagDefinition]:
+        return self._flags.get(name)
+
+    def get_registers(self) -> list[RegisterDefinition]:
+        return list(self._registers.values())
+
+    def get_flags(self) -> list[FlagDefinition]:
+        return list(self._flags.values())
+
+    def _load(self, definitions: dict[str, Any]) -> None:
+        register: Optional[RegisterDefinition] = None
+
+        # The header lists the bit positions of a register right after its address definition
+        for name, value in definitions.items():
+            if not isinstance(value, int):
+                continue
+
+            if name.endswith(ADDRESS_SUFFIX):
+                name = name.removesuffix(ADDRESS_SUFFIX)
+                register = RegisterDefinition(name, value, value in self._readable, value in self._writable)
+                self._registers[name] = register
+            elif name.endswith(POSITION_SUFFIX) and register:
+                name = name.removesuffix(POSITION_SUFFIX)
+                self._flags[name] = FlagDefinition(name, register, value)
@@ -0,0 +1,166 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+import random
+import time
+from dataclasses import dataclass
+from enum import Enum
+from threading import Lock
+from typing import Any, Callable
+
+from context_logger import get_logger
+
+log = get_logger('RetryPolicy')
+
+
+class CircuitState(Enum):
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __repr__(self) -> str:
+        return str(self.value)
+
+
+@dataclass
+class RetryConfig:
+    retry_limit: int
+    retry_delay: float
+    max_delay: float = 2.0
+    jitter: float = 0.5
+    failure_threshold: int = 3
+    reset_timeout: float = 10.0
+
+
+@dataclass
+class RetryPolicyStatus:
+    state: str
+    consecutive_failures: int
+    retries: int
+    failures: int
+    rejections: int
+    retry_after: float
+
+
+class CircuitOpenError(Exception):
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.message = message
+        self.retry_after = retry_after
+
+
+class IRetryPolicy(object):
+
+    def execute(
+        self, operation: Callable[[], Any], retryable: type[Exception] = Exception, bypass_breaker: bool = False
+    ) -> Any:
+        raise NotImplementedError()
+
+    def get_status(self) -> RetryPolicyStatus:
+        raise NotImplementedError()
+
+
+class RetryPolicy(IRetryPolicy):
+
+    def __init__(
+        self,
+        config: RetryConfig,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+        jitter_source: Callable[[], float] = random.random,
+    ) -> None:
+        self._config = config
+        self._clock = clock
+        self._sleep = sleep
+        self._jitter_source = jitter_source
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._retries = 0
+        self._failures = 0
+        self._rejections = 0
+        self._lock = Lock()
+
+    def execute(
+        self, operation: Callable[[], Any], retryable: type[Exception] = Exception, bypass_breaker: bool = False
+    ) -> Any:
+        retry_limit = self._acquire_permission(bypass_breaker)
+
+        for retry in range(0, retry_limit + 1):
+            try:
+                result = operation()
+            except retryable as error:
+                if retry == retry_limit:
+                    log.error(f'{error} -> giving up', error=error, retry=retry)
+                    self._record_failure()
+                    raise error
+
+                delay = self._get_delay(retry)
+                log.warn(f'{error} -> retrying', error=error, retry=retry, delay=delay)
+
+                with self._lock:
+                    self._retries += 1
+
+                self._sleep(delay)
+            else:
+                self._record_success()
+                return result
+
+    def get_status(self) -> RetryPolicyStatus:
+        with self._lock:
+            return RetryPolicyStatus(
+                self._state.value,
+                self._consecutive_failures,
+                self._retries,
+                self._failures,
+                self._rejections,
+                self._get_retry_after(),
+            )
+
+    def _acquire_permission(self, bypass_breaker: bool) -> int:
+        with self._lock:
+            if self._state == CircuitState.CLOSED or bypass_breaker:
+                return self._config.retry_limit
+
+            if self._get_retry_after() == 0:
+                # A trial that never reports back must not block further trials forever
+                log.info('Circuit breaker half-open, allowing trial operation')
+                self._state = CircuitState.HALF_OPEN
+                self._opened_at = self._clock()
+                return 0
+
+            self._rejections += 1
+            retry_after = self._get_retry_after()
+
+        raise CircuitOpenError('Circuit breaker is open', retry_after)
+
+    def _record_success(self) -> None:
+        with self._lock:
+            if self._state != CircuitState.CLOSED:
+                log.info('Circuit breaker closed')
+
+            self._state = CircuitState.CLOSED
+            self._consecutive_failures = 0
+
+    def _record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._consecutive_failures += 1
+
+            threshold = self._config.failure_threshold
+            if self._state == CircuitState.HALF_OPEN or (threshold > 0 and self._consecutive_failures >= threshold):
+                log.error('Circuit breaker opened', consecutive_failures=self._consecutive_failures)
+                self._state = CircuitState.OPEN
+                self._opened_at = self._clock()
+
+    def _get_delay(self, retry: int) -> float:
+        delay = min(self._config.retry_delay * (1 << retry), self._config.max_delay)
+        return delay * (1 - self._config.jitter * self._jitter_source())
+
+    def _get_retry_after(self) -> float:
+        if self._state == CircuitState.CLOSED:
+            return 0.0
+
+        return max(0.0, self._opened_at + self._config.reset_timeout - self._clock())
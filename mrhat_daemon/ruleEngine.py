@@ -0,0 +1,163 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass
+from enum import Enum
+from functools import partial
+
+from context_logger import get_logger
+
+from mrhat_daemon import IRegisterMap, RegisterChange, IChangeDispatcher, ChangeEdge
+
+log = get_logger('RuleEngine')
+
+RULE_PREFIX = 'rule_'
+RULE_SEPARATOR = '->'
+BYTE_VALUES = 256
+
+
+class RuleTrigger(Enum):
+    RISING = 'rising'
+    FALLING = 'falling'
+    EQUALS = 'equals'
+
+
+class RuleActionType(Enum):
+    COMMAND = 'command'
+    WRITE = 'write'
+    EVENT = 'event'
+
+
+@dataclass(frozen=True)
+class RuleAction:
+    type: RuleActionType
+    command: tuple[str, ...] = ()
+    register: int = 0
+    value: int = 0
+    event: str = ''
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    register: int
+    trigger: RuleTrigger
+    # Bit mask of the flag for rising and falling triggers, register value for equals triggers
+    value: int
+    action: RuleAction
+
+
+class RuleParser(object):
+
+    def __init__(self, register_map: IRegisterMap) -> None:
+        self._register_map = register_map
+
+    def parse_rules(self, config: dict[str, str]) -> list[Rule]:
+        return [
+            self.parse(key.removeprefix(RULE_PREFIX), definition)
+            for key, definition in config.items()
+            if key.startswith(RULE_PREFIX)
+        ]
+
+    def parse(self, name: str, definition: str) -> Rule:
+        condition, separator, action = definition.partition(RULE_SEPARATOR)
+
+        if not separator:
+            raise ValueError(f'Invalid rule {name}, expected <condition> {RULE_SEPARATOR} <action>: {definition}')
+
+        register, trigger, value = self._parse_condition(name, condition.split())
+
+        return Rule(name, register, trigger, value, self._parse_action(name, action.split()))
+
+    def _parse_condition(self, name: str, arguments: list[str]) -> tuple[int, RuleTrigger, int]:
+        if len(arguments) == 2 and arguments[1] in (RuleTrigger.RISING.value, RuleTrigger.FALLING.value):
+            if not (flag := self._register_map.get_flag(arguments[0])):
+                raise ValueError(f'Unknown flag in rule {name}: {arguments[0]}')
+
+            return flag.register.address, RuleTrigger(arguments[1]), 1 << flag.position
+
+        if len(arguments) == 3 and arguments[1] == RuleTrigger.EQUALS.value:
+            return (
+                self._parse_register(name, arguments[0], False),
+                RuleTrigger.EQUALS,
+                self._parse_byte(name, arguments[2]),
+            )
+
+        raise ValueError(f'Invalid condition in rule {name}: {" ".join(arguments)}')
+
+    def _parse_action(self, name: str, arguments: list[str]) -> RuleAction:
+        action_type = arguments[0] if arguments else ''
+
+        if action_type == RuleActionType.COMMAND.value and len(arguments) > 1:
+            return RuleAction(RuleActionType.COMMAND, command=tuple(arguments[1:]))
+
+        if action_type == RuleActionType.WRITE.value and len(arguments) == 3:
+            register = self._parse_register(name, arguments[1], True)
+            return RuleAction(RuleActionType.WRITE, register=register, value=self._parse_byte(name, arguments[2]))
+
+        if action_type == RuleActionType.EVENT.value and len(arguments) == 2:
+            return RuleAction(RuleActionType.EVENT, event=arguments[1])
+
+        raise ValueError(f'Invalid action in rule {name}: {" ".join(arguments)}')
+
+    def _parse_register(self, name: str, register_name: str, write: bool) -> int:
+        if not (register := self._register_map.get_register(register_name)):
+            raise ValueError(f'Unknown register in rule {name}: {register_name}')
+
+        if write and not register.writable or not write and not register.readable:
+            raise ValueError(f'Register is not {"writable" if write else "readable"} in rule {name}: {register_name}')
+
+        return register.address
+
+    def _parse_byte(self, name: str, value: str) -> int:
+        byte = int(value, 0)
+
+        if not 0 <= byte < BYTE_VALUES:
+            raise ValueError(f'Value must be between 0 and 255 in rule {name}: {value}')
+
+        return byte
+
+
+class IRuleEngine(object):
+
+    def evaluate(self, changes: list[RegisterChange]) -> list[Rule]:
+        raise NotImplementedError()
+
+
+class RuleEngine(IRuleEngine):
+
+    def __init__(self, rules: list[Rule], change_dispatcher: IChangeDispatcher) -> None:
+        self._equals = self._compile_equals(rules)
+        self._matched: list[Rule] = []
+
+        # Flag transitions are matched by the change dispatcher while it diffs the registers
+        for rule in rules:
+            if rule.trigger != RuleTrigger.EQUALS:
+                edge = ChangeEdge.RISING if rule.trigger == RuleTrigger.RISING else ChangeEdge.FALLING
+                change_dispatcher.subscribe(rule.register, rule.value, partial(self._match, rule), edge)
+
+        log.info('Compiled rules', rules=len(rules), registers=len({rule.register for rule in rules}))
+
+    def evaluate(self, changes: list[RegisterChange]) -> list[Rule]:
+        # Transition rules were matched when these changes were dispatched
+        matched, self._matched = self._matched, []
+
+        for change in changes:
+            if rules := self._equals.get(change.register):
+                matched.extend(rules.get(change.value, ()))
+
+        return matched
+
+    def _match(self, rule: Rule, change: RegisterChange) -> None:
+        self._matched.append(rule)
+
+    def _compile_equals(self, rules: list[Rule]) -> dict[int, dict[int, tuple[Rule, ...]]]:
+        compiled: dict[int, dict[int, tuple[Rule, ...]]] = {}
+
+        for rule in rules:
+            if rule.trigger == RuleTrigger.EQUALS:
+                register_rules = compiled.setdefault(rule.register, {})
+                register_rules[rule.value] = (*register_rules.get(rule.value, ()), rule)
+
+        return compiled
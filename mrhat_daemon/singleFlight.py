@@ -0,0 +1,71 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from threading import Lock, Event
+from typing import Any, Hashable, Optional
+
+
+class Flight(object):
+
+    def __init__(self, key: Hashable) -> None:
+        self.key = key
+        self._event = Event()
+        self._result: Any = None
+        self._error: Optional[BaseException] = None
+
+    def wait(self) -> Any:
+        self._event.wait()
+
+        if self._error is not None:
+            raise self._error
+
+        return self._result
+
+    def complete(self, result: Any) -> None:
+        self._result = result
+        self._event.set()
+
+    def fail(self, error: BaseException) -> None:
+        self._error = error
+        self._event.set()
+
+
+class ISingleFlight(object):
+
+    def join(self, key: Hashable) -> tuple[Flight, bool]:
+        raise NotImplementedError()
+
+    def close(self, flight: Flight) -> None:
+        raise NotImplementedError()
+
+    def get_coalesced_count(self) -> int:
+        raise NotImplementedError()
+
+
+class SingleFlight(ISingleFlight):
+
+    def __init__(self) -> None:
+        self._flights: dict[Hashable, Flight] = {}
+        self._coalesced = 0
+        self._lock = Lock()
+
+    def join(self, key: Hashable) -> tuple[Flight, bool]:
+        with self._lock:
+            if flight := self._flights.get(key):
+                self._coalesced += 1
+                return flight, False
+
+            flight = Flight(key)
+            self._flights[key] = flight
+
+            return flight, True
+
+    def close(self, flight: Flight) -> None:
+        with self._lock:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+
+    def get_coalesced_count(self) -> int:
+        with self._lock:
+            return self._coalesced
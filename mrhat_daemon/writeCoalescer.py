@@ -0,0 +1,109 @@
+# SPDX-FileCopyrightText: 2024 Ferenc Nandor Janky <ferenj@effective-range.com>
+# SPDX-FileCopyrightText: 2024 Attila Gombos <attila.gombos@effective-range.com>
+# SPDX-License-Identifier: MIT
+
+from dataclasses import dataclass
+from threading import Lock, Timer
+from typing import Callable, Optional
+
+from context_logger import get_logger
+
+log = get_logger('WriteCoalescer')
+
+
+@dataclass
+class WriteCoalescerStats:
+    writes: int
+    merged: int
+    flushes: int
+    failures: int
+
+
+class IWriteCoalescer(object):
+
+    def write(self, values: dict[int, int]) -> None:
+        raise NotImplementedError()
+
+    def flush(self) -> None:
+        raise NotImplementedError()
+
+    def close(self) -> None:
+        raise NotImplementedError()
+
+    def get_stats(self) -> WriteCoalescerStats:
+        raise NotImplementedError()
+
+
+class WriteCoalescer(IWriteCoalescer):
+
+    def __init__(self, writer: Callable[[dict[int, int]], None], window: float) -> None:
+        self._writer = writer
+        self._window = window
+        self._pending: dict[int, int] = {}
+        self._timer: Optional[Timer] = None
+        self._writes = 0
+        self._merged = 0
+        self._flushes = 0
+        self._failures = 0
+        self._lock = Lock()
+        self._flush_lock = Lock()
+
+    def write(self, values: dict[int, int]) -> None:
+        with self._lock:
+            self._writes += len(values)
+            self._merged += len(values.keys() & self._pending.keys())
+            self._pending.update(values)
+            self._schedule_flush()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                values, self._pending = self._pending, {}
+
+                if self._timer:
+                    self._timer.cancel()
+                    self._timer = None
+
+            if values:
+                self._write(values)
+
+    def close(self) -> None:
+        with self._lock:
+            values, self._pending = self._pending, {}
+
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+
+        if values:
+            log.warn('Discarded pending writes', values=values)
+
+    def get_stats(self) -> WriteCoalescerStats:
+        with self._lock:
+            return WriteCoalescerStats(self._writes, self._merged, self._flushes, self._failures)
+
+    def _flush_in_background(self) -> None:
+        try:
+            self.flush()
+        except Exception as error:
+            log.error('Failed to flush coalesced writes', error=error)
+
+    def _schedule_flush(self) -> None:
+        if not self._timer:
+            self._timer = Timer(self._window, self._flush_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _write(self, values: dict[int, int]) -> None:
+        try:
+            self._writer(values)
+        except Exception:
+            with self._lock:
+                self._failures += 1
+                # Keep the failed values for the next flush, unless they were overwritten in the meantime
+                self._pending = values | self._pending
+                self._schedule_flush()
+            raise
+
+        with self._lock:
+            self._flushes += 1
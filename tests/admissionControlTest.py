@@ -0,0 +1,90 @@
+import unittest
+from threading import Thread
+from unittest import TestCase
+
+from context_logger import setup_logging
+from test_utility import wait_for_condition
+
+from mrhat_daemon import (
+    AdmissionConfig,
+    AdmissionControl,
+    AdmissionStats,
+    OverloadError,
+    DeadlineExceededError,
+)
+
+
+class AdmissionControlTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_acquire_when_disabled(self):
+        # Given
+        admission_control = AdmissionControl(AdmissionConfig())
+
+        # When
+        for _ in range(10):
+            admission_control.acquire()
+
+        # Then
+        self.assertEqual(AdmissionStats(0, 0, 0, 0, 0), admission_control.get_stats())
+
+    def test_acquire_when_slot_available(self):
+        # Given
+        admission_control = AdmissionControl(AdmissionConfig(2, 0, 0.1))
+        admission_control.acquire()
+
+        # When
+        admission_control.acquire()
+
+        # Then
+        self.assertEqual(AdmissionStats(2, 0, 2, 0, 0), admission_control.get_stats())
+
+    def test_acquire_raises_error_when_queue_full(self):
+        # Given
+        admission_control = AdmissionControl(AdmissionConfig(1, 0, 2.5))
+        admission_control.acquire()
+
+        # When
+        with self.assertRaises(OverloadError) as context:
+            admission_control.acquire()
+
+        # Then
+        self.assertEqual(2.5, context.exception.retry_after)
+        self.assertEqual(AdmissionStats(1, 0, 1, 1, 0), admission_control.get_stats())
+
+    def test_acquire_raises_error_when_deadline_exceeded(self):
+        # Given
+        admission_control = AdmissionControl(AdmissionConfig(1, 1, 0.05))
+        admission_control.acquire()
+
+        # When
+        with self.assertRaises(DeadlineExceededError):
+            admission_control.acquire()
+
+        # Then
+        self.assertEqual(AdmissionStats(1, 0, 1, 0, 1), admission_control.get_stats())
+
+    def test_acquire_waits_for_released_slot(self):
+        # Given
+        admission_control = AdmissionControl(AdmissionConfig(1, 1, 1.0))
+        admission_control.acquire()
+        waiter = Thread(target=admission_control.acquire)
+        waiter.start()
+        wait_for_condition(1, lambda: admission_control.get_stats().queued == 1)
+
+        # When
+        admission_control.release()
+
+        # Then
+        waiter.join(1)
+        self.assertEqual(AdmissionStats(1, 0, 2, 0, 0), admission_control.get_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
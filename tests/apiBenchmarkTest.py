@@ -0,0 +1,76 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from tests.benchmark.apiBenchmark import ApiBenchmark, BenchmarkConfig, SCENARIOS
+
+
+class ApiBenchmarkTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'WARNING', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_read_heavy_scenario(self):
+        # Given
+        benchmark = ApiBenchmark(BenchmarkConfig(clients=2, duration=0.3))
+
+        # When
+        result = benchmark.run(SCENARIOS['read-heavy'])
+
+        # Then
+        self.assert_result(result, 'read-heavy')
+
+    def test_write_heavy_scenario(self):
+        # Given
+        benchmark = ApiBenchmark(BenchmarkConfig(clients=2, duration=0.3, write_coalesce_window=0.01))
+
+        # When
+        result = benchmark.run(SCENARIOS['write-heavy'])
+
+        # Then
+        self.assert_result(result, 'write-heavy')
+        self.assertIn('write_coalescer', result['diagnostics'])
+
+    def test_read_heavy_scenario_with_binary_bodies(self):
+        # Given
+        benchmark = ApiBenchmark(BenchmarkConfig(clients=2, duration=0.3, binary=True))
+
+        # When
+        result = benchmark.run(SCENARIOS['read-heavy'])
+
+        # Then
+        self.assert_result(result, 'read-heavy')
+
+    def test_interrupt_storm_scenario(self):
+        # Given
+        benchmark = ApiBenchmark(BenchmarkConfig(clients=2, duration=0.3, register_cache_ttl=0.1))
+
+        # When
+        result = benchmark.run(SCENARIOS['interrupt-storm'])
+
+        # Then
+        self.assert_result(result, 'interrupt-storm')
+        interrupts = result['interrupts']
+        self.assertGreater(interrupts['fired'], 0)
+        self.assertGreater(interrupts['handled'], 0)
+        self.assertEqual(interrupts['received'], interrupts['handled'] + interrupts['coalesced'])
+        self.assertLessEqual(interrupts['received'], interrupts['fired'])
+
+    def assert_result(self, result, scenario):
+        self.assertEqual(scenario, result['scenario'])
+        self.assertGreater(result['requests'], 0)
+        self.assertEqual(0, result['errors'])
+        self.assertGreater(result['requests_per_second'], 0)
+        latency = result['latency_ms']
+        self.assertLessEqual(latency['p50'], latency['p95'])
+        self.assertLessEqual(latency['p95'], latency['p99'])
+        self.assertLessEqual(latency['p99'], latency['max'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,9 @@
+import os
+import socket
+import tempfile
+import threading
 import unittest
+from http.client import HTTPConnection
 from threading import Thread
 from unittest import TestCase
 from unittest.mock import MagicMock
@@ -6,7 +11,19 @@ from unittest.mock import MagicMock
 from context_logger import setup_logging
 from test_utility import wait_for_condition
 
-from mrhat_daemon import ApiServerConfiguration, IMrHatControl, ApiServer
+from mrhat_daemon import (
+    ApiServerConfiguration,
+    IMrHatControl,
+    ApiServer,
+    CircuitOpenError,
+    RegisterSnapshot,
+    EventPublisher,
+    Event,
+    SubscriberLimitError,
+    RegisterMap,
+    BatchOperation,
+    BatchOperationType,
+)
 from tests import RESOURCE_ROOT
 
 
@@ -32,10 +49,421 @@ class ApiServerTest(TestCase):
 
         wait_for_condition(1, lambda: not api_server.is_running())
 
+    def test_serves_requests_on_unix_socket(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+        directory = tempfile.mkdtemp()
+        config.server_port = None
+        config.unix_socket = f'{directory}/run/api.sock'
+        config.unix_socket_perms = '660'
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            Thread(target=api_server.run).start()
+            wait_for_condition(1, lambda: api_server.is_running())
+
+            # When
+            status, data = request_unix_socket(config.unix_socket, '/api/register/2')
+
+            # Then
+            self.assertEqual(200, status)
+            self.assertEqual(b'{"value":123}\n', data)
+            self.assertEqual(0o660, os.stat(config.unix_socket).st_mode & 0o777)
+
+    def test_serves_requests_on_unix_socket_and_tcp_port(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+        config.server_port = get_free_port()
+        config.unix_socket = f'{tempfile.mkdtemp()}/api.sock'
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            Thread(target=api_server.run).start()
+            wait_for_condition(1, lambda: api_server.is_running())
+
+            # When
+            unix_status, _ = request_unix_socket(config.unix_socket, '/api/register/2')
+            connection = HTTPConnection('127.0.0.1', config.server_port, timeout=1)
+            connection.request('GET', '/api/register/2')
+            tcp_status = connection.getresponse().status
+            connection.close()
+
+            # Then
+            self.assertEqual(200, unix_status)
+            self.assertEqual(200, tcp_status)
+
+        wait_for_condition(1, lambda: not api_server.is_running())
+
     def test_returns_200_when_get_register_requested(self):
         # Given
         config, mr_hat_control = create_components()
-        mr_hat_control.get_register.return_value = 123
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/register/2')
+
+            # Then
+            mr_hat_control.get_registers.assert_called_once_with(2, 1)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(123, response.json['value'])
+            self.assertTrue(response.headers['ETag'].endswith('-7"'))
+
+    def test_returns_304_when_get_register_requested_with_cached_generation(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+        mr_hat_control.get_generation.return_value = 7
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+            etag = client.get('/api/register/2').headers['ETag']
+            mr_hat_control.get_registers.reset_mock()
+
+            # When
+            response = client.get('/api/register/2', headers={'If-None-Match': etag})
+
+            # Then
+            mr_hat_control.get_registers.assert_not_called()
+            self.assertEqual(304, response.status_code)
+            self.assertEqual(etag, response.headers['ETag'])
+
+    def test_returns_304_when_get_register_requested_and_reread_generation_unchanged(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+        mr_hat_control.get_generation.return_value = None
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+            etag = client.get('/api/register/2').headers['ETag']
+
+            # When
+            response = client.get('/api/register/2', headers={'If-None-Match': etag})
+
+            # Then
+            self.assertEqual(2, mr_hat_control.get_registers.call_count)
+            self.assertEqual(304, response.status_code)
+
+    def test_returns_200_when_get_register_requested_with_outdated_generation(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+            etag = client.get('/api/register/2').headers['ETag']
+            mr_hat_control.get_registers.return_value = RegisterSnapshot([124], 1700000001.5, 8)
+            mr_hat_control.get_generation.return_value = 8
+
+            # When
+            response = client.get('/api/register/2', headers={'If-None-Match': etag})
+
+            # Then
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(124, response.json['value'])
+            self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_returns_400_when_get_register_requested_with_invalid_parameter(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/register/10')
+
+            # Then
+            self.assertEqual(400, response.status_code)
+
+    def test_returns_500_when_get_register_requested_and_failed(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.side_effect = Exception('Failed to read register')
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/register/2')
+
+            # Then
+            self.assertEqual(500, response.status_code)
+
+    def test_returns_503_when_get_register_requested_and_circuit_open(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.side_effect = CircuitOpenError('Circuit breaker is open', 4.2)
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/register/2')
+
+            # Then
+            self.assertEqual(503, response.status_code)
+            self.assertEqual('5', response.headers['Retry-After'])
+
+    def test_returns_202_when_set_register_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/register/0', json={'value': '123'})
+
+            # Then
+            mr_hat_control.set_register.assert_called_once_with(0, 123)
+            self.assertEqual(202, response.status_code)
+
+    def test_returns_400_when_set_register_requested_with_invalid_parameter(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/register/1', json={'value': '256'})
+
+            # Then
+            self.assertEqual(400, response.status_code)
+
+    def test_returns_500_when_set_register_requested_and_failed(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.set_register.side_effect = Exception('Failed to write register')
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/register/0', json={'value': '123'})
+
+            # Then
+            self.assertEqual(500, response.status_code)
+
+    def test_returns_200_when_update_register_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.update_register.return_value = 0b0110
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.patch('/api/register/1', json={'set': 0b0110, 'clear': 0b0001})
+
+            # Then
+            mr_hat_control.update_register.assert_called_once_with(1, 0b0110, 0b0001)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(0b0110, response.json['value'])
+
+    def test_returns_400_when_update_register_requested_with_overlapping_masks(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.patch('/api/register/1', json={'set': 0b0110, 'clear': 0b0010})
+
+            # Then
+            mr_hat_control.update_register.assert_not_called()
+            self.assertEqual(400, response.status_code)
+
+    def test_returns_400_when_update_register_requested_for_read_only_register(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.patch('/api/register/2', json={'set': 1})
+
+            # Then
+            mr_hat_control.update_register.assert_not_called()
+            self.assertEqual(400, response.status_code)
+
+    def test_returns_200_when_get_registers_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([1, 2, 3, 4], 1700000000.5)
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/registers')
+
+            # Then
+            mr_hat_control.get_registers.assert_called_once_with(0, 4)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual({'start': 0, 'values': [1, 2, 3, 4], 'timestamp': 1700000000.5}, response.json)
+
+    def test_returns_200_when_get_registers_requested_with_range(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([2, 3], 1700000000.5)
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/registers?start=1&count=2')
+
+            # Then
+            mr_hat_control.get_registers.assert_called_once_with(1, 2)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual([2, 3], response.json['values'])
+
+    def test_returns_304_when_get_registers_requested_with_cached_generation(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([1, 2, 3, 4], 1700000000.5, 3)
+        mr_hat_control.get_generation.return_value = 3
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+            etag = client.get('/api/registers').headers['ETag']
+            mr_hat_control.get_registers.reset_mock()
+
+            # When
+            response = client.get('/api/registers', headers={'If-None-Match': etag})
+
+            # Then
+            mr_hat_control.get_registers.assert_not_called()
+            self.assertEqual(304, response.status_code)
+
+    def test_returns_400_when_get_registers_requested_with_invalid_range(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            responses = [
+                client.get('/api/registers?start=2&count=3'),
+                client.get('/api/registers?start=1&count=0'),
+                client.get('/api/registers?start=a'),
+            ]
+
+            # Then
+            mr_hat_control.get_registers.assert_not_called()
+            self.assertEqual([400, 400, 400], [response.status_code for response in responses])
+
+    def test_returns_503_when_get_registers_requested_and_circuit_open(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.side_effect = CircuitOpenError('Circuit breaker is open', 4.2)
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/registers')
+
+            # Then
+            self.assertEqual(503, response.status_code)
+            self.assertEqual('5', response.headers['Retry-After'])
+
+    def test_returns_202_when_set_registers_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/registers', json={'0': 12, '1': '34'})
+
+            # Then
+            mr_hat_control.set_registers.assert_called_once_with({0: 12, 1: 34})
+            self.assertEqual(202, response.status_code)
+
+    def test_returns_400_when_set_registers_requested_with_invalid_register(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/registers', json={'0': 12, '2': 34})
+
+            # Then
+            mr_hat_control.set_registers.assert_not_called()
+            self.assertEqual(400, response.status_code)
+
+    def test_returns_400_when_set_registers_requested_with_invalid_value(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/registers', json={'0': 12, '1': 256})
+
+            # Then
+            mr_hat_control.set_registers.assert_not_called()
+            self.assertEqual(400, response.status_code)
+
+    def test_returns_500_when_set_registers_requested_and_failed(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.set_registers.side_effect = Exception('Failed to write registers')
 
         with ApiServer(config, mr_hat_control) as api_server:
             # When
@@ -43,16 +471,34 @@ class ApiServerTest(TestCase):
             Thread(target=api_server.run).start()
 
             # When
-            response = client.get('/api/register/2')
+            response = client.post('/api/registers', json={'0': 12})
+
+            # Then
+            self.assertEqual(500, response.status_code)
+
+    def test_returns_raw_byte_when_get_register_requested_with_binary_accept(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/register/2', headers={'Accept': 'application/octet-stream'})
 
             # Then
-            mr_hat_control.get_register.assert_called_once_with(2)
             self.assertEqual(200, response.status_code)
-            self.assertEqual(123, response.json['value'])
+            self.assertEqual('application/octet-stream', response.mimetype)
+            self.assertEqual(b'\x7b', response.data)
+            self.assertIn('Accept', response.vary)
 
-    def test_returns_400_when_get_register_requested_with_invalid_parameter(self):
+    def test_returns_raw_bytes_when_get_registers_requested_with_binary_accept(self):
         # Given
         config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([10, 20, 30], 1700000000.5, 3)
 
         with ApiServer(config, mr_hat_control) as api_server:
             # When
@@ -60,15 +506,69 @@ class ApiServerTest(TestCase):
             Thread(target=api_server.run).start()
 
             # When
-            response = client.get('/api/register/10')
+            response = client.get('/api/registers?start=1', headers={'Accept': 'application/octet-stream'})
+
+            # Then
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(bytes([10, 20, 30]), response.data)
+            self.assertEqual('1', response.headers['X-Register-Start'])
+            self.assertEqual('1700000000.5', response.headers['X-Register-Timestamp'])
+
+    def test_returns_200_when_get_register_requested_with_etag_of_other_representation(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+        mr_hat_control.get_generation.return_value = 7
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+            etag = client.get('/api/register/2').headers['ETag']
+
+            # When
+            headers = {'If-None-Match': etag, 'Accept': 'application/octet-stream'}
+            response = client.get('/api/register/2', headers=headers)
+
+            # Then
+            self.assertEqual(200, response.status_code)
+            self.assertNotEqual(etag, response.headers['ETag'])
+
+    def test_returns_202_when_set_register_requested_with_binary_body(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/register/1', data=b'\x22', content_type='application/octet-stream')
+
+            # Then
+            mr_hat_control.set_register.assert_called_once_with(1, 0x22)
+            self.assertEqual(202, response.status_code)
+
+    def test_returns_400_when_set_register_requested_with_invalid_binary_body(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/register/1', data=b'\x22\x33', content_type='application/octet-stream')
 
             # Then
+            mr_hat_control.set_register.assert_not_called()
             self.assertEqual(400, response.status_code)
 
-    def test_returns_500_when_get_register_requested_and_failed(self):
+    def test_returns_raw_byte_when_update_register_requested_with_binary_body(self):
         # Given
         config, mr_hat_control = create_components()
-        mr_hat_control.get_register.side_effect = Exception('Failed to read register')
+        mr_hat_control.update_register.return_value = 0x81
 
         with ApiServer(config, mr_hat_control) as api_server:
             # When
@@ -76,12 +576,19 @@ class ApiServerTest(TestCase):
             Thread(target=api_server.run).start()
 
             # When
-            response = client.get('/api/register/2')
+            response = client.patch(
+                '/api/register/1',
+                data=b'\x80\x02',
+                content_type='application/octet-stream',
+                headers={'Accept': 'application/octet-stream'},
+            )
 
             # Then
-            self.assertEqual(500, response.status_code)
+            mr_hat_control.update_register.assert_called_once_with(1, 0x80, 0x02)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(b'\x81', response.data)
 
-    def test_returns_202_when_set_register_requested(self):
+    def test_returns_202_when_set_registers_requested_with_binary_body(self):
         # Given
         config, mr_hat_control = create_components()
 
@@ -91,13 +598,15 @@ class ApiServerTest(TestCase):
             Thread(target=api_server.run).start()
 
             # When
-            response = client.post('/api/register/0', json={'value': '123'})
+            response = client.post(
+                '/api/registers', data=bytes([0, 12, 1, 34]), content_type='application/octet-stream'
+            )
 
             # Then
-            mr_hat_control.set_register.assert_called_once_with(0, 123)
+            mr_hat_control.set_registers.assert_called_once_with({0: 12, 1: 34})
             self.assertEqual(202, response.status_code)
 
-    def test_returns_400_when_set_register_requested_with_invalid_parameter(self):
+    def test_returns_400_when_set_registers_requested_with_odd_binary_body(self):
         # Given
         config, mr_hat_control = create_components()
 
@@ -107,15 +616,165 @@ class ApiServerTest(TestCase):
             Thread(target=api_server.run).start()
 
             # When
-            response = client.post('/api/register/1', json={'value': '256'})
+            response = client.post('/api/registers', data=bytes([0, 12, 1]), content_type='application/octet-stream')
 
             # Then
+            mr_hat_control.set_registers.assert_not_called()
             self.assertEqual(400, response.status_code)
 
-    def test_returns_500_when_set_register_requested_and_failed(self):
+    def test_returns_200_when_get_register_by_name_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_registers.return_value = RegisterSnapshot([123], 1700000000.5, 7)
+
+        with ApiServer(config, mr_hat_control, create_register_map()) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/register/by-name/REG_STAT_0')
+
+            # Then
+            mr_hat_control.get_registers.assert_called_once_with(2, 1)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(123, response.json['value'])
+
+    def test_returns_400_when_set_register_by_name_requested_for_read_only_register(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control, create_register_map()) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/register/by-name/REG_STAT_0', json={'value': 1})
+
+            # Then
+            mr_hat_control.set_register.assert_not_called()
+            self.assertEqual(400, response.status_code)
+
+    def test_returns_404_when_get_register_by_name_requested_with_unknown_name(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control, create_register_map()) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/register/by-name/REG_UNKNOWN')
+
+            # Then
+            mr_hat_control.get_registers.assert_not_called()
+            self.assertEqual(404, response.status_code)
+
+    def test_returns_200_when_get_flag_by_name_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_flag.return_value = True
+
+        with ApiServer(config, mr_hat_control, create_register_map()) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/flag/SHUT_REQ')
+
+            # Then
+            mr_hat_control.get_flag.assert_called_once_with(2, 0)
+            self.assertEqual(200, response.status_code)
+            self.assertEqual(True, response.json['value'])
+
+    def test_returns_202_when_set_flag_by_name_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control, create_register_map()) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/flag/LED_EN/0')
+
+            # Then
+            mr_hat_control.clear_flag.assert_called_once_with(1, 2)
+            self.assertEqual(202, response.status_code)
+
+    def test_returns_404_when_set_flag_by_name_requested_with_unknown_name(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control, create_register_map()) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/flag/UNKNOWN/1')
+
+            # Then
+            mr_hat_control.set_flag.assert_not_called()
+            self.assertEqual(404, response.status_code)
+
+    def test_returns_200_when_batch_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.execute_batch.return_value = [3, 1, 5, 0x81, 1]
+        operations = [
+            {'op': 'read', 'register': 3},
+            {'op': 'get_flag', 'flag': 'SHUT_REQ'},
+            {'op': 'write', 'register': 'REG_CFG_0', 'value': 5},
+            {'op': 'update', 'register': '1', 'set': 0x01, 'clear': 0x02},
+            {'op': 'set_flag', 'register': 0, 'flag': 7},
+        ]
+
+        with ApiServer(config, mr_hat_control, create_register_map()) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/batch', json=operations)
+
+            # Then
+            mr_hat_control.execute_batch.assert_called_once_with(
+                [
+                    BatchOperation(BatchOperationType.READ, 3),
+                    BatchOperation(BatchOperationType.READ, 2, flag=0),
+                    BatchOperation(BatchOperationType.WRITE, 1, 5),
+                    BatchOperation(BatchOperationType.UPDATE, 1, set_mask=0x01, clear_mask=0x02),
+                    BatchOperation(BatchOperationType.UPDATE, 0, set_mask=0x80, flag=7),
+                ]
+            )
+            self.assertEqual(200, response.status_code)
+            self.assertEqual([3, 1, 5, 0x81, 1], response.json['results'])
+
+    def test_returns_400_when_batch_requested_with_invalid_operation(self):
+        # Given
+        config, mr_hat_control = create_components()
+        operations = [{'op': 'write', 'register': 1, 'value': 5}, {'op': 'write', 'register': 3, 'value': 5}]
+
+        with ApiServer(config, mr_hat_control, create_register_map()) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/batch', json=operations)
+
+            # Then
+            mr_hat_control.execute_batch.assert_not_called()
+            self.assertEqual(400, response.status_code)
+
+    def test_returns_400_when_batch_requested_with_malformed_body(self):
         # Given
         config, mr_hat_control = create_components()
-        mr_hat_control.set_register.side_effect = Exception('Failed to write register')
 
         with ApiServer(config, mr_hat_control) as api_server:
             # When
@@ -123,10 +782,34 @@ class ApiServerTest(TestCase):
             Thread(target=api_server.run).start()
 
             # When
-            response = client.post('/api/register/0', json={'value': '123'})
+            responses = [
+                client.post('/api/batch', json=[]),
+                client.post('/api/batch', json={'op': 'read', 'register': 1}),
+                client.post('/api/batch', json=[{'op': 'erase', 'register': 1}]),
+                client.post('/api/batch', json=[{'op': 'get_flag', 'flag': 'UNKNOWN'}]),
+                client.post('/api/batch', json=[{'register': 1}]),
+                client.post('/api/batch', json=[1]),
+            ]
 
             # Then
-            self.assertEqual(500, response.status_code)
+            mr_hat_control.execute_batch.assert_not_called()
+            self.assertEqual([400] * 6, [response.status_code for response in responses])
+
+    def test_returns_200_when_flush_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.post('/api/registers/flush')
+
+            # Then
+            mr_hat_control.flush_writes.assert_called_once()
+            self.assertEqual(200, response.status_code)
 
     def test_returns_200_when_get_register_flag_requested(self):
         # Given
@@ -240,6 +923,128 @@ class ApiServerTest(TestCase):
             # Then
             self.assertEqual(500, response.status_code)
 
+    def test_returns_503_and_504_when_requests_exceed_admission_limits(self):
+        # Given
+        config, mr_hat_control = create_components()
+        config.max_in_flight = 1
+        config.max_queued = 1
+        config.request_deadline = 0.2
+        released = threading.Event()
+        mr_hat_control.get_registers.side_effect = lambda start, count: released.wait(1) and RegisterSnapshot(
+            [1], 1700000000.5, 1
+        )
+        mr_hat_control.get_diagnostics.return_value = {}
+        responses = {}
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            Thread(target=api_server.run).start()
+
+            def get_register(name):
+                responses[name] = api_server._app.test_client().get('/api/register/2')
+
+            in_flight = Thread(target=get_register, args=('in_flight',))
+            in_flight.start()
+            wait_for_condition(1, lambda: mr_hat_control.get_registers.call_count == 1)
+            queued = Thread(target=get_register, args=('queued',))
+            queued.start()
+            wait_for_condition(1, lambda: api_server._admission_control.get_stats().queued == 1)
+
+            # When
+            get_register('rejected')
+            queued.join(1)
+            released.set()
+            in_flight.join(1)
+
+            # Then
+            self.assertEqual(200, responses['in_flight'].status_code)
+            self.assertEqual(504, responses['queued'].status_code)
+            self.assertEqual(503, responses['rejected'].status_code)
+            self.assertEqual('1', responses['rejected'].headers['Retry-After'])
+            diagnostics = api_server._app.test_client().get('/api/diagnostics').json
+            self.assertEqual(
+                {'in_flight': 0, 'queued': 0, 'admitted': 1, 'rejected': 1, 'expired': 1}, diagnostics['admission']
+            )
+
+    def test_returns_200_when_diagnostics_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.get_diagnostics.return_value = {'register_cache': {'hits': 1, 'misses': 2, 'invalidations': 3}}
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/diagnostics')
+
+            # Then
+            self.assertEqual(200, response.status_code)
+            self.assertEqual({'hits': 1, 'misses': 2, 'invalidations': 3}, response.json['register_cache'])
+
+    def test_streams_events_when_events_requested(self):
+        # Given
+        config, mr_hat_control = create_components()
+        event_publisher = EventPublisher(4, 1)
+        mr_hat_control.subscribe.side_effect = event_publisher.subscribe
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/events', buffered=False)
+            stream = response.iter_encoded()
+            first = next(stream)
+            event_publisher.publish(Event('registers', {'changes': [{'register': 10, 'value': 3}]}))
+            second = next(stream)
+            response.close()
+
+            # Then
+            self.assertEqual(200, response.status_code)
+            self.assertEqual('text/event-stream; charset=utf-8', response.headers['Content-Type'])
+            self.assertEqual(b': connected\n\n', first)
+            self.assertEqual(b'event: registers\ndata: {"changes": [{"register": 10, "value": 3}]}\n\n', second)
+            wait_for_condition(1, lambda: event_publisher.get_stats().subscribers == 0)
+
+    def test_returns_503_when_events_requested_and_subscriber_limit_reached(self):
+        # Given
+        config, mr_hat_control = create_components()
+        mr_hat_control.subscribe.side_effect = SubscriberLimitError('Subscriber limit reached: 1')
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            # When
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+
+            # When
+            response = client.get('/api/events')
+
+            # Then
+            self.assertEqual(503, response.status_code)
+            self.assertEqual('15', response.headers['Retry-After'])
+
+    def test_event_streams_closed_on_shutdown(self):
+        # Given
+        config, mr_hat_control = create_components()
+        event_publisher = EventPublisher(4, 1)
+        mr_hat_control.subscribe.side_effect = event_publisher.subscribe
+
+        with ApiServer(config, mr_hat_control) as api_server:
+            client = api_server._app.test_client()
+            Thread(target=api_server.run).start()
+            response = client.get('/api/events', buffered=False)
+            stream = response.iter_encoded()
+            next(stream)
+
+        # When
+        remaining = list(stream)
+
+        # Then
+        self.assertEqual([], remaining)
+        self.assertEqual(0, event_publisher.get_stats().subscribers)
+
 
 def create_components():
     config = ApiServerConfiguration(0, RESOURCE_ROOT)
@@ -250,5 +1055,48 @@ def create_components():
     return config, mr_hat_control
 
 
+def create_register_map():
+    return RegisterMap(
+        {
+                'REG_ADDR_RD_END': 3,
+            'REG_ADDR_WR_START': 0,
+            'REG_ADDR_WR_END': 1,
+            'REG_CFG_0_ADDR': 1,
+            'LED_EN_POS': 2,
+            'REG_STAT_0_ADDR': 2,
+            'SHUT_REQ_POS': 0,
+        }
+    )
+
+
+class UnixHTTPConnection(HTTPConnection):
+
+    def __init__(self, path):
+        super().__init__('localhost', timeout=1)
+        self._path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self._path)
+
+
+def request_unix_socket(path, url):
+    connection = UnixHTTPConnection(path)
+    wait_for_condition(1, lambda: os.path.exists(path))
+    connection.request('GET', url)
+    response = connection.getresponse()
+    result = response.status, response.read()
+    connection.close()
+
+    return result
+
+
+def get_free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
+        server_socket.bind(('127.0.0.1', 0))
+        return server_socket.getsockname()[1]
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,342 @@
+import json
+import logging
+import math
+import random
+import socket
+import time
+from argparse import ArgumentParser, ArgumentDefaultsHelpFormatter
+from dataclasses import dataclass, asdict
+from http.client import HTTPConnection
+from threading import Thread, Event, Lock
+from typing import Any, Optional
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+
+from generated import REG_STAT_0_ADDR, REG_SW_VER_MAJOR_ADDR, PI_HB
+from mrhat_daemon import (
+    ApiServer,
+    ApiServerConfiguration,
+    DeviceEmulator,
+    DeviceEmulatorConfig,
+    I2CConfig,
+    I2CControl,
+    IPicProgrammer,
+    IPlatformAccess,
+    MrHatControl,
+    MrHatControlConfig,
+    PiEmulator,
+    PiGpio,
+    ServiceConfig,
+    InterruptConfig,
+    GpioPullType,
+    GpioEdgeType,
+)
+from tests import RESOURCE_ROOT
+
+INTERRUPT_PIN = 22
+
+
+@dataclass
+class Scenario:
+    name: str
+    register_reads: int
+    register_writes: int
+    flag_reads: int
+    flag_writes: int
+    interrupt_rate: float = 0.0
+
+
+SCENARIOS = {
+    'read-heavy': Scenario('read-heavy', 80, 10, 10, 0),
+    'write-heavy': Scenario('write-heavy', 20, 50, 0, 30),
+    'interrupt-storm': Scenario('interrupt-storm', 60, 20, 10, 10, 500.0),
+}
+
+
+@dataclass
+class BenchmarkConfig:
+    clients: int = 8
+    duration: float = 5.0
+    operation_latency: float = 0.0002
+    byte_latency: float = 0.00009
+    register_cache_ttl: float = 0.0
+    write_coalesce_window: float = 0.0
+    seed: int = 0
+    binary: bool = False
+
+
+class ApiBenchmark(object):
+
+    def __init__(self, config: BenchmarkConfig) -> None:
+        self._config = config
+
+    def run(self, scenario: Scenario) -> dict[str, Any]:
+        config = self._config
+        device = DeviceEmulator(
+            DeviceEmulatorConfig(
+                INTERRUPT_PIN, config.operation_latency, config.byte_latency, {REG_SW_VER_MAJOR_ADDR: 1}
+            )
+        )
+        platform_access = MagicMock(spec=IPlatformAccess)
+        # The real pigpio wiring is exercised, only the daemon connection is replaced by the emulator
+        pi_gpio = PiGpio(
+            _create_systemd(),
+            platform_access,
+            ServiceConfig(0, 0.0),
+            InterruptConfig(INTERRUPT_PIN, GpioPullType.PULL_UP, GpioEdgeType.FALLING_EDGE),
+            lambda: PiEmulator(device),
+        )
+        pic_programmer = MagicMock(spec=IPicProgrammer)
+        pic_programmer.load_firmware.return_value = None
+        i2c_config = I2CConfig(1, 0x33, 3, 0.01)
+        control_config = MrHatControlConfig(
+            register_cache_ttl=config.register_cache_ttl, write_coalesce_window=config.write_coalesce_window
+        )
+        port = _get_free_port()
+
+        with (
+            I2CControl(pi_gpio, i2c_config) as i2c_control,
+            MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, control_config) as mr_hat_control,
+            ApiServer(ApiServerConfiguration(port, RESOURCE_ROOT), mr_hat_control) as api_server,
+        ):
+            mr_hat_control.initialize()
+            Thread(target=api_server.run, daemon=True).start()
+            _wait_for_port(port)
+
+            result = self._drive(scenario, port, device)
+            result['diagnostics'] = _request(HTTPConnection('127.0.0.1', port), 'GET', '/api/diagnostics')[1]
+            # Edges dropped by the interrupt worker never reach the coalescer, so fired can exceed received
+            result['interrupts'].update(result['diagnostics']['interrupts'])
+
+        return result
+
+    def _drive(self, scenario: Scenario, port: int, device: DeviceEmulator) -> dict[str, Any]:
+        recorder = LatencyRecorder()
+        stopped = Event()
+        threads = [
+            Thread(target=self._run_client, args=(scenario, port, index, recorder, stopped), daemon=True)
+            for index in range(self._config.clients)
+        ]
+        interrupts = {'fired': 0}
+
+        if scenario.interrupt_rate > 0:
+            threads.append(Thread(target=self._fire_interrupts, args=(scenario, device, interrupts, stopped)))
+
+        started = time.perf_counter()
+
+        for thread in threads:
+            thread.start()
+
+        stopped.wait(self._config.duration)
+        stopped.set()
+
+        for thread in threads:
+            thread.join()
+
+        elapsed = time.perf_counter() - started
+        requests = recorder.get_count()
+
+        return {
+            'scenario': scenario.name,
+            'config': asdict(self._config),
+            'elapsed': elapsed,
+            'requests': requests,
+            'errors': recorder.errors,
+            'requests_per_second': requests / elapsed,
+            'latency_ms': _get_latency_summary(recorder.get_all()),
+            'operations': {
+                name: {'requests': len(values), 'latency_ms': _get_latency_summary(values)}
+                for name, values in sorted(recorder.latencies.items())
+            },
+            'interrupts': interrupts,
+        }
+
+    def _run_client(
+        self, scenario: Scenario, port: int, index: int, recorder: 'LatencyRecorder', stopped: Event
+    ) -> None:
+        connection = HTTPConnection('127.0.0.1', port)
+        generator = random.Random(self._config.seed + index)
+
+        while not stopped.is_set():
+            operation, method, path, body = _create_request(scenario, generator, self._config.binary)
+            started = time.perf_counter()
+
+            try:
+                status, _ = _request(connection, method, path, body, self._config.binary)
+            except OSError:
+                connection.close()
+                connection = HTTPConnection('127.0.0.1', port)
+                status = 0
+
+            recorder.record(operation, time.perf_counter() - started, status in (200, 202))
+
+        connection.close()
+
+    def _fire_interrupts(
+        self, scenario: Scenario, device: DeviceEmulator, interrupts: dict[str, int], stopped: Event
+    ) -> None:
+        period = 1 / scenario.interrupt_rate
+        generator = random.Random(self._config.seed)
+
+        while not stopped.wait(period):
+            device.set_register(REG_STAT_0_ADDR, PI_HB if generator.random() < 0.5 else 0)
+            device.fire_interrupt()
+            interrupts['fired'] += 1
+
+
+class LatencyRecorder(object):
+
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {}
+        self.errors = 0
+        self._lock = Lock()
+
+    def record(self, operation: str, seconds: float, success: bool) -> None:
+        with self._lock:
+            self.latencies.setdefault(operation, []).append(seconds)
+
+            if not success:
+                self.errors += 1
+
+    def get_count(self) -> int:
+        return sum(len(values) for values in self.latencies.values())
+
+    def get_all(self) -> list[float]:
+        return [latency for values in self.latencies.values() for latency in values]
+
+
+def _create_request(
+    scenario: Scenario, generator: random.Random, binary: bool = False
+) -> tuple[str, str, str, Optional[bytes]]:
+    weights = [scenario.register_reads, scenario.register_writes, scenario.flag_reads, scenario.flag_writes]
+    operation = generator.choices(['register_read', 'register_write', 'flag_read', 'flag_write'], weights)[0]
+    register = generator.randint(1, 9)
+    flag = generator.randint(0, 7)
+
+    if operation == 'register_read':
+        return operation, 'GET', f'/api/register/{generator.randint(0, REG_STAT_0_ADDR)}', None
+    elif operation == 'register_write':
+        value = generator.randint(0, 255)
+        body = bytes([value]) if binary else json.dumps({'value': value}).encode()
+        return operation, 'POST', f'/api/register/{register}', body
+    elif operation == 'flag_read':
+        return operation, 'GET', f'/api/register/{register}/{flag}', None
+    else:
+        return operation, 'POST', f'/api/register/{register}/{flag}/{generator.randint(0, 1)}', None
+
+
+def _request(
+    connection: HTTPConnection, method: str, path: str, body: Optional[bytes] = None, binary: bool = False
+) -> tuple[int, Any]:
+    mimetype = 'application/octet-stream' if binary else 'application/json'
+    headers = {'Accept': mimetype, **({'Content-Type': mimetype} if body else {})}
+    connection.request(method, path, body, headers)
+    response = connection.getresponse()
+    data = response.read()
+
+    if response.getheader('Content-Type') == 'application/json':
+        return response.status, json.loads(data)
+
+    return response.status, data or None
+
+
+def _get_latency_summary(latencies: list[float]) -> dict[str, float]:
+    values = sorted(latencies)
+
+    return {
+        'p50': _get_percentile(values, 50) * 1000,
+        'p95': _get_percentile(values, 95) * 1000,
+        'p99': _get_percentile(values, 99) * 1000,
+        'max': (values[-1] if values else 0.0) * 1000,
+    }
+
+
+def _get_percentile(values: list[float], percentile: float) -> float:
+    if not values:
+        return 0.0
+
+    # Nearest-rank method, the result is always an observed value
+    rank = math.ceil(percentile / 100 * len(values))
+    return values[max(rank, 1) - 1]
+
+
+def _create_systemd() -> MagicMock:
+    services: set[str] = set()
+    systemd = MagicMock()
+    systemd.start_service.side_effect = services.add
+    systemd.stop_service.side_effect = services.discard
+    systemd.is_active.side_effect = lambda service: service in services
+
+    return systemd
+
+
+def _get_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as server_socket:
+        server_socket.bind(('127.0.0.1', 0))
+        port: int = server_socket.getsockname()[1]
+        return port
+
+
+def _wait_for_port(port: int, timeout: float = 5.0) -> None:
+    deadline = time.monotonic() + timeout
+
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), 0.1).close()
+            return
+        except OSError:
+            time.sleep(0.01)
+
+    raise TimeoutError(f'API server did not start listening on port {port}')
+
+
+def main() -> None:
+    parser = ArgumentParser(formatter_class=ArgumentDefaultsHelpFormatter)
+    parser.add_argument('-s', '--scenario', help='scenario to run', choices=list(SCENARIOS), action='append')
+    parser.add_argument('-c', '--clients', help='number of concurrent clients', type=int, default=8)
+    parser.add_argument('-d', '--duration', help='duration of each scenario in seconds', type=float, default=5.0)
+    parser.add_argument('--operation-latency', help='emulated latency per I2C transfer', type=float, default=0.0002)
+    parser.add_argument('--byte-latency', help='emulated latency per transferred byte', type=float, default=0.00009)
+    parser.add_argument('--register-cache-ttl', help='register snapshot cache time to live', type=float, default=0.0)
+    parser.add_argument('--write-coalesce-window', help='register write merging window', type=float, default=0.0)
+    parser.add_argument('--binary', help='use raw byte bodies instead of JSON', action='store_true')
+    parser.add_argument('--interrupt-rate', help='interrupts per second in storm scenario', type=float)
+    parser.add_argument('-l', '--log-level', help='logging level', default='WARNING')
+    parser.add_argument('-o', '--output', help='write JSON results to this file')
+    arguments = parser.parse_args()
+
+    setup_logging('mrhat-daemon', arguments.log_level, warn_on_overwrite=False)
+    logging.getLogger('waitress').setLevel(logging.ERROR)
+
+    config = BenchmarkConfig(
+        arguments.clients,
+        arguments.duration,
+        arguments.operation_latency,
+        arguments.byte_latency,
+        arguments.register_cache_ttl,
+        arguments.write_coalesce_window,
+        binary=arguments.binary,
+    )
+    benchmark = ApiBenchmark(config)
+    results = []
+
+    for name in arguments.scenario or list(SCENARIOS):
+        scenario = SCENARIOS[name]
+
+        if arguments.interrupt_rate is not None and scenario.interrupt_rate > 0:
+            scenario = Scenario(**{**asdict(scenario), 'interrupt_rate': arguments.interrupt_rate})
+
+        results.append(benchmark.run(scenario))
+
+    output = json.dumps(results, indent=2)
+
+    if arguments.output:
+        with open(arguments.output, 'w') as file:
+            file.write(output)
+
+    print(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+
+from mrhat_daemon import ChangeDispatcher, RegisterChange, ChangeEdge
+
+
+class ChangeDispatcherTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_dispatch_returns_no_changes_when_registers_unchanged(self):
+        # Given
+        change_dispatcher = ChangeDispatcher()
+        handler = MagicMock()
+        change_dispatcher.subscribe(1, 0xFF, handler)
+
+        # When
+        result = change_dispatcher.dispatch([0, 1, 2, 3], [0, 1, 2, 3])
+
+        # Then
+        self.assertEqual([], result)
+        handler.assert_not_called()
+
+    def test_dispatch_returns_changes_of_whole_block(self):
+        # Given
+        change_dispatcher = ChangeDispatcher()
+
+        # When
+        result = change_dispatcher.dispatch([0, 1, 2, 3], [128, 1, 2, 6])
+
+        # Then
+        self.assertEqual([RegisterChange(0, 0, 128, 128), RegisterChange(3, 3, 6, 5)], result)
+
+    def test_dispatch_calls_handlers_with_matching_mask(self):
+        # Given
+        change_dispatcher = ChangeDispatcher()
+        bit_0_handler = MagicMock()
+        bit_1_handler = MagicMock()
+        register_handler = MagicMock()
+        other_register_handler = MagicMock()
+        change_dispatcher.subscribe(2, 0b01, bit_0_handler)
+        change_dispatcher.subscribe(2, 0b10, bit_1_handler)
+        change_dispatcher.subscribe(2, 0xFF, register_handler)
+        change_dispatcher.subscribe(3, 0xFF, other_register_handler)
+
+        # When
+        change_dispatcher.dispatch([0, 1, 2, 3], [0, 1, 3, 3])
+
+        # Then
+        bit_0_handler.assert_called_once_with(RegisterChange(2, 2, 3, 1))
+        bit_1_handler.assert_not_called()
+        register_handler.assert_called_once_with(RegisterChange(2, 2, 3, 1))
+        other_register_handler.assert_not_called()
+
+    def test_dispatch_calls_handlers_with_matching_edge(self):
+        # Given
+        change_dispatcher = ChangeDispatcher()
+        rising_handler = MagicMock()
+        falling_handler = MagicMock()
+        other_rising_handler = MagicMock()
+        change_dispatcher.subscribe(2, 0b01, rising_handler, ChangeEdge.RISING)
+        change_dispatcher.subscribe(2, 0b10, falling_handler, ChangeEdge.FALLING)
+        change_dispatcher.subscribe(2, 0b10, other_rising_handler, ChangeEdge.RISING)
+
+        # When
+        change_dispatcher.dispatch([0, 1, 2, 3], [0, 1, 1, 3])
+
+        # Then
+        rising_handler.assert_called_once_with(RegisterChange(2, 2, 1, 3))
+        falling_handler.assert_called_once_with(RegisterChange(2, 2, 1, 3))
+        other_rising_handler.assert_not_called()
+
+    def test_dispatch_calls_remaining_handlers_when_handler_fails(self):
+        # Given
+        change_dispatcher = ChangeDispatcher()
+        failing_handler = MagicMock(side_effect=Exception('Handler failed'))
+        handler = MagicMock()
+        change_dispatcher.subscribe(0, 0x01, failing_handler)
+        change_dispatcher.subscribe(0, 0x01, handler)
+
+        # When
+        result = change_dispatcher.dispatch([0, 0], [1, 0])
+
+        # Then
+        self.assertEqual([RegisterChange(0, 0, 1, 1)], result)
+        failing_handler.assert_called_once()
+        handler.assert_called_once_with(RegisterChange(0, 0, 1, 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from threading import Thread
+from unittest import TestCase
+
+from context_logger import setup_logging
+from test_utility import wait_for_condition
+
+from mrhat_daemon import EventPublisher, EventPublisherStats, Event, SubscriberLimitError
+
+
+class EventPublisherTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_publish_delivers_event_to_all_subscribers(self):
+        # Given
+        event_publisher = EventPublisher(4, 2)
+        first = event_publisher.subscribe()
+        second = event_publisher.subscribe()
+
+        # When
+        event_publisher.publish(Event('registers', {'value': 1}))
+
+        # Then
+        self.assertEqual(Event('registers', {'value': 1}), first.get(0))
+        self.assertEqual(Event('registers', {'value': 1}), second.get(0))
+        self.assertEqual(EventPublisherStats(2, 1, 0), event_publisher.get_stats())
+
+    def test_publish_drops_oldest_event_when_subscriber_queue_full(self):
+        # Given
+        event_publisher = EventPublisher(2, 1)
+        subscription = event_publisher.subscribe()
+
+        # When
+        for value in range(3):
+            event_publisher.publish(Event('registers', {'value': value}))
+
+        # Then
+        self.assertEqual({'value': 1}, subscription.get(0).data)
+        self.assertEqual({'value': 2}, subscription.get(0).data)
+        self.assertIsNone(subscription.get(0))
+        self.assertEqual(EventPublisherStats(1, 3, 1), event_publisher.get_stats())
+
+    def test_get_waits_for_published_event(self):
+        # Given
+        event_publisher = EventPublisher(4, 1)
+        subscription = event_publisher.subscribe()
+        results = []
+        thread = Thread(target=lambda: results.append(subscription.get(1)))
+        thread.start()
+
+        # When
+        event_publisher.publish(Event('registers', {'value': 1}))
+
+        # Then
+        thread.join()
+        self.assertEqual([Event('registers', {'value': 1})], results)
+
+    def test_subscribe_raises_error_when_subscriber_limit_reached(self):
+        # Given
+        event_publisher = EventPublisher(4, 1)
+        event_publisher.subscribe()
+
+        # When, Then
+        with self.assertRaises(SubscriberLimitError):
+            event_publisher.subscribe()
+
+    def test_subscription_close_frees_subscriber_slot(self):
+        # Given
+        event_publisher = EventPublisher(4, 1)
+        subscription = event_publisher.subscribe()
+
+        # When
+        subscription.close()
+
+        # Then
+        self.assertTrue(subscription.is_closed())
+        self.assertIsNotNone(event_publisher.subscribe())
+
+    def test_close_wakes_up_waiting_subscribers(self):
+        # Given
+        event_publisher = EventPublisher(4, 1)
+        subscription = event_publisher.subscribe()
+        results = []
+        thread = Thread(target=lambda: results.append(subscription.get(10)))
+        thread.start()
+
+        # When
+        event_publisher.close()
+
+        # Then
+        thread.join()
+        wait_for_condition(1, lambda: results == [None])
+        self.assertEqual(EventPublisherStats(0, 0, 0), event_publisher.get_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,11 +1,13 @@
 import unittest
+from threading import Thread, Event
 from unittest import TestCase, mock
 from unittest.mock import MagicMock
 
 import pigpio
 from context_logger import setup_logging
+from test_utility import wait_for_condition
 
-from mrhat_daemon import IPiGpio, I2CConfig, I2CControl, I2CError, I2C_NO_DEVICE
+from mrhat_daemon import IPiGpio, I2CConfig, I2CControl, I2CError, I2C_NO_DEVICE, CircuitOpenError, I2CTransaction
 
 
 class I2cControlTest(TestCase):
@@ -137,6 +139,183 @@ class I2cControlTest(TestCase):
         pi_gpio.get_control().i2c_read_device.assert_has_calls([mock.call(1, 10), mock.call(1, 10)])
         self.assertEqual([0, 1, 2, 3, 4, 5, 6, 7, 8, 9], result)
 
+    def test_read_block_data_records_operation_metrics(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        config.retry_delay = 0.01
+        pi_gpio.get_control().i2c_read_device.side_effect = [
+            pigpio.error(pigpio.error_text(pigpio.PI_I2C_READ_FAILED)),
+            (9, [0, 1, 2, 3, 4, 5, 6, 7, 8]),
+            (-2, []),
+            (10, [0, 1, 2, 3, 4, 5, 6, 7, 8, 9]),
+        ]
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        i2c_control.read_block_data(10)
+
+        # Then
+        metrics = i2c_control.get_diagnostics()['operations']['read_block_data']
+        self.assertEqual(4, metrics['latency']['count'])
+        self.assertEqual(3, metrics['retries'])
+        self.assertEqual({'-83': 1, 'incomplete': 1, '-2': 1}, metrics['errors'])
+
+    def test_read_block_data_releases_bus_between_retries(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        config.retry_delay = 0.2
+        config.retry_jitter = 0
+        pi_gpio.get_control().i2c_read_device.side_effect = [pigpio.error(5), (10, [x for x in range(10)])]
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+        thread = Thread(target=i2c_control.read_block_data, args=[10])
+
+        # When
+        thread.start()
+        wait_for_condition(1, lambda: pi_gpio.get_control().i2c_read_device.call_count == 1)
+        i2c_control.write_register(2, 11)
+        thread.join(1)
+
+        # Then
+        pi_gpio.get_control().i2c_write_byte_data.assert_called_once_with(1, 2, 11)
+        self.assertEqual(2, pi_gpio.get_control().i2c_read_device.call_count)
+        self.assertEqual(1, i2c_control.get_diagnostics()['retry_policy']['retries'])
+
+    def test_read_block_data_fails_fast_when_circuit_open(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        config.retry_limit = 0
+        config.breaker_threshold = 2
+        pi_gpio.get_control().i2c_read_device.side_effect = pigpio.error(5)
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+        self.assertRaises(I2CError, i2c_control.read_block_data, 10)
+        self.assertRaises(I2CError, i2c_control.read_block_data, 10)
+
+        # When
+        self.assertRaises(CircuitOpenError, i2c_control.read_block_data, 10)
+
+        # Then
+        self.assertEqual(2, pi_gpio.get_control().i2c_read_device.call_count)
+        self.assertEqual('open', i2c_control.get_diagnostics()['retry_policy']['state'])
+
+    def test_read_block_data_bypassing_breaker_when_circuit_open(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        config.retry_limit = 0
+        config.breaker_threshold = 1
+        pi_gpio.get_control().i2c_read_device.side_effect = [pigpio.error(5), (10, [x for x in range(10)])]
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+        self.assertRaises(I2CError, i2c_control.read_block_data, 10)
+        self.assertRaises(CircuitOpenError, i2c_control.read_block_data, 10)
+
+        # When
+        result = i2c_control.read_block_data(10, bypass_breaker=True)
+
+        # Then
+        self.assertEqual([0, 1, 2, 3, 4, 5, 6, 7, 8, 9], result)
+        self.assertEqual('closed', i2c_control.get_diagnostics()['retry_policy']['state'])
+
+    def test_read_block_data_coalesces_concurrent_reads(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        bus_released = Event()
+
+        def read_device(handle, length):
+            bus_released.wait(1)
+            return length, [x for x in range(length)]
+
+        pi_gpio.get_control().i2c_read_device.side_effect = read_device
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+        results = []
+        threads = [Thread(target=lambda: results.append(i2c_control.read_block_data(10))) for _ in range(5)]
+
+        # When
+        threads[0].start()
+        wait_for_condition(1, lambda: pi_gpio.get_control().i2c_read_device.call_count == 1)
+        for thread in threads[1:]:
+            thread.start()
+        wait_for_condition(1, lambda: i2c_control._single_flight.get_coalesced_count() == 3)
+        bus_released.set()
+        for thread in threads:
+            thread.join(1)
+
+        # Then
+        self.assertEqual(2, pi_gpio.get_control().i2c_read_device.call_count)
+        self.assertEqual([[0, 1, 2, 3, 4, 5, 6, 7, 8, 9]] * 5, results)
+
+    def test_read_block_data_does_not_coalesce_sequential_reads(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        i2c_control.read_block_data(10)
+        i2c_control.read_block_data(10)
+
+        # Then
+        self.assertEqual(2, pi_gpio.get_control().i2c_read_device.call_count)
+        self.assertEqual(0, i2c_control._single_flight.get_coalesced_count())
+
+    def test_read_registers(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        result = i2c_control.read_registers(2, 3)
+
+        # Then
+        pi_gpio.get_control().i2c_read_i2c_block_data.assert_called_once_with(1, 2, 3)
+        pi_gpio.get_control().i2c_read_device.assert_not_called()
+        self.assertEqual([2, 3, 4], result)
+
+    def test_read_registers_when_read_raises_error(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_read_i2c_block_data.side_effect = pigpio.error(5)
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        self.assertRaises(I2CError, i2c_control.read_registers, 2, 3)
+
+        # Then
+        pi_gpio.get_control().i2c_read_i2c_block_data.assert_called_with(1, 2, 3)
+
+    def test_read_registers_when_read_returns_error_code(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_read_i2c_block_data.side_effect = None
+        pi_gpio.get_control().i2c_read_i2c_block_data.return_value = -2, []
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        self.assertRaises(I2CError, i2c_control.read_registers, 2, 3)
+
+        # Then
+        pi_gpio.get_control().i2c_read_i2c_block_data.assert_called_with(1, 2, 3)
+
+    def test_read_registers_when_read_returns_incomplete_data(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_read_i2c_block_data.side_effect = None
+        pi_gpio.get_control().i2c_read_i2c_block_data.return_value = 2, [2, 3]
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        self.assertRaises(I2CError, i2c_control.read_registers, 2, 3)
+
+        # Then
+        pi_gpio.get_control().i2c_read_i2c_block_data.assert_called_with(1, 2, 3)
+
     def test_write_register(self):
         # Given
         pi_gpio, config = create_components(1, 10)
@@ -175,12 +354,235 @@ class I2cControlTest(TestCase):
         # Then
         pi_gpio.get_control().i2c_write_byte_data.assert_called_with(1, 2, 7)
 
+    def test_write_registers(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        i2c_control.write_registers(2, [11, 12, 13])
+
+        # Then
+        pi_gpio.get_control().i2c_write_i2c_block_data.assert_called_once_with(1, 2, [11, 12, 13])
+
+    def test_write_registers_when_write_raises_error(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_write_i2c_block_data.side_effect = pigpio.error(5)
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        self.assertRaises(I2CError, i2c_control.write_registers, 2, [4, 5])
+
+        # Then
+        pi_gpio.get_control().i2c_write_i2c_block_data.assert_called_with(1, 2, [4, 5])
+
+    def test_write_registers_when_write_returns_error_code(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_write_i2c_block_data.return_value = -8
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        self.assertRaises(I2CError, i2c_control.write_registers, 2, [7, 8])
+
+        # Then
+        pi_gpio.get_control().i2c_write_i2c_block_data.assert_called_with(1, 2, [7, 8])
+
+    def test_update_register(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_read_byte_data.return_value = 0b1010
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        result = i2c_control.update_register(2, 0b0101, 0b1000)
+
+        # Then
+        pi_gpio.get_control().i2c_read_byte_data.assert_called_once_with(1, 2)
+        pi_gpio.get_control().i2c_write_byte_data.assert_called_once_with(1, 2, 0b0111)
+        pi_gpio.get_control().i2c_read_device.assert_not_called()
+        self.assertEqual(0b0111, result)
+
+    def test_read_modify_write(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_zip.return_value = 0, bytearray()
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        result = i2c_control.read_modify_write(2, 3, lambda registers: {1: registers[0] + 1, 2: 9, 5: 8})
+
+        # Then
+        self.assertEqual([2, 3, 4], result)
+        pi_gpio.get_control().i2c_read_i2c_block_data.assert_called_once_with(1, 2, 3)
+        pi_gpio.get_control().i2c_zip.assert_called_once_with(
+            1, I2CTransaction().write(1, [3, 9]).write(5, [8]).encode()
+        )
+
+    def test_read_modify_write_when_nothing_to_write(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        result = i2c_control.read_modify_write(2, 1, lambda registers: {})
+
+        # Then
+        self.assertEqual([2], result)
+        pi_gpio.get_control().i2c_zip.assert_not_called()
+
+    def test_update_register_when_value_unchanged(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_read_byte_data.return_value = 0b1010
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        result = i2c_control.update_register(2, 0b0010, 0b0100)
+
+        # Then
+        pi_gpio.get_control().i2c_write_byte_data.assert_not_called()
+        self.assertEqual(0b1010, result)
+
+    def test_update_register_when_read_returns_error_code(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_read_byte_data.return_value = -2
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        self.assertRaises(I2CError, i2c_control.update_register, 2, 1, 0)
+
+        # Then
+        pi_gpio.get_control().i2c_write_byte_data.assert_not_called()
+
+    def test_update_register_when_read_raises_error(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_read_byte_data.side_effect = pigpio.error(5)
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        self.assertRaises(I2CError, i2c_control.update_register, 2, 1, 0)
+
+        # Then
+        pi_gpio.get_control().i2c_write_byte_data.assert_not_called()
+
+    def test_write_values(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_zip.return_value = 0, bytearray()
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        i2c_control.write_values({7: 5, 2: 11, 3: 12})
+
+        # Then
+        pi_gpio.get_control().i2c_zip.assert_called_once_with(1, [2, 7, 3, 2, 11, 12, 7, 2, 7, 5, 0])
+        pi_gpio.get_control().i2c_write_i2c_block_data.assert_not_called()
+
+    def test_write_values_when_transaction_returns_error_code(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        pi_gpio.get_control().i2c_zip.return_value = -82, ''
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        self.assertRaises(I2CError, i2c_control.write_values, {2: 11, 7: 5})
+
+        # Then
+        self.assertEqual(4, pi_gpio.get_control().i2c_zip.call_count)
+
+    def test_write_registers_with_read_back_verification(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        config.verify_writes = True
+        pi_gpio.get_control().i2c_zip.return_value = 2, bytearray([11, 12])
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        i2c_control.write_registers(2, [11, 12])
+
+        # Then
+        pi_gpio.get_control().i2c_zip.assert_called_once_with(1, [2, 7, 3, 2, 11, 12, 7, 1, 2, 6, 2, 0])
+        pi_gpio.get_control().i2c_write_i2c_block_data.assert_not_called()
+
+    def test_write_values_with_read_back_verification(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        config.verify_writes = True
+        pi_gpio.get_control().i2c_zip.return_value = 3, bytearray([11, 12, 5])
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        i2c_control.write_values({7: 5, 2: 11, 3: 12})
+
+        # Then
+        pi_gpio.get_control().i2c_zip.assert_called_once_with(
+            1, [2, 7, 3, 2, 11, 12, 7, 2, 7, 5, 7, 1, 2, 6, 2, 7, 1, 7, 6, 1, 0]
+        )
+        pi_gpio.get_control().i2c_write_i2c_block_data.assert_not_called()
+
+    def test_write_values_when_read_back_verification_fails(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        config.verify_writes = True
+        config.retry_limit = 0
+        pi_gpio.get_control().i2c_zip.return_value = 3, bytearray([11, 12, 4])
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        with self.assertRaises(I2CError) as context:
+            i2c_control.write_values({7: 5, 2: 11, 3: 12})
+
+        # Then
+        self.assertEqual(7, context.exception.register)
+        self.assertEqual(1, pi_gpio.get_control().i2c_zip.call_count)
+
+    def test_write_register_when_read_back_verification_fails(self):
+        # Given
+        pi_gpio, config = create_components(1, 10)
+        config.verify_writes = True
+        config.retry_delay = 0.01
+        pi_gpio.get_control().i2c_zip.side_effect = [(1, bytearray([10])), (1, bytearray([11]))]
+        i2c_control = I2CControl(pi_gpio, config)
+        i2c_control.open_device()
+
+        # When
+        i2c_control.write_register(2, 11)
+
+        # Then
+        self.assertEqual(2, pi_gpio.get_control().i2c_zip.call_count)
+        pi_gpio.get_control().i2c_write_byte_data.assert_not_called()
+        metrics = i2c_control.get_diagnostics()['operations']['write_register']
+        self.assertEqual({'mismatch': 1}, metrics['errors'])
+
 
 def create_components(device: int = 0, length: int = 10):
     pi_gpio = MagicMock(spec=IPiGpio)
     pi_gpio.get_control().i2c_open.return_value = device
     pi_gpio.get_control().i2c_read_device.return_value = length, [x for x in range(length)]
+    pi_gpio.get_control().i2c_read_i2c_block_data.side_effect = lambda handle, start, count: (
+        count,
+        [x for x in range(start, start + count)],
+    )
     pi_gpio.get_control().i2c_write_byte_data.return_value = 0
+    pi_gpio.get_control().i2c_write_i2c_block_data.return_value = 0
     config = I2CConfig(1, 0x33, 3, 0.1)
 
     return pi_gpio, config
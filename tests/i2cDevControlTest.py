@@ -0,0 +1,243 @@
+import errno
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+
+from mrhat_daemon import (
+    I2CConfig,
+    I2CDevControl,
+    I2CError,
+    IDeviceFile,
+    I2C_NO_DEVICE,
+    I2C_RDWR,
+    I2C_M_RD,
+)
+
+
+class I2cDevControlTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_startup_and_shutdown(self):
+        # Given
+        device_file, config = create_components()
+
+        # When
+        with I2CDevControl(config, device_file) as i2c_control:
+            i2c_control.open_device()
+
+        # Then
+        device_file.open.assert_called_once_with('/dev/i2c-1')
+        device_file.close.assert_called_once_with(3)
+
+    def test_open_device(self):
+        # Given
+        device_file, config = create_components()
+        i2c_control = I2CDevControl(config, device_file, '/dev/i2c-test')
+
+        # When
+        i2c_control.open_device()
+
+        # Then
+        self.assertEqual(3, i2c_control._device)
+        device_file.open.assert_called_once_with('/dev/i2c-test')
+
+    def test_close_device(self):
+        # Given
+        device_file, config = create_components()
+        i2c_control = I2CDevControl(config, device_file)
+        i2c_control.open_device()
+
+        # When
+        i2c_control.close_device()
+
+        # Then
+        self.assertEqual(I2C_NO_DEVICE, i2c_control._device)
+        device_file.close.assert_called_once_with(3)
+
+    def test_read_block_data(self):
+        # Given
+        device_file, config = create_components()
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        result = i2c_control.read_block_data(5)
+
+        # Then
+        self.assertEqual([0, 1, 2, 3, 4], result)
+        self.assertEqual([(0x33, I2C_M_RD, [0, 1, 2, 3, 4])], device_file.transfers[0])
+
+    def test_read_registers(self):
+        # Given
+        device_file, config = create_components()
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        result = i2c_control.read_registers(4, 3)
+
+        # Then
+        self.assertEqual([4, 5, 6], result)
+        self.assertEqual([(0x33, 0, [4]), (0x33, I2C_M_RD, [4, 5, 6])], device_file.transfers[0])
+
+    def test_write_register(self):
+        # Given
+        device_file, config = create_components()
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        i2c_control.write_register(2, 0x80)
+
+        # Then
+        self.assertEqual(0x80, device_file.registers[2])
+        self.assertEqual([(0x33, 0, [2, 0x80])], device_file.transfers[0])
+
+    def test_write_registers(self):
+        # Given
+        device_file, config = create_components()
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        i2c_control.write_registers(2, [0x10, 0x20])
+
+        # Then
+        self.assertEqual([0x10, 0x20], device_file.registers[2:4])
+
+    def test_write_registers_when_verifying_writes(self):
+        # Given
+        device_file, config = create_components()
+        config.verify_writes = True
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        i2c_control.write_registers(2, [0x10, 0x20])
+
+        # Then
+        self.assertEqual([0x10, 0x20], device_file.registers[2:4])
+        self.assertEqual(
+            [(0x33, 0, [2, 0x10, 0x20]), (0x33, 0, [2]), (0x33, I2C_M_RD, [0x10, 0x20])], device_file.transfers[0]
+        )
+
+    def test_update_register(self):
+        # Given
+        device_file, config = create_components()
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        result = i2c_control.update_register(3, 0x80, 0x01)
+
+        # Then
+        self.assertEqual(0x82, result)
+        self.assertEqual(0x82, device_file.registers[3])
+
+    def test_write_values(self):
+        # Given
+        device_file, config = create_components()
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        i2c_control.write_values({2: 0x10, 3: 0x20, 8: 0x30})
+
+        # Then
+        self.assertEqual([0x10, 0x20], device_file.registers[2:4])
+        self.assertEqual(0x30, device_file.registers[8])
+        self.assertEqual([(0x33, 0, [2, 0x10, 0x20]), (0x33, 0, [8, 0x30])], device_file.transfers[0])
+
+    def test_read_registers_retries_when_ioctl_fails(self):
+        # Given
+        device_file, config = create_components()
+        device_file.failures = 2
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        result = i2c_control.read_registers(0, 2)
+
+        # Then
+        self.assertEqual([0, 1], result)
+        operations = i2c_control.get_diagnostics()['operations']
+        self.assertEqual(2, operations['read_registers']['retries'])
+        self.assertEqual({'EREMOTEIO': 2}, operations['read_registers']['errors'])
+
+    def test_read_registers_raises_error_when_retries_exhausted(self):
+        # Given
+        device_file, config = create_components()
+        device_file.failures = 4
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        with self.assertRaises(I2CError) as context:
+            i2c_control.read_registers(0, 2)
+
+        # Then
+        self.assertEqual('Failed to read I2C registers (exception)', context.exception.message)
+        self.assertEqual(0, context.exception.register)
+
+    def test_read_registers_raises_error_when_transfer_incomplete(self):
+        # Given
+        device_file, config = create_components()
+        device_file.ioctl.side_effect = lambda fd, request, argument: 1
+        config.retry_limit = 0
+        i2c_control = I2CDevControl(config, device_file)
+
+        # When
+        with self.assertRaises(I2CError) as context:
+            i2c_control.read_registers(0, 2)
+
+        # Then
+        self.assertEqual('Failed to read I2C registers (incomplete)', context.exception.message)
+
+
+class FakeDeviceFile(IDeviceFile):
+
+    def __init__(self):
+        self.open = MagicMock(return_value=3)
+        self.close = MagicMock()
+        self.ioctl = MagicMock(side_effect=self._transfer)
+        self.registers = [x for x in range(16)]
+        self.transfers = []
+        self.failures = 0
+        self._pointer = 0
+
+    def _transfer(self, fd: int, request: int, argument):
+        assert request == I2C_RDWR
+
+        if self.failures:
+            self.failures -= 1
+            raise OSError(errno.EREMOTEIO, 'Remote I/O error')
+
+        transfer = []
+
+        for index in range(argument.nmsgs):
+            message = argument.msgs[index]
+
+            if message.flags & I2C_M_RD:
+                for offset in range(message.len):
+                    message.buf[offset] = self.registers[self._pointer]
+                    self._pointer += 1
+            else:
+                self._pointer = message.buf[0]
+                for offset in range(1, message.len):
+                    self.registers[self._pointer + offset - 1] = message.buf[offset]
+
+            transfer.append((message.addr, message.flags, [message.buf[x] for x in range(message.len)]))
+
+        self.transfers.append(transfer)
+
+        return int(argument.nmsgs)
+
+
+def create_components():
+    device_file = FakeDeviceFile()
+    config = I2CConfig(1, 0x33, 3, 0.01)
+
+    return device_file, config
+
+
+if __name__ == '__main__':
+    unittest.main()
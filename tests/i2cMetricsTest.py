@@ -0,0 +1,64 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from mrhat_daemon import I2CMetrics, LatencyHistogram
+
+
+class I2CMetricsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_latency_histogram_counts_values_into_cumulative_buckets(self):
+        # Given
+        histogram = LatencyHistogram((0.001, 0.01, 0.1))
+
+        # When
+        for seconds in [0.0005, 0.001, 0.005, 0.05, 0.5]:
+            histogram.record(seconds)
+
+        # Then
+        snapshot = histogram.get_snapshot()
+        self.assertEqual(5, snapshot['count'])
+        self.assertAlmostEqual(0.5565, snapshot['sum'])
+        self.assertEqual({'0.001': 2, '0.01': 3, '0.1': 4, '+Inf': 5}, snapshot['buckets'])
+
+    def test_record_attempt(self):
+        # Given
+        i2c_metrics = I2CMetrics()
+
+        # When
+        i2c_metrics.record_attempt('read_block_data', 0.003)
+        i2c_metrics.record_attempt('read_block_data', 0.004, '-83')
+        i2c_metrics.record_attempt('read_block_data', 0.005, '-83')
+        i2c_metrics.record_attempt('write_register', 0.002, 'incomplete')
+
+        # Then
+        metrics = i2c_metrics.get_metrics()
+        self.assertEqual(3, metrics['read_block_data']['latency']['count'])
+        self.assertEqual({'-83': 2}, metrics['read_block_data']['errors'])
+        self.assertEqual(1, metrics['write_register']['latency']['count'])
+        self.assertEqual({'incomplete': 1}, metrics['write_register']['errors'])
+
+    def test_record_retry(self):
+        # Given
+        i2c_metrics = I2CMetrics()
+
+        # When
+        i2c_metrics.record_retry('read_block_data')
+        i2c_metrics.record_retry('read_block_data')
+
+        # Then
+        metrics = i2c_metrics.get_metrics()
+        self.assertEqual(2, metrics['read_block_data']['retries'])
+        self.assertEqual(0, metrics['read_block_data']['latency']['count'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from mrhat_daemon import I2CTransaction, I2CMessage
+
+
+class I2CTransactionTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_encode_empty_transaction(self):
+        # Given
+        transaction = I2CTransaction()
+
+        # When
+        result = transaction.encode()
+
+        # Then
+        self.assertEqual([2, 0], result)
+        self.assertEqual(0, transaction.get_read_length())
+
+    def test_encode_write_and_read(self):
+        # Given
+        transaction = I2CTransaction().write(3, [10, 11]).read(3, 2).read(10, 1)
+
+        # When
+        result = transaction.encode()
+
+        # Then
+        self.assertEqual([2, 7, 3, 3, 10, 11, 7, 1, 3, 6, 2, 7, 1, 10, 6, 1, 0], result)
+        self.assertEqual(3, transaction.get_read_length())
+
+    def test_encode_long_read_with_escape(self):
+        # Given
+        transaction = I2CTransaction().read(0, 300)
+
+        # When
+        result = transaction.encode()
+
+        # Then
+        self.assertEqual([2, 7, 1, 0, 1, 6, 44, 1, 0], result)
+
+    def test_get_messages(self):
+        # Given
+        transaction = I2CTransaction().write(3, [10, 11]).read(3, 2)
+
+        # When
+        result = transaction.get_messages()
+
+        # Then
+        self.assertEqual(
+            [I2CMessage(False, 3, [3, 10, 11]), I2CMessage(False, 1, [3]), I2CMessage(True, 2)],
+            result,
+        )
+
+    def test_split_read_data(self):
+        # Given
+        transaction = I2CTransaction().read(0, 2).write(5, [1]).read(8, 3)
+
+        # When
+        result = transaction.split([1, 2, 3, 4, 5])
+
+        # Then
+        self.assertEqual([[1, 2], [3, 4, 5]], result)
+
+
+if __name__ == '__main__':
+    unittest.main()
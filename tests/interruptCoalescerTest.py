@@ -0,0 +1,116 @@
+import time
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+
+from mrhat_daemon import InterruptCoalescer, InterruptCoalescerStats, get_tick_difference
+
+
+class InterruptCoalescerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_handle_first_interrupt(self):
+        # Given
+        handler, tick_source = create_components([1000])
+        interrupt_coalescer = InterruptCoalescer(handler, tick_source)
+
+        # When
+        interrupt_coalescer.handle(22, 0, 900)
+
+        # Then
+        handler.assert_called_once_with(22, 0, 900, 1000)
+        self.assertEqual(InterruptCoalescerStats(1, 1, 0), interrupt_coalescer.get_stats())
+
+    def test_handle_coalesces_interrupts_before_last_read(self):
+        # Given
+        handler, tick_source = create_components([1000, 2000])
+        interrupt_coalescer = InterruptCoalescer(handler, tick_source)
+        interrupt_coalescer.handle(22, 0, 900)
+
+        # When
+        interrupt_coalescer.handle(22, 0, 950)
+        interrupt_coalescer.handle(22, 0, 1000)
+        interrupt_coalescer.handle(22, 0, 1500)
+        interrupt_coalescer.handle(22, 0, 1600)
+
+        # Then
+        self.assertEqual([(22, 0, 900, 1000), (22, 0, 1500, 2000)], [call.args for call in handler.call_args_list])
+        self.assertEqual(InterruptCoalescerStats(5, 2, 3), interrupt_coalescer.get_stats())
+
+    def test_handle_coalesces_interrupts_when_tick_wrapped(self):
+        # Given
+        handler, tick_source = create_components([0xFFFFFFF0, 0x10])
+        interrupt_coalescer = InterruptCoalescer(handler, tick_source)
+        interrupt_coalescer.handle(22, 0, 0xFFFFFF00)
+
+        # When
+        interrupt_coalescer.handle(22, 0, 0xFFFFFFE0)
+        interrupt_coalescer.handle(22, 0, 0x05)
+
+        # Then
+        self.assertEqual(InterruptCoalescerStats(3, 2, 1), interrupt_coalescer.get_stats())
+
+    def test_handle_waits_for_debounce_window(self):
+        # Given
+        handler, tick_source = create_components([1000, 51000])
+        interrupt_coalescer = InterruptCoalescer(handler, tick_source, 0.05)
+        started = time.perf_counter()
+
+        # When
+        interrupt_coalescer.handle(22, 0, 900)
+
+        # Then
+        self.assertGreaterEqual(time.perf_counter() - started, 0.045)
+        handler.assert_called_once_with(22, 0, 900, 51000)
+
+    def test_handle_when_debounce_window_elapsed(self):
+        # Given
+        handler, tick_source = create_components([60900, 61000])
+        interrupt_coalescer = InterruptCoalescer(handler, tick_source, 0.05)
+        started = time.perf_counter()
+
+        # When
+        interrupt_coalescer.handle(22, 0, 900)
+
+        # Then
+        self.assertLess(time.perf_counter() - started, 0.045)
+        handler.assert_called_once_with(22, 0, 900, 61000)
+
+    def test_handle_does_not_coalesce_after_failed_read(self):
+        # Given
+        handler, tick_source = create_components([1000, 2000])
+        handler.side_effect = [Exception('I2C failure'), None]
+        interrupt_coalescer = InterruptCoalescer(handler, tick_source)
+        with self.assertRaises(Exception):
+            interrupt_coalescer.handle(22, 0, 900)
+
+        # When
+        interrupt_coalescer.handle(22, 0, 950)
+
+        # Then
+        self.assertEqual(InterruptCoalescerStats(2, 2, 0), interrupt_coalescer.get_stats())
+
+    def test_get_tick_difference(self):
+        self.assertEqual(100, get_tick_difference(1000, 1100))
+        self.assertEqual(-100, get_tick_difference(1100, 1000))
+        self.assertEqual(0x20, get_tick_difference(0xFFFFFFF0, 0x10))
+        self.assertEqual(-0x20, get_tick_difference(0x10, 0xFFFFFFF0))
+
+
+def create_components(ticks):
+    handler = MagicMock()
+    tick_source = MagicMock(side_effect=ticks)
+
+    return handler, tick_source
+
+
+if __name__ == '__main__':
+    unittest.main()
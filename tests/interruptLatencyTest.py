@@ -0,0 +1,78 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+
+from mrhat_daemon import InterruptLatency, InterruptStage, RollingPercentiles
+
+
+class InterruptLatencyTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_records_stages_relative_to_edge_tick(self):
+        # Given
+        clock = MagicMock(side_effect=[10.0, 10.002, 10.003, 10.005])
+        interrupt_latency = InterruptLatency(clock=clock)
+
+        # When
+        interrupt_latency.start(1000, 1500)
+        interrupt_latency.record(InterruptStage.READ_COMPLETE)
+        interrupt_latency.record(InterruptStage.RULES_EVALUATED)
+        interrupt_latency.record(InterruptStage.ACTIONS_DISPATCHED)
+
+        # Then
+        last = interrupt_latency.get_stats()['last']
+        self.assertEqual(1000, last['tick'])
+        self.assertAlmostEqual(0.0005, last['handler_start'])
+        self.assertAlmostEqual(0.0025, last['read_complete'])
+        self.assertAlmostEqual(0.0035, last['rules_evaluated'])
+        self.assertAlmostEqual(0.0055, last['actions_dispatched'])
+
+    def test_records_handler_start_when_tick_wrapped(self):
+        # Given
+        interrupt_latency = InterruptLatency()
+
+        # When
+        interrupt_latency.start(0xFFFFFF00, 0x100)
+
+        # Then
+        self.assertAlmostEqual(0.000512, interrupt_latency.get_stats()['last']['handler_start'])
+
+    def test_percentiles_of_recorded_samples(self):
+        # Given
+        percentiles = RollingPercentiles()
+
+        # When
+        for sample in range(100, 0, -1):
+            percentiles.record(sample / 1000)
+
+        # Then
+        self.assertEqual(
+            {'count': 100, 'window': 100, 'p50': 0.05, 'p90': 0.09, 'p99': 0.099, 'max': 0.1},
+            percentiles.get_snapshot(),
+        )
+
+    def test_percentiles_of_rolling_window(self):
+        # Given
+        percentiles = RollingPercentiles(2)
+
+        # When
+        for sample in [0.5, 0.001, 0.002]:
+            percentiles.record(sample)
+
+        # Then
+        self.assertEqual(
+            {'count': 3, 'window': 2, 'p50': 0.001, 'p90': 0.002, 'p99': 0.002, 'max': 0.002},
+            percentiles.get_snapshot(),
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+import unittest
+from threading import Event, Thread
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+from test_utility import wait_for_condition
+
+from mrhat_daemon import InterruptWorker, InterruptWorkerStats, InterruptCoalescer, InterruptCoalescerStats
+
+
+class InterruptWorkerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_submit_hands_over_interrupt_to_worker(self):
+        # Given
+        handler = MagicMock()
+        clock = MagicMock(side_effect=[10.0, 10.002])
+        interrupt_worker = InterruptWorker(handler, 4, clock)
+        interrupt_worker.start()
+
+        # When
+        interrupt_worker.submit(22, 0, 12345678)
+
+        # Then
+        wait_for_condition(1, lambda: handler.call_count == 1)
+        handler.assert_called_once_with(22, 0, 12345678)
+        interrupt_worker.stop()
+        stats = interrupt_worker.get_stats()
+        self.assertEqual(
+            (0, 1, 1, 1, 0), (stats.depth, stats.max_depth, stats.submitted, stats.processed, stats.dropped)
+        )
+        self.assertAlmostEqual(0.002, stats.handoff_latency_average)
+        self.assertAlmostEqual(0.002, stats.handoff_latency_max)
+
+    def test_submit_keeps_newest_interrupt_when_queue_full(self):
+        # Given
+        released = Event()
+        handler = MagicMock(side_effect=lambda gpio, level, tick: released.wait(1))
+        interrupt_worker = InterruptWorker(handler, 2)
+        interrupt_worker.start()
+        interrupt_worker.submit(22, 0, 100)
+        wait_for_condition(1, lambda: handler.call_count == 1)
+
+        # When
+        for tick in range(200, 600, 100):
+            interrupt_worker.submit(22, 0, tick)
+
+        # Then
+        stats = interrupt_worker.get_stats()
+        self.assertEqual((2, 2, 3, 2), (stats.depth, stats.max_depth, stats.submitted, stats.dropped))
+        released.set()
+        wait_for_condition(1, lambda: handler.call_count == 4)
+        self.assertEqual([100, 200, 300, 500], [call.args[2] for call in handler.call_args_list])
+        interrupt_worker.stop()
+
+    def test_newest_dropped_interrupt_handled_when_queued_ones_coalesced(self):
+        # Given
+        released = Event()
+        tick_source = MagicMock(side_effect=[150, 400])
+        handler = MagicMock(side_effect=lambda gpio, level, tick, current_tick: released.wait(1))
+        interrupt_coalescer = InterruptCoalescer(handler, tick_source)
+        interrupt_worker = InterruptWorker(interrupt_coalescer.handle, 2)
+        interrupt_worker.start()
+        interrupt_worker.submit(22, 0, 100)
+        wait_for_condition(1, lambda: handler.call_count == 1)
+
+        # When
+        interrupt_worker.submit(22, 0, 110)
+        interrupt_worker.submit(22, 0, 120)
+        interrupt_worker.submit(22, 0, 200)
+
+        # Then
+        released.set()
+        wait_for_condition(1, lambda: handler.call_count == 2)
+        self.assertEqual([100, 200], [call.args[2] for call in handler.call_args_list])
+        self.assertEqual(InterruptCoalescerStats(4, 2, 2), interrupt_coalescer.get_stats())
+        interrupt_worker.stop()
+
+    def test_worker_continues_when_handler_fails(self):
+        # Given
+        handler = MagicMock(side_effect=[Exception('I2C failure'), None])
+        interrupt_worker = InterruptWorker(handler, 4)
+        interrupt_worker.start()
+
+        # When
+        interrupt_worker.submit(22, 0, 100)
+        interrupt_worker.submit(22, 0, 200)
+
+        # Then
+        wait_for_condition(1, lambda: handler.call_count == 2)
+        interrupt_worker.stop()
+
+    def test_stop_discards_queued_interrupts(self):
+        # Given
+        released = Event()
+        handler = MagicMock(side_effect=lambda gpio, level, tick: released.wait(1))
+        interrupt_worker = InterruptWorker(handler, 4)
+        interrupt_worker.start()
+        interrupt_worker.submit(22, 0, 100)
+        wait_for_condition(1, lambda: handler.call_count == 1)
+        interrupt_worker.submit(22, 0, 200)
+        interrupt_worker.submit(22, 0, 300)
+
+        stopping = Thread(target=interrupt_worker.stop)
+
+        # When
+        stopping.start()
+        wait_for_condition(1, lambda: interrupt_worker._thread is None)
+        released.set()
+        stopping.join(1)
+
+        # Then
+        handler.assert_called_once_with(22, 0, 100)
+        self.assertEqual(1, interrupt_worker.get_stats().processed)
+
+    def test_start_discards_interrupts_submitted_while_stopped(self):
+        # Given
+        handler = MagicMock()
+        interrupt_worker = InterruptWorker(handler, 4)
+        interrupt_worker.submit(22, 0, 100)
+
+        # When
+        interrupt_worker.start()
+        interrupt_worker.submit(22, 0, 200)
+
+        # Then
+        wait_for_condition(1, lambda: handler.call_count == 1)
+        interrupt_worker.stop()
+        handler.assert_called_once_with(22, 0, 200)
+
+    def test_stop_when_not_started(self):
+        # Given
+        interrupt_worker = InterruptWorker(MagicMock(), 4)
+
+        # When
+        interrupt_worker.stop()
+
+        # Then
+        self.assertEqual(InterruptWorkerStats(0, 0, 0, 0, 0, 0.0, 0.0), interrupt_worker.get_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,4 @@
+import time
 import unittest
 from unittest import TestCase
 from unittest.mock import MagicMock, call
@@ -16,6 +17,16 @@ from mrhat_daemon import (
     REGISTER_SPACE_LENGTH,
     MrHatControlConfig,
     I2CError,
+    I2CConfig,
+    I2CControl,
+    CircuitOpenError,
+    BatchOperation,
+    BatchOperationType,
+    RegisterChange,
+    Rule,
+    RuleAction,
+    RuleActionType,
+    RuleTrigger,
 )
 
 
@@ -53,7 +64,11 @@ class MrHatControlTest(TestCase):
         # Then
         pic_programmer.detect_device.assert_called_once()
         pi_gpio.assert_has_calls(
-            [call.start(mr_hat_control._handle_interrupt), call.stop(), call.start(mr_hat_control._handle_interrupt)]
+            [
+                call.start(mr_hat_control._interrupt_worker.submit),
+                call.stop(),
+                call.start(mr_hat_control._interrupt_worker.submit),
+            ]
         )
         i2c_control.assert_has_calls(
             [call.open_device(), call.read_block_data(REGISTER_SPACE_LENGTH), call.close_device(), call.open_device()]
@@ -70,7 +85,7 @@ class MrHatControlTest(TestCase):
 
         # Then
         pic_programmer.detect_device.assert_called_once()
-        pi_gpio.start.assert_called_once_with(mr_hat_control._handle_interrupt)
+        pi_gpio.start.assert_called_once_with(mr_hat_control._interrupt_worker.submit)
         i2c_control.open_device.assert_called_once()
         i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
         pic_programmer.upgrade_firmware.assert_not_called()
@@ -86,7 +101,7 @@ class MrHatControlTest(TestCase):
 
         # Then
         pic_programmer.detect_device.assert_called_once()
-        pi_gpio.start.assert_called_once_with(mr_hat_control._handle_interrupt)
+        pi_gpio.start.assert_called_once_with(mr_hat_control._interrupt_worker.submit)
         i2c_control.open_device.assert_called_once()
         i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
         pic_programmer.upgrade_firmware.assert_not_called()
@@ -102,7 +117,7 @@ class MrHatControlTest(TestCase):
 
         # Then
         pic_programmer.detect_device.assert_called_once()
-        pi_gpio.start.assert_called_once_with(mr_hat_control._handle_interrupt)
+        pi_gpio.start.assert_called_once_with(mr_hat_control._interrupt_worker.submit)
         i2c_control.open_device.assert_called_once()
         i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
         pic_programmer.upgrade_firmware.assert_not_called()
@@ -120,23 +135,51 @@ class MrHatControlTest(TestCase):
         # Then
         pic_programmer.detect_device.assert_called_once()
         pi_gpio.assert_has_calls(
-            [call.start(mr_hat_control._handle_interrupt), call.stop(), call.start(mr_hat_control._handle_interrupt)]
+            [
+                call.start(mr_hat_control._interrupt_worker.submit),
+                call.stop(),
+                call.start(mr_hat_control._interrupt_worker.submit),
+            ]
         )
         i2c_control.assert_has_calls(
             [call.open_device(), call.read_block_data(REGISTER_SPACE_LENGTH), call.close_device(), call.open_device()]
         )
         pic_programmer.upgrade_firmware.assert_called_once()
 
+    def test_interrupt_not_handled_during_firmware_upgrade(self):
+        # Given
+        i2c_data = [0, 128, 0, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, 0, 0, 0, 1, 0, 0]
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components(i2c_data)
+        config.upgrade_firmware = True
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+
+        def upgrade_firmware():
+            mr_hat_control._interrupt_worker.submit(27, 0, 12345678)
+            time.sleep(0.1)
+
+        pic_programmer.upgrade_firmware.side_effect = upgrade_firmware
+
+        # When
+        with mr_hat_control:
+            mr_hat_control.initialize()
+
+        # Then
+        pic_programmer.upgrade_firmware.assert_called_once()
+        self.assertNotIn(call(REGISTER_SPACE_LENGTH, bypass_breaker=True), i2c_control.read_block_data.call_args_list)
+        pi_gpio.get_control.assert_not_called()
+        platform_access.execute_command_async.assert_not_called()
+        self.assertEqual(0, mr_hat_control.get_diagnostics()['interrupt_worker']['processed'])
+
     def test_handling_interrupt_when_shutdown_not_requested(self):
         # Given
         pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
         mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
 
         # When
-        mr_hat_control._handle_interrupt(27, 0, 12345678)
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
 
         # Then
-        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
+        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH, bypass_breaker=True)
         platform_access.execute_command_async.assert_not_called()
 
     def test_handling_interrupt_when_shutdown_requested(self):
@@ -146,10 +189,10 @@ class MrHatControlTest(TestCase):
         mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
 
         # When
-        mr_hat_control._handle_interrupt(27, 0, 12345678)
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
 
         # Then
-        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
+        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH, bypass_breaker=True)
         platform_access.execute_command_async.assert_called_once_with(['poweroff'])
 
     def test_handling_interrupt_when_shutdown_requested_and_force_power_off_configured(self):
@@ -160,12 +203,30 @@ class MrHatControlTest(TestCase):
         mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
 
         # When
-        mr_hat_control._handle_interrupt(27, 0, 12345678)
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
 
         # Then
-        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
+        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH, bypass_breaker=True)
         platform_access.execute_command_async.assert_called_once_with(['poweroff', '--force'])
 
+    def test_handling_interrupt_when_shutdown_requested_and_circuit_breaker_open(self):
+        # Given
+        i2c_data = [0, 128, 0, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, 0, 0, 0, 1, 0, 1]
+        pi_gpio, pic_programmer, _, platform_access, config = create_components()
+        pi_gpio.get_control().i2c_read_i2c_block_data.side_effect = pigpio.error(5)
+        pi_gpio.get_control().i2c_read_device.return_value = REGISTER_SPACE_LENGTH, bytearray(i2c_data)
+        i2c_control = I2CControl(pi_gpio, I2CConfig(1, 0x33, 0, 0.1, breaker_threshold=1))
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        self.assertRaises(I2CError, mr_hat_control.get_register, 1)
+        self.assertRaises(CircuitOpenError, mr_hat_control.get_register, 1)
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+
+        # Then
+        platform_access.execute_command_async.assert_called_once_with(['poweroff'])
+        self.assertEqual('closed', i2c_control.get_diagnostics()['retry_policy']['state'])
+
     def test_get_readable_registers(self):
         # Given
         pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
@@ -197,9 +258,42 @@ class MrHatControlTest(TestCase):
         result = mr_hat_control.get_register(1)
 
         # Then
-        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
+        i2c_control.read_registers.assert_called_once_with(1, 1)
+        i2c_control.read_block_data.assert_not_called()
         self.assertEqual(128, result)
 
+    def test_get_registers(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+
+        # When
+        result = mr_hat_control.get_registers(17, 3)
+
+        # Then
+        i2c_control.read_registers.assert_called_once_with(17, 3)
+        self.assertEqual([1, 0, 1], result.registers)
+        self.assertGreater(result.timestamp, 0)
+        self.assertEqual(1, result.generation)
+        self.assertIsNone(mr_hat_control.get_generation())
+
+    def test_get_registers_served_from_cache(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        config.register_cache_ttl = 10
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        first = mr_hat_control.get_registers(0, REGISTER_SPACE_LENGTH)
+
+        # When
+        result = mr_hat_control.get_registers(1, 2)
+
+        # Then
+        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
+        self.assertEqual([128, 5], result.registers)
+        self.assertEqual(first.timestamp, result.timestamp)
+        self.assertEqual(first.generation, result.generation)
+        self.assertEqual(first.generation, mr_hat_control.get_generation())
+
     def test_set_register(self):
         # Given
         pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
@@ -211,6 +305,63 @@ class MrHatControlTest(TestCase):
         # Then
         i2c_control.write_register.assert_called_once_with(1, 123)
 
+    def test_set_registers(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+
+        # When
+        mr_hat_control.set_registers({5: 50, 1: 10, 2: 20, 9: 90, 4: 40})
+
+        # Then
+        i2c_control.write_values.assert_called_once_with({5: 50, 1: 10, 2: 20, 9: 90, 4: 40})
+
+    def test_set_registers_coalesced_within_window(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        config.write_coalesce_window = 10
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+
+        # When
+        mr_hat_control.set_register(2, 20)
+        mr_hat_control.set_registers({1: 10, 2: 21})
+        mr_hat_control.set_register(5, 50)
+        mr_hat_control.flush_writes()
+
+        # Then
+        i2c_control.write_values.assert_called_once_with({2: 21, 1: 10, 5: 50})
+        i2c_control.write_register.assert_not_called()
+        self.assertEqual(1, mr_hat_control.get_diagnostics()['write_coalescer']['merged'])
+
+    def test_get_register_flushes_pending_writes(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        config.write_coalesce_window = 10
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.set_register(2, 20)
+
+        # When
+        mr_hat_control.get_register(2)
+
+        # Then
+        i2c_control.assert_has_calls([call.write_values({2: 20}), call.read_registers(2, 1)])
+
+    def test_get_register_when_flushing_pending_writes_fails(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        config.write_coalesce_window = 10
+        i2c_control.write_values.side_effect = I2CError('Write failed', pigpio.PI_I2C_WRITE_FAILED, [20])
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.set_register(2, 20)
+
+        # When
+        result = mr_hat_control.get_register(2)
+
+        # Then
+        i2c_control.read_registers.assert_called_once_with(2, 1)
+        self.assertEqual(5, result)
+        self.assertEqual(1, mr_hat_control.get_diagnostics()['write_coalescer']['failures'])
+
     def test_get_flag(self):
         # Given
         pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
@@ -220,7 +371,8 @@ class MrHatControlTest(TestCase):
         result = mr_hat_control.get_flag(2, 2)
 
         # Then
-        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
+        i2c_control.read_registers.assert_called_once_with(2, 1)
+        i2c_control.read_block_data.assert_not_called()
         self.assertEqual(1, result)
 
     def test_set_flag(self):
@@ -232,7 +384,8 @@ class MrHatControlTest(TestCase):
         mr_hat_control.set_flag(2, 1)
 
         # Then
-        i2c_control.write_register.assert_called_once_with(2, 7)
+        i2c_control.update_register.assert_called_once_with(2, 2, 0)
+        i2c_control.read_block_data.assert_not_called()
 
     def test_clear_flag(self):
         # Given
@@ -243,17 +396,290 @@ class MrHatControlTest(TestCase):
         mr_hat_control.clear_flag(2, 0)
 
         # Then
-        i2c_control.write_register.assert_called_once_with(2, 4)
+        i2c_control.update_register.assert_called_once_with(2, 0, 1)
+        i2c_control.read_block_data.assert_not_called()
+
+    def test_update_register(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        i2c_control.update_register.return_value = 6
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+
+        # When
+        result = mr_hat_control.update_register(2, 2, 1)
+
+        # Then
+        i2c_control.update_register.assert_called_once_with(2, 2, 1)
+        self.assertEqual(6, result)
+
+    def test_execute_batch(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        i2c_control.read_modify_write.side_effect = lambda start, count, modify: modify([128, 5]) and [128, 5]
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        operations = [
+            BatchOperation(BatchOperationType.READ, 2),
+            BatchOperation(BatchOperationType.UPDATE, 1, set_mask=1, flag=0),
+            BatchOperation(BatchOperationType.WRITE, 3, 7),
+        ]
+
+        # When
+        result = mr_hat_control.execute_batch(operations)
+
+        # Then
+        i2c_control.read_modify_write.assert_called_once()
+        self.assertEqual((1, 2), i2c_control.read_modify_write.call_args.args[:2])
+        self.assertEqual([5, 1, 7], result)
+
+    def test_execute_batch_when_only_reading(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        operations = [BatchOperation(BatchOperationType.READ, 10), BatchOperation(BatchOperationType.READ, 1, flag=7)]
+
+        # When
+        result = mr_hat_control.execute_batch(operations)
+
+        # Then
+        i2c_control.read_registers.assert_called_once_with(1, 10)
+        i2c_control.read_modify_write.assert_not_called()
+        self.assertEqual([2, 1], result)
+
+    def test_get_register_served_from_cache(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        config.register_cache_ttl = 10
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+
+        # When
+        mr_hat_control.get_register(1)
+        result = mr_hat_control.get_flag(2, 2)
+
+        # Then
+        i2c_control.read_block_data.assert_called_once_with(REGISTER_SPACE_LENGTH)
+        i2c_control.read_registers.assert_not_called()
+        self.assertEqual(1, result)
+        diagnostics = mr_hat_control.get_diagnostics()
+        self.assertEqual({'hits': 1, 'misses': 1, 'invalidations': 0}, diagnostics['register_cache'])
+
+    def test_get_diagnostics(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        i2c_control.get_diagnostics.return_value = {'coalesced_reads': 3}
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+
+        # When
+        result = mr_hat_control.get_diagnostics()
+
+        # Then
+        self.assertEqual(
+            {
+                'register_cache': {'hits': 0, 'misses': 0, 'invalidations': 0},
+                'events': {'subscribers': 0, 'published': 0, 'dropped': 0},
+                'interrupts': {'received': 0, 'handled': 0, 'coalesced': 0},
+                'interrupt_worker': {
+                    'depth': 0,
+                    'max_depth': 0,
+                    'submitted': 0,
+                    'processed': 0,
+                    'dropped': 0,
+                    'handoff_latency_average': 0.0,
+                    'handoff_latency_max': 0.0,
+                },
+                'interrupt_latency': {
+                    'handler_start': {'count': 0, 'window': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None},
+                    'read_complete': {'count': 0, 'window': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None},
+                    'rules_evaluated': {'count': 0, 'window': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None},
+                    'power_off': {'count': 0, 'window': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None},
+                    'actions_dispatched': {'count': 0, 'window': 0, 'p50': None, 'p90': None, 'p99': None, 'max': None},
+                    'last': {},
+                },
+                'i2c': {'coalesced_reads': 3},
+            },
+            result,
+        )
+
+    def test_register_cache_invalidated_by_write(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        config.register_cache_ttl = 10
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.get_register(1)
+
+        # When
+        mr_hat_control.set_register(1, 123)
+        mr_hat_control.get_register(1)
+
+        # Then
+        self.assertEqual(2, i2c_control.read_block_data.call_count)
+
+    def test_register_cache_refreshed_by_interrupt(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        config.register_cache_ttl = 10
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.get_register(10)
+        i2c_control.read_block_data.return_value = [0, 128, 5, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 1, 0, 1]
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+        result = mr_hat_control.get_register(10)
+
+        # Then
+        self.assertEqual(2, i2c_control.read_block_data.call_count)
+        self.assertEqual(0, result)
+
+    def test_register_changes_published_on_interrupt(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.initialize()
+        subscription = mr_hat_control.subscribe()
+        i2c_control.read_block_data.return_value = [0, 128, 5, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, 0, 0, 0, 1, 0, 1]
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+
+        # Then
+        event = subscription.get(0)
+        self.assertEqual('registers', event.name)
+        self.assertEqual([{'register': 10, 'previous': 2, 'value': 3, 'changed': 1}], event.data['changes'])
+
+    def test_change_handler_called_on_interrupt(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.initialize()
+        handler = MagicMock()
+        mr_hat_control.subscribe_changes(10, 0b01, handler)
+        i2c_control.read_block_data.return_value = [0, 128, 5, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, 0, 0, 0, 1, 0, 1]
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+
+        # Then
+        handler.assert_called_once_with(RegisterChange(10, 2, 3, 1))
+
+    def test_rule_actions_executed_on_interrupt(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        config.rules = [
+            Rule('command', 10, RuleTrigger.RISING, 4, RuleAction(RuleActionType.COMMAND, command=('reboot',))),
+            Rule('write', 10, RuleTrigger.EQUALS, 6, RuleAction(RuleActionType.WRITE, register=1, value=64)),
+            Rule('event', 10, RuleTrigger.RISING, 4, RuleAction(RuleActionType.EVENT, event='alert')),
+            Rule('ignored', 10, RuleTrigger.FALLING, 2, RuleAction(RuleActionType.EVENT, event='ignored')),
+        ]
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.initialize()
+        subscription = mr_hat_control.subscribe()
+        i2c_control.read_block_data.return_value = [0, 128, 5, 0, 0, 0, 0, 0, 0, 0, 6, 0, 0, 0, 0, 0, 0, 1, 0, 1]
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+
+        # Then
+        platform_access.execute_command_async.assert_called_once_with(['reboot'])
+        i2c_control.write_register.assert_called_once_with(1, 64)
+        self.assertEqual('registers', subscription.get(0).name)
+        event = subscription.get(0)
+        self.assertEqual('alert', event.name)
+        self.assertEqual(('event', 10, 6), (event.data['rule'], event.data['register'], event.data['value']))
+        self.assertIsNone(subscription.get(0))
+
+    def test_power_off_dispatched_before_rule_actions(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        action = RuleAction(RuleActionType.WRITE, register=1, value=64)
+        config.rules = [Rule('write', 10, RuleTrigger.RISING, 1, action)]
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.initialize()
+        i2c_control.read_block_data.return_value = [0, 128, 5, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, 0, 0, 0, 1, 0, 1]
+        power_off_dispatched = []
+        i2c_control.write_register.side_effect = lambda register, value: power_off_dispatched.append(
+            platform_access.execute_command_async.called
+        )
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+
+        # Then
+        platform_access.execute_command_async.assert_called_once_with(['poweroff'])
+        self.assertEqual([True], power_off_dispatched)
+
+    def test_interrupt_latency_recorded_on_interrupt(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.initialize()
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+
+        # Then
+        pi_gpio.get_control.return_value.get_current_tick.assert_not_called()
+        latency = mr_hat_control.get_diagnostics()['interrupt_latency']
+        self.assertEqual(12345678, latency['last']['tick'])
+        self.assertEqual(0.001, latency['last']['handler_start'])
+        self.assertEqual(0.001, latency['handler_start']['p99'])
+        for stage in ['read_complete', 'rules_evaluated', 'actions_dispatched']:
+            self.assertEqual(1, latency[stage]['count'])
+            self.assertLessEqual(0.001, latency['last'][stage])
+        self.assertEqual(0, latency['power_off']['count'])
+        self.assertNotIn('power_off', latency['last'])
+
+    def test_power_off_latency_excludes_rule_actions(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        action = RuleAction(RuleActionType.WRITE, register=1, value=64)
+        config.rules = [Rule('write', 10, RuleTrigger.RISING, 1, action)]
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.initialize()
+        i2c_control.read_block_data.return_value = [0, 128, 5, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, 0, 0, 0, 1, 0, 1]
+        i2c_control.write_register.side_effect = lambda register, value: time.sleep(0.1)
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+
+        # Then
+        latency = mr_hat_control.get_diagnostics()['interrupt_latency']
+        self.assertEqual(1, latency['power_off']['count'])
+        self.assertLess(latency['last']['power_off'], 0.1)
+        self.assertLessEqual(0.1, latency['last']['actions_dispatched'] - latency['last']['power_off'])
+
+    def test_no_event_published_on_interrupt_when_registers_unchanged(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+        mr_hat_control = MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config)
+        mr_hat_control.initialize()
+        subscription = mr_hat_control.subscribe()
+
+        # When
+        mr_hat_control._handle_interrupt(27, 0, 12345678, 12346678)
+
+        # Then
+        self.assertIsNone(subscription.get(0))
+
+    def test_subscriptions_closed_on_shutdown(self):
+        # Given
+        pi_gpio, pic_programmer, i2c_control, platform_access, config = create_components()
+
+        with MrHatControl(pi_gpio, pic_programmer, i2c_control, platform_access, config) as mr_hat_control:
+            subscription = mr_hat_control.subscribe()
+
+        # Then
+        self.assertTrue(subscription.is_closed())
 
 
 def create_components(i2c_data=None):
     if i2c_data is None:
         i2c_data = [0, 128, 5, 0, 0, 0, 0, 0, 0, 0, 2, 0, 0, 0, 0, 0, 0, 1, 0, 1]
     pi_gpio = MagicMock(spec=IPiGpio)
+    pi_gpio.get_control.return_value.get_current_tick.return_value = 12346678
     pic_programmer = MagicMock(spec=IPicProgrammer)
     pic_programmer.load_firmware.return_value = FirmwareFile('', '', Version('1.0.1'))
     i2c_control = MagicMock(spec=II2CControl)
     i2c_control.read_block_data.return_value = i2c_data
+    i2c_control.read_registers.side_effect = lambda start, count: i2c_data[start:][:count]
     platform_access = MagicMock(spec=IPlatformAccess)
     config = MrHatControlConfig()
 
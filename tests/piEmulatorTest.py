@@ -0,0 +1,232 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+import pigpio
+from context_logger import setup_logging
+from test_utility import wait_for_condition
+
+from mrhat_daemon import (
+    DeviceEmulator,
+    DeviceEmulatorConfig,
+    PiEmulator,
+    IPiGpio,
+    I2CConfig,
+    I2CControl,
+    I2CError,
+    MrHatControl,
+    MrHatControlConfig,
+    BatchOperation,
+    BatchOperationType,
+    IPicProgrammer,
+    IPlatformAccess,
+)
+
+
+class PiEmulatorTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_read_block_data(self):
+        # Given
+        device, emulator, i2c_control = create_components({0: 0xA5, 17: 1, 18: 2, 19: 3})
+
+        # When
+        result = i2c_control.read_block_data(20)
+
+        # Then
+        self.assertEqual([0xA5, *[0] * 16, 1, 2, 3], result)
+
+        emulator.stop()
+
+    def test_read_registers(self):
+        # Given
+        device, emulator, i2c_control = create_components({17: 1, 18: 2, 19: 3})
+
+        # When
+        result = i2c_control.read_registers(17, 3)
+
+        # Then
+        self.assertEqual([1, 2, 3], result)
+
+        emulator.stop()
+
+    def test_write_registers(self):
+        # Given
+        device, emulator, i2c_control = create_components()
+
+        # When
+        i2c_control.write_registers(1, [0x10, 0x20])
+        i2c_control.write_register(9, 0x30)
+
+        # Then
+        self.assertEqual(0x10, device.get_register(1))
+        self.assertEqual(0x20, device.get_register(2))
+        self.assertEqual(0x30, device.get_register(9))
+
+        emulator.stop()
+
+    def test_write_register_ignored_when_register_is_read_only(self):
+        # Given
+        device, emulator, i2c_control = create_components({10: 0x01})
+
+        # When
+        i2c_control.write_register(10, 0xFF)
+
+        # Then
+        self.assertEqual(0x01, device.get_register(10))
+
+        emulator.stop()
+
+    def test_update_register(self):
+        # Given
+        device, emulator, i2c_control = create_components({1: 0x81})
+
+        # When
+        result = i2c_control.update_register(1, 0x02, 0x80)
+
+        # Then
+        self.assertEqual(0x03, result)
+        self.assertEqual(0x03, device.get_register(1))
+
+        emulator.stop()
+
+    def test_write_values(self):
+        # Given
+        device, emulator, i2c_control = create_components()
+
+        # When
+        i2c_control.write_values({1: 0x55, 2: 0x66, 9: 0x77})
+
+        # Then
+        self.assertEqual([0x55, 0x66, 0x77], [device.get_register(register) for register in (1, 2, 9)])
+        self.assertEqual(1, device.get_transfer_count())
+
+        emulator.stop()
+
+    def test_execute_batch(self):
+        # Given
+        device, emulator, i2c_control = create_components({1: 0x80, 10: 0x02})
+        mr_hat_control = MrHatControl(
+            MagicMock(spec=IPiGpio),
+            MagicMock(spec=IPicProgrammer),
+            i2c_control,
+            MagicMock(spec=IPlatformAccess),
+            MrHatControlConfig(),
+        )
+        operations = [
+            BatchOperation(BatchOperationType.READ, 10, flag=1),
+            BatchOperation(BatchOperationType.UPDATE, 1, set_mask=0x01),
+            BatchOperation(BatchOperationType.WRITE, 2, 0x22),
+            BatchOperation(BatchOperationType.WRITE, 4, 0x44),
+        ]
+
+        # When
+        result = mr_hat_control.execute_batch(operations)
+
+        # Then
+        self.assertEqual([1, 0x81, 0x22, 0x44], result)
+        self.assertEqual([0x81, 0x22, 0, 0x44], [device.get_register(register) for register in range(1, 5)])
+        self.assertEqual(2, device.get_transfer_count())
+
+        emulator.stop()
+
+    def test_operation_fails_when_device_is_closed(self):
+        # Given
+        device, emulator, i2c_control = create_components()
+        i2c_control.open_device()
+        emulator.i2c_close(i2c_control._device)
+
+        # When
+        with self.assertRaises(I2CError) as context:
+            i2c_control.read_registers(0, 1)
+
+        # Then
+        self.assertEqual('Failed to read I2C registers (exception)', context.exception.message)
+
+        emulator.stop()
+
+    def test_fire_interrupt(self):
+        # Given
+        device = DeviceEmulator(DeviceEmulatorConfig(interrupt_pin=22))
+        emulator = PiEmulator(device)
+        emulator.set_mode(22, pigpio.INPUT)
+        emulator.set_pull_up_down(22, pigpio.PUD_UP)
+        handler = MagicMock()
+        emulator.callback(22, pigpio.FALLING_EDGE, handler)
+
+        # When
+        device.fire_interrupt()
+
+        # Then
+        wait_for_condition(1, lambda: handler.call_count == 1)
+        gpio, level, tick = handler.call_args.args
+        self.assertEqual((22, 0), (gpio, level))
+        wait_for_condition(1, lambda: emulator.read(22) == 1)
+
+        emulator.stop()
+
+    def test_fire_interrupt_when_callback_cancelled(self):
+        # Given
+        device = DeviceEmulator()
+        emulator = PiEmulator(device)
+        handler = MagicMock()
+        emulator.callback(22, pigpio.EITHER_EDGE, handler).cancel()
+        other_handler = MagicMock()
+        emulator.callback(22, pigpio.EITHER_EDGE, other_handler)
+
+        # When
+        device.fire_interrupt()
+
+        # Then
+        wait_for_condition(1, lambda: other_handler.call_count == 2)
+        handler.assert_not_called()
+
+        emulator.stop()
+
+    def test_fire_interrupt_when_stopped(self):
+        # Given
+        device = DeviceEmulator()
+        emulator = PiEmulator(device)
+        handler = MagicMock()
+        emulator.callback(22, pigpio.EITHER_EDGE, handler)
+        emulator.stop()
+
+        # When
+        device.fire_interrupt()
+
+        # Then
+        self.assertFalse(emulator.connected)
+        handler.assert_not_called()
+
+    def test_get_current_tick(self):
+        # Given
+        clock = MagicMock(side_effect=[100.0, 100.5])
+        emulator = PiEmulator(DeviceEmulator(), clock)
+
+        # When
+        result = emulator.get_current_tick()
+
+        # Then
+        self.assertEqual(500000, result)
+
+        emulator.stop()
+
+
+def create_components(registers=None):
+    device = DeviceEmulator(DeviceEmulatorConfig(registers=registers or {}))
+    emulator = PiEmulator(device)
+    pi_gpio = MagicMock(spec=IPiGpio)
+    pi_gpio.get_control.return_value = emulator
+    i2c_control = I2CControl(pi_gpio, I2CConfig(1, 0x33, 0, 0.01))
+
+    return device, emulator, i2c_control
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from mrhat_daemon import RegisterBatch, BatchOperation, BatchOperationType
+
+READ = BatchOperationType.READ
+WRITE = BatchOperationType.WRITE
+UPDATE = BatchOperationType.UPDATE
+
+
+class RegisterBatchTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_get_read_range(self):
+        # Given
+        batch = RegisterBatch(
+            [BatchOperation(READ, 10), BatchOperation(WRITE, 1, 5), BatchOperation(UPDATE, 3, set_mask=1)]
+        )
+
+        # When
+        result = batch.get_read_range()
+
+        # Then
+        self.assertEqual((3, 8), result)
+
+    def test_get_read_range_when_only_writing(self):
+        # Given
+        batch = RegisterBatch([BatchOperation(WRITE, 1, 5), BatchOperation(WRITE, 2, 6)])
+
+        # When
+        result = batch.get_read_range()
+
+        # Then
+        self.assertEqual((0, 0), result)
+        self.assertTrue(batch.has_writes())
+
+    def test_apply_reads(self):
+        # Given
+        batch = RegisterBatch([BatchOperation(READ, 3), BatchOperation(READ, 2), BatchOperation(READ, 3, flag=1)])
+
+        # When
+        result = batch.apply([0x20, 0x32])
+
+        # Then
+        self.assertEqual({}, result)
+        self.assertFalse(batch.has_writes())
+        self.assertEqual([0x32, 0x20, 1], batch.get_results())
+
+    def test_apply_merges_writes(self):
+        # Given
+        batch = RegisterBatch(
+            [
+                BatchOperation(WRITE, 1, 5),
+                BatchOperation(WRITE, 2, 6),
+                BatchOperation(WRITE, 1, 7),
+                BatchOperation(READ, 1),
+            ]
+        )
+
+        # When
+        result = batch.apply([0])
+
+        # Then
+        self.assertEqual({1: 7, 2: 6}, result)
+        self.assertEqual([5, 6, 7, 7], batch.get_results())
+
+    def test_apply_updates(self):
+        # Given
+        batch = RegisterBatch(
+            [
+                BatchOperation(UPDATE, 1, set_mask=0x01, clear_mask=0x80),
+                BatchOperation(UPDATE, 2, set_mask=0x04, flag=2),
+                BatchOperation(UPDATE, 1, set_mask=0x02),
+            ]
+        )
+
+        # When
+        result = batch.apply([0x80, 0x04])
+
+        # Then
+        self.assertEqual({1: 0x03}, result)
+        self.assertEqual([0x01, 1, 0x03], batch.get_results())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,210 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from context_logger import setup_logging
+
+from mrhat_daemon import RegisterCache, RegisterCacheStats, RegisterSnapshot
+
+
+class RegisterCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_get_loads_registers_on_first_access(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+
+        # When
+        result = register_cache.get(loader)
+
+        # Then
+        loader.assert_called_once()
+        self.assertEqual([1, 2, 3], result)
+        self.assertEqual(RegisterCacheStats(0, 1, 0), register_cache.get_stats())
+
+    def test_get_serves_registers_from_cache_within_ttl(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+        register_cache.get(loader)
+        clock.return_value = 100.5
+
+        # When
+        result = register_cache.get(loader)
+
+        # Then
+        loader.assert_called_once()
+        self.assertEqual([1, 2, 3], result)
+        self.assertEqual(RegisterCacheStats(1, 1, 0), register_cache.get_stats())
+
+    def test_get_reloads_registers_when_ttl_expired(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+        register_cache.get(loader)
+        clock.return_value = 101.0
+
+        # When
+        register_cache.get(loader)
+
+        # Then
+        self.assertEqual(2, loader.call_count)
+        self.assertEqual(RegisterCacheStats(0, 2, 0), register_cache.get_stats())
+
+    def test_get_reloads_registers_when_invalidated(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+        register_cache.get(loader)
+
+        # When
+        register_cache.invalidate()
+        register_cache.get(loader)
+
+        # Then
+        self.assertEqual(2, loader.call_count)
+        self.assertEqual(RegisterCacheStats(0, 2, 1), register_cache.get_stats())
+
+    def test_get_serves_updated_registers(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+
+        # When
+        register_cache.update([4, 5, 6])
+        result = register_cache.get(loader)
+
+        # Then
+        loader.assert_not_called()
+        self.assertEqual([4, 5, 6], result)
+
+    def test_get_does_not_cache_registers_loaded_before_invalidation(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+
+        def invalidating_loader():
+            register_cache.invalidate()
+            return [7, 8, 9]
+
+        # When
+        register_cache.get(invalidating_loader)
+        result = register_cache.get(loader)
+
+        # Then
+        loader.assert_called_once()
+        self.assertEqual([1, 2, 3], result)
+
+    def test_get_always_loads_registers_when_disabled(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(0, clock)
+
+        # When
+        register_cache.get(loader)
+        register_cache.get(loader)
+
+        # Then
+        self.assertEqual(2, loader.call_count)
+        self.assertEqual(RegisterCacheStats(0, 2, 0), register_cache.get_stats())
+
+    def test_get_snapshot_returns_capture_timestamp(self):
+        # Given
+        clock, loader = create_components()
+        wall_clock = MagicMock(return_value=1700000000.0)
+        register_cache = RegisterCache(1.0, clock, wall_clock)
+        register_cache.get(loader)
+        wall_clock.return_value = 1700000000.5
+
+        # When
+        result = register_cache.get_snapshot(loader)
+
+        # Then
+        loader.assert_called_once()
+        self.assertEqual(RegisterSnapshot([1, 2, 3], 1700000000.0, 1), result)
+
+    def test_get_snapshot_returns_copy_of_cached_registers(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+        register_cache.get_snapshot(loader).registers[0] = 99
+
+        # When
+        result = register_cache.get_snapshot(loader)
+
+        # Then
+        self.assertEqual([1, 2, 3], result.registers)
+
+    def test_generation_unchanged_when_reloaded_registers_are_equal(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+        first = register_cache.get_snapshot(loader)
+        register_cache.invalidate()
+
+        # When
+        result = register_cache.get_snapshot(loader)
+
+        # Then
+        self.assertEqual(2, loader.call_count)
+        self.assertEqual(first.generation, result.generation)
+
+    def test_generation_incremented_when_registers_change(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+        first = register_cache.get_snapshot(loader)
+
+        # When
+        register_cache.update([1, 2, 4])
+
+        # Then
+        self.assertEqual(first.generation + 1, register_cache.get_snapshot(loader).generation)
+
+    def test_observe_increments_generation_when_partial_read_differs(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(0, clock)
+        generation = register_cache.observe(0, [1, 2, 3])
+
+        # When
+        unchanged = register_cache.observe(1, [2])
+        changed = register_cache.observe(2, [5])
+
+        # Then
+        self.assertEqual(generation, unchanged)
+        self.assertEqual(generation + 1, changed)
+        self.assertEqual(generation + 1, register_cache.get_snapshot(MagicMock(return_value=[1, 2, 5])).generation)
+
+    def test_get_generation_returns_none_when_cache_not_fresh(self):
+        # Given
+        clock, loader = create_components()
+        register_cache = RegisterCache(1.0, clock)
+        generation = register_cache.get_snapshot(loader).generation
+        fresh = register_cache.get_generation()
+        clock.return_value = 101.0
+
+        # When
+        result = register_cache.get_generation()
+
+        # Then
+        self.assertEqual(generation, fresh)
+        self.assertIsNone(result)
+
+
+def create_components():
+    clock = MagicMock(return_value=100.0)
+    loader = MagicMock(return_value=[1, 2, 3])
+
+    return clock, loader
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from generated import REG_STAT_0_ADDR, SHUT_REQ_POS
+from mrhat_daemon import RegisterMap, RegisterDefinition, FlagDefinition
+
+
+class RegisterMapTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_loads_generated_definitions(self):
+        # Given
+        register_map = RegisterMap()
+
+        # When
+        result = register_map.get_flag('SHUT_REQ')
+
+        # Then
+        self.assertEqual(REG_STAT_0_ADDR, result.register.address)
+        self.assertEqual(SHUT_REQ_POS, result.position)
+        self.assertEqual(register_map.get_register('REG_STAT_0'), result.register)
+
+    def test_get_register(self):
+        # Given
+        register_map = RegisterMap(create_definitions())
+
+        # When
+        result = register_map.get_register('REG_CFG_0')
+
+        # Then
+        self.assertEqual(RegisterDefinition('REG_CFG_0', 1, True, True), result)
+
+    def test_get_register_when_read_only(self):
+        # Given
+        register_map = RegisterMap(create_definitions())
+
+        # When
+        result = register_map.get_register('REG_STAT_0')
+
+        # Then
+        self.assertEqual(RegisterDefinition('REG_STAT_0', 2, True, False), result)
+
+    def test_get_register_when_name_unknown(self):
+        # Given
+        register_map = RegisterMap(create_definitions())
+
+        # When
+        result = register_map.get_register('REG_CFG_0_ADDR')
+
+        # Then
+        self.assertIsNone(result)
+
+    def test_get_flag(self):
+        # Given
+        register_map = RegisterMap(create_definitions())
+
+        # When
+        result = register_map.get_flag('PI_HB')
+
+        # Then
+        self.assertEqual(FlagDefinition('PI_HB', RegisterDefinition('REG_STAT_0', 2, True, False), 1), result)
+
+    def test_get_flags_in_definition_order(self):
+        # Given
+        register_map = RegisterMap(create_definitions())
+
+        # When
+        result = register_map.get_flags()
+
+        # Then
+        self.assertEqual(['LED_EN', 'SHUT_REQ', 'PI_HB'], [flag.name for flag in result])
+        self.assertEqual([1, 2, 2], [flag.register.address for flag in result])
+
+    def test_get_registers(self):
+        # Given
+        register_map = RegisterMap(create_definitions())
+
+        # When
+        result = register_map.get_registers()
+
+        # Then
+        self.assertEqual(['REG_ID', 'REG_CFG_0', 'REG_STAT_0'], [register.name for register in result])
+
+
+def create_definitions():
+    return {
+        'REG_ADDR_RD_END': 3,
+        'REG_ADDR_WR_START': 1,
+        'REG_ADDR_WR_END': 1,
+        'ORPHAN_POS': 3,
+        'REG_ID_ADDR': 0,
+        'REG_CFG_0_ADDR': 1,
+        'LED_EN_POS': 2,
+        'LED_EN': 1 << 2,
+        'REG_STAT_0_ADDR': 2,
+        'SHUT_REQ_POS': 0,
+        'SHUT_REQ_MASK': 1,
+        'PI_HB_POS': 1,
+        'VERSION_STRING': '"1.0"',
+    }
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,182 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock, call
+
+from context_logger import setup_logging
+
+from mrhat_daemon import RetryPolicy, RetryConfig, RetryPolicyStatus, CircuitOpenError
+
+
+class RetryPolicyTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_execute_returns_result(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        operation = MagicMock(return_value=123)
+
+        # When
+        result = retry_policy.execute(operation)
+
+        # Then
+        self.assertEqual(123, result)
+        operation.assert_called_once()
+        sleep.assert_not_called()
+
+    def test_execute_retries_with_exponential_backoff(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        operation = MagicMock(side_effect=[ValueError('1'), ValueError('2'), ValueError('3'), 123])
+
+        # When
+        result = retry_policy.execute(operation, ValueError)
+
+        # Then
+        self.assertEqual(123, result)
+        sleep.assert_has_calls([call(0.1), call(0.2), call(0.3)])
+        self.assertEqual(RetryPolicyStatus('closed', 0, 3, 0, 0, 0.0), retry_policy.get_status())
+
+    def test_execute_applies_jitter_to_delay(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        jitter_source.return_value = 0.5
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        operation = MagicMock(side_effect=[ValueError('1'), 123])
+
+        # When
+        retry_policy.execute(operation, ValueError)
+
+        # Then
+        sleep.assert_called_once()
+        self.assertAlmostEqual(0.075, sleep.call_args.args[0])
+
+    def test_execute_raises_error_when_retry_limit_reached(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        operation = MagicMock(side_effect=ValueError('Failed'))
+
+        # When
+        self.assertRaises(ValueError, retry_policy.execute, operation, ValueError)
+
+        # Then
+        self.assertEqual(4, operation.call_count)
+        self.assertEqual(RetryPolicyStatus('closed', 1, 3, 1, 0, 0.0), retry_policy.get_status())
+
+    def test_execute_does_not_retry_other_errors(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        operation = MagicMock(side_effect=KeyError('Failed'))
+
+        # When
+        self.assertRaises(KeyError, retry_policy.execute, operation, ValueError)
+
+        # Then
+        operation.assert_called_once()
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        operation = MagicMock(side_effect=ValueError('Failed'))
+        for _ in range(2):
+            self.assertRaises(ValueError, retry_policy.execute, operation, ValueError)
+        operation.reset_mock()
+        clock.return_value = 104.0
+
+        # When
+        self.assertRaises(CircuitOpenError, retry_policy.execute, operation, ValueError)
+
+        # Then
+        operation.assert_not_called()
+        self.assertEqual(RetryPolicyStatus('open', 2, 6, 2, 1, 6.0), retry_policy.get_status())
+
+    def test_circuit_bypassed_operation_retried_when_circuit_open(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        for _ in range(2):
+            self.assertRaises(ValueError, retry_policy.execute, MagicMock(side_effect=ValueError()), ValueError)
+        operation = MagicMock(side_effect=[ValueError('Failed'), 123])
+
+        # When
+        result = retry_policy.execute(operation, ValueError, bypass_breaker=True)
+
+        # Then
+        self.assertEqual(123, result)
+        self.assertEqual(2, operation.call_count)
+        self.assertEqual(0, retry_policy.get_status().rejections)
+        self.assertEqual('closed', retry_policy.get_status().state)
+
+    def test_circuit_closes_when_trial_operation_succeeds(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        for _ in range(2):
+            self.assertRaises(ValueError, retry_policy.execute, MagicMock(side_effect=ValueError()), ValueError)
+        clock.return_value = 110.0
+
+        # When
+        result = retry_policy.execute(MagicMock(return_value=123), ValueError)
+
+        # Then
+        self.assertEqual(123, result)
+        self.assertEqual('closed', retry_policy.get_status().state)
+        self.assertEqual(0, retry_policy.get_status().consecutive_failures)
+
+    def test_circuit_reopens_when_trial_operation_fails(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        for _ in range(2):
+            self.assertRaises(ValueError, retry_policy.execute, MagicMock(side_effect=ValueError()), ValueError)
+        clock.return_value = 110.0
+        operation = MagicMock(side_effect=ValueError('Failed'))
+
+        # When
+        self.assertRaises(ValueError, retry_policy.execute, operation, ValueError)
+
+        # Then
+        operation.assert_called_once()
+        self.assertEqual('open', retry_policy.get_status().state)
+        self.assertEqual(10.0, retry_policy.get_status().retry_after)
+
+    def test_circuit_allows_new_trial_when_previous_trial_did_not_complete(self):
+        # Given
+        config, clock, sleep, jitter_source = create_components()
+        retry_policy = RetryPolicy(config, clock, sleep, jitter_source)
+        for _ in range(2):
+            self.assertRaises(ValueError, retry_policy.execute, MagicMock(side_effect=ValueError()), ValueError)
+        clock.return_value = 110.0
+        self.assertRaises(KeyError, retry_policy.execute, MagicMock(side_effect=KeyError()), ValueError)
+        self.assertRaises(CircuitOpenError, retry_policy.execute, MagicMock(), ValueError)
+        clock.return_value = 120.0
+
+        # When
+        result = retry_policy.execute(MagicMock(return_value=123), ValueError)
+
+        # Then
+        self.assertEqual(123, result)
+        self.assertEqual('closed', retry_policy.get_status().state)
+
+
+def create_components():
+    config = RetryConfig(3, 0.1, 0.3, 0.5, 2, 10.0)
+    clock = MagicMock(return_value=100.0)
+    sleep = MagicMock()
+    jitter_source = MagicMock(return_value=0.0)
+
+    return config, clock, sleep, jitter_source
+
+
+if __name__ == '__main__':
+    unittest.main()
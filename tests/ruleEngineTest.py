@@ -0,0 +1,137 @@
+import unittest
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from generated import REG_STAT_0_ADDR, REG_CFG_0_ADDR, SHUT_REQ, PI_HB
+from mrhat_daemon import (
+    ChangeDispatcher,
+    RegisterMap,
+    RegisterChange,
+    RuleParser,
+    RuleEngine,
+    Rule,
+    RuleAction,
+    RuleActionType,
+    RuleTrigger,
+)
+
+
+class RuleEngineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_parse_rising_flag_rule_with_command_action(self):
+        # Given
+        rule_parser = RuleParser(RegisterMap())
+
+        # When
+        result = rule_parser.parse('shutdown', 'SHUT_REQ rising -> command systemctl poweroff')
+
+        # Then
+        action = RuleAction(RuleActionType.COMMAND, command=('systemctl', 'poweroff'))
+        self.assertEqual(Rule('shutdown', REG_STAT_0_ADDR, RuleTrigger.RISING, SHUT_REQ, action), result)
+
+    def test_parse_equals_rule_with_write_action(self):
+        # Given
+        rule_parser = RuleParser(RegisterMap())
+
+        # When
+        result = rule_parser.parse('led', 'REG_STAT_0 equals 0x02 -> write REG_CFG_0 1')
+
+        # Then
+        action = RuleAction(RuleActionType.WRITE, register=REG_CFG_0_ADDR, value=1)
+        self.assertEqual(Rule('led', REG_STAT_0_ADDR, RuleTrigger.EQUALS, 2, action), result)
+
+    def test_parse_rules_from_config(self):
+        # Given
+        rule_parser = RuleParser(RegisterMap())
+        config = {'log_level': 'info', 'rule_heartbeat_lost': 'PI_HB falling -> event heartbeat_lost'}
+
+        # When
+        result = rule_parser.parse_rules(config)
+
+        # Then
+        action = RuleAction(RuleActionType.EVENT, event='heartbeat_lost')
+        self.assertEqual([Rule('heartbeat_lost', REG_STAT_0_ADDR, RuleTrigger.FALLING, PI_HB, action)], result)
+
+    def test_parse_raises_error_on_invalid_rules(self):
+        # Given
+        rule_parser = RuleParser(RegisterMap())
+
+        for definition in [
+            'SHUT_REQ rising',
+            'UNKNOWN rising -> event name',
+            'SHUT_REQ toggles -> event name',
+            'REG_STAT_0 equals 256 -> event name',
+            'SHUT_REQ rising -> write REG_STAT_0 1',
+            'SHUT_REQ rising -> event',
+            'SHUT_REQ rising -> reboot',
+        ]:
+            # When, Then
+            with self.assertRaises(ValueError, msg=definition):
+                rule_parser.parse('invalid', definition)
+
+    def test_evaluate_matches_rules_by_transition(self):
+        # Given
+        rising = create_rule('rising', RuleTrigger.RISING, SHUT_REQ)
+        falling = create_rule('falling', RuleTrigger.FALLING, PI_HB)
+        equals = create_rule('equals', RuleTrigger.EQUALS, SHUT_REQ)
+        other = create_rule('other', RuleTrigger.RISING, PI_HB)
+        change_dispatcher = ChangeDispatcher()
+        rule_engine = RuleEngine([rising, falling, equals, other], change_dispatcher)
+        changes = change_dispatcher.dispatch(create_registers(PI_HB), create_registers(SHUT_REQ))
+
+        # When
+        result = rule_engine.evaluate(changes)
+
+        # Then
+        self.assertEqual([rising, falling, equals], result)
+
+    def test_evaluate_matches_nothing_when_no_rule_for_register(self):
+        # Given
+        change_dispatcher = ChangeDispatcher()
+        rule_engine = RuleEngine([create_rule('rising', RuleTrigger.RISING, SHUT_REQ)], change_dispatcher)
+        changes = change_dispatcher.dispatch(create_registers(0), create_registers(0, {REG_CFG_0_ADDR: 1}))
+
+        # When
+        result = rule_engine.evaluate(changes)
+
+        # Then
+        self.assertEqual([], result)
+
+    def test_evaluate_does_not_repeat_matches_of_earlier_changes(self):
+        # Given
+        rising = create_rule('rising', RuleTrigger.RISING, SHUT_REQ)
+        change_dispatcher = ChangeDispatcher()
+        rule_engine = RuleEngine([rising], change_dispatcher)
+        rule_engine.evaluate(change_dispatcher.dispatch(create_registers(0), create_registers(SHUT_REQ)))
+
+        # When
+        result = rule_engine.evaluate([RegisterChange(REG_STAT_0_ADDR, SHUT_REQ, SHUT_REQ | PI_HB, PI_HB)])
+
+        # Then
+        self.assertEqual([], result)
+
+
+def create_rule(name, trigger, value):
+    return Rule(name, REG_STAT_0_ADDR, trigger, value, RuleAction(RuleActionType.EVENT, event=name))
+
+
+def create_registers(status, registers=None):
+    values = [0] * (max(REG_STAT_0_ADDR, REG_CFG_0_ADDR) + 1)
+    values[REG_STAT_0_ADDR] = status
+
+    for register, value in (registers or {}).items():
+        values[register] = value
+
+    return values
+
+
+if __name__ == '__main__':
+    unittest.main()
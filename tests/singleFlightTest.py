@@ -0,0 +1,97 @@
+import unittest
+from threading import Thread
+from unittest import TestCase
+
+from context_logger import setup_logging
+
+from mrhat_daemon import SingleFlight
+
+
+class SingleFlightTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_first_caller_leads_the_flight(self):
+        # Given
+        single_flight = SingleFlight()
+
+        # When
+        flight, leader = single_flight.join('key')
+
+        # Then
+        self.assertTrue(leader)
+        self.assertEqual('key', flight.key)
+        self.assertEqual(0, single_flight.get_coalesced_count())
+
+    def test_later_callers_join_the_open_flight(self):
+        # Given
+        single_flight = SingleFlight()
+        flight, _ = single_flight.join('key')
+
+        # When
+        joined_flight, leader = single_flight.join('key')
+
+        # Then
+        self.assertFalse(leader)
+        self.assertIs(flight, joined_flight)
+        self.assertEqual(1, single_flight.get_coalesced_count())
+
+    def test_callers_with_different_keys_lead_separate_flights(self):
+        # Given
+        single_flight = SingleFlight()
+        flight, _ = single_flight.join('key1')
+
+        # When
+        other_flight, leader = single_flight.join('key2')
+
+        # Then
+        self.assertTrue(leader)
+        self.assertIsNot(flight, other_flight)
+
+    def test_callers_lead_new_flight_when_flight_closed(self):
+        # Given
+        single_flight = SingleFlight()
+        flight, _ = single_flight.join('key')
+
+        # When
+        single_flight.close(flight)
+        new_flight, leader = single_flight.join('key')
+
+        # Then
+        self.assertTrue(leader)
+        self.assertIsNot(flight, new_flight)
+
+    def test_waiters_receive_result(self):
+        # Given
+        single_flight = SingleFlight()
+        flight, _ = single_flight.join('key')
+        results = []
+        waiter = Thread(target=lambda: results.append(single_flight.join('key')[0].wait()))
+        waiter.start()
+
+        # When
+        flight.complete([1, 2, 3])
+        waiter.join(1)
+
+        # Then
+        self.assertEqual([[1, 2, 3]], results)
+
+    def test_waiters_receive_error(self):
+        # Given
+        single_flight = SingleFlight()
+        flight, _ = single_flight.join('key')
+
+        # When
+        flight.fail(ValueError('Failed'))
+
+        # Then
+        self.assertRaises(ValueError, flight.wait)
+
+
+if __name__ == '__main__':
+    unittest.main()
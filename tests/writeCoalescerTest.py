@@ -0,0 +1,100 @@
+import unittest
+from unittest import TestCase
+from unittest.mock import MagicMock, call
+
+from context_logger import setup_logging
+from test_utility import wait_for_condition
+
+from mrhat_daemon import WriteCoalescer, WriteCoalescerStats
+
+
+class WriteCoalescerTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        setup_logging('mrhat-daemon', 'DEBUG', warn_on_overwrite=False)
+
+    def setUp(self):
+        print()
+
+    def test_writes_are_merged_within_window(self):
+        # Given
+        writer = MagicMock()
+        write_coalescer = WriteCoalescer(writer, 0.1)
+
+        # When
+        write_coalescer.write({1: 10})
+        write_coalescer.write({2: 20, 1: 11})
+        write_coalescer.write({1: 12})
+
+        # Then
+        wait_for_condition(1, lambda: writer.call_count == 1)
+        writer.assert_called_once_with({1: 12, 2: 20})
+        self.assertEqual(WriteCoalescerStats(4, 2, 1, 0), write_coalescer.get_stats())
+
+    def test_flush_writes_pending_values_immediately(self):
+        # Given
+        writer = MagicMock()
+        write_coalescer = WriteCoalescer(writer, 10)
+        write_coalescer.write({3: 30, 1: 10})
+
+        # When
+        write_coalescer.flush()
+
+        # Then
+        writer.assert_called_once_with({3: 30, 1: 10})
+
+    def test_flush_does_nothing_when_no_pending_values(self):
+        # Given
+        writer = MagicMock()
+        write_coalescer = WriteCoalescer(writer, 10)
+
+        # When
+        write_coalescer.flush()
+
+        # Then
+        writer.assert_not_called()
+
+    def test_failed_values_are_kept_for_next_flush(self):
+        # Given
+        writer = MagicMock(side_effect=[Exception('Failed to write'), None])
+        write_coalescer = WriteCoalescer(writer, 10)
+        write_coalescer.write({1: 10, 2: 20})
+        self.assertRaises(Exception, write_coalescer.flush)
+        write_coalescer.write({2: 21})
+
+        # When
+        write_coalescer.flush()
+
+        # Then
+        writer.assert_has_calls([call({1: 10, 2: 20}), call({1: 10, 2: 21})])
+        self.assertEqual(WriteCoalescerStats(3, 1, 1, 1), write_coalescer.get_stats())
+
+    def test_failed_background_flush_is_retried(self):
+        # Given
+        writer = MagicMock(side_effect=[Exception('Failed to write'), None])
+        write_coalescer = WriteCoalescer(writer, 0.1)
+
+        # When
+        write_coalescer.write({1: 10})
+
+        # Then
+        wait_for_condition(1, lambda: write_coalescer.get_stats() == WriteCoalescerStats(1, 0, 1, 1))
+        writer.assert_has_calls([call({1: 10}), call({1: 10})])
+
+    def test_close_discards_pending_values(self):
+        # Given
+        writer = MagicMock()
+        write_coalescer = WriteCoalescer(writer, 10)
+        write_coalescer.write({1: 10})
+
+        # When
+        write_coalescer.close()
+        write_coalescer.flush()
+
+        # Then
+        writer.assert_not_called()
+
+
+if __name__ == '__main__':
+    unittest.main()